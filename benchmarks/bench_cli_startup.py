@@ -0,0 +1,92 @@
+"""
+    Benchmark of the startup time of the nextbus console script, each case being run in a
+    new interpreter, from a bare interpreter up to a whole command answered by the stub
+    server
+
+    Usage: python benchmarks/bench_cli_startup.py [--repeat 20] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import stub_server
+
+CASES = (
+    ("python", ["-c", "pass"]),
+    ("import-package", ["-c", "import nextbus_api_parser"]),
+    ("import-api-handler", ["-c", "import nextbus_api_parser.api_handler"]),
+    ("help", ["-m", "nextbus_api_parser.cli", "--help"]),
+    ("agencies", ["-m", "nextbus_api_parser.cli", "--domain", "{domain}", "agencies"]),
+)  # name and interpreter arguments of each case, {domain} is the stub server's
+
+
+def time_command(command, repeat):
+    """
+    Funtion to time a command run to completion several times
+
+    Returns
+    -------
+    list[float]
+        seconds taken by each run
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def bench(domain, repeat):
+    """
+    Funtion to time every case
+
+    Returns
+    -------
+    list[dict]
+        one result per case
+    """
+    results = []
+    for name, arguments in CASES:
+        command = [sys.executable] + [argument.format(domain=domain) for argument in arguments]
+        seconds = time_command(command, repeat)
+        results.append(
+            {
+                "benchmark": f"cli_startup.{name}",
+                "seconds": min(seconds),
+                "seconds_median": statistics.median(seconds),
+            }
+        )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--repeat", type=int, default=20)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    # the interpreters started by the benchmark import the package from the same place
+    os.environ["PYTHONPATH"] = os.pathsep.join(sys.path[1:])
+    server, domain = stub_server.start()
+    try:
+        for result in bench(domain, arguments.repeat):
+            if arguments.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{result['benchmark']:<36} min {result['seconds'] * 1000:8.2f} ms"
+                    f"  median {result['seconds_median'] * 1000:8.2f} ms"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
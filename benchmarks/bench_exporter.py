@@ -0,0 +1,103 @@
+"""
+    Benchmark of the agency exporter against the stub server, comparing a full export of a
+    synthetic agency with an incremental re-export, in which no route has changed
+
+    Usage: python benchmarks/bench_exporter.py [--routes 200] [--format csv] [--json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.exporter import AgencyExporter
+
+import stub_server
+
+
+def get_size(directory):
+    """
+    Funtion to get the size of the files written to a directory
+
+    Returns
+    -------
+    int
+        bytes in every file under the directory
+    """
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def bench(domain, route_count, file_format):
+    """
+    Funtion to time a full export followed by an incremental one
+
+    Returns
+    -------
+    list[dict]
+        one result per export
+    """
+    agency_tag = f"{stub_server.SYNTHETIC_PREFIX}{route_count}"
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, incremental in (("full", False), ("incremental", True)):
+            # a new handler every time, so that nothing is served from its cache
+            with ApiHandler(domain) as api_handler:
+                exporter = AgencyExporter(api_handler, directory, file_format)
+                tracemalloc.start()
+                start = time.perf_counter()
+                try:
+                    summary = exporter.export(agency_tag, incremental)
+                    seconds = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+            results.append(
+                {
+                    "benchmark": f"exporter.{file_format}.{name}.{route_count}",
+                    "seconds": seconds,
+                    "peak_bytes": peak,
+                    "exported": len(summary["exported"]),
+                    "unchanged": len(summary["unchanged"]),
+                    "errors": len(summary["errors"]),
+                    "output_bytes": get_size(directory),
+                }
+            )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--routes", type=int, default=200)
+    argument_parser.add_argument(
+        "--format", choices=list(AgencyExporter.FILE_FORMATS), default="csv"
+    )
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    server, domain = stub_server.start()
+    try:
+        for result in bench(domain, arguments.routes, arguments.format):
+            if arguments.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{result['benchmark']:<36} {result['seconds']:8.3f} s"
+                    f"  peak {result['peak_bytes'] / 1024 ** 2:7.1f} MiB"
+                    f"  exported {result['exported']:5d}  unchanged {result['unchanged']:5d}"
+                    f"  errors {result['errors']:3d}"
+                    f"  output {result['output_bytes'] / 1024 ** 2:7.1f} MiB"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+    Benchmark of the overhead of the metrics registry on ApiHandler.parse, with the
+    feeds served from memory so that network time doesn't hide it
+
+    Usage: python benchmarks/bench_instrumentation.py [--stops 2000] [--json]
+"""
+
+import argparse
+import json
+import timeit
+from email.message import Message
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.instrumentation import MetricsRegistry
+from nextbus_api_parser.transport import TransportResponse
+from nextbus_api_parser.xml_handlers import PredictionsHandler, RouteDetailsHandler
+
+from synthetic import predictions_multi_xml, route_config_xml
+
+CHUNK_SIZE = 65536  # bytes fed to the parser at a time, as read from a connection
+
+
+class MemoryTransport:
+    """Class of a transport serving the same feed to every query, from memory"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def fetch(self, url, feed, headers=None):
+        """Method to feed the whole feed, one chunk at a time"""
+        response = TransportResponse(url, 200, Message())
+        for start in range(0, len(self.data), CHUNK_SIZE):
+            data = self.data[start : start + CHUNK_SIZE]
+            response.bytes_received += len(data)
+            response.bytes_decoded += len(data)
+            feed(data)
+        return response
+
+    def close(self):
+        """Method to release nothing, like a transport without connections"""
+
+
+def get_feeds(stop_count):
+    """
+    Funtion to build the synthetic feeds parsed by the benchmark
+
+    Returns
+    -------
+    list[tuple[str, type, bytes]]
+        API command, handler class and xml of each feed
+    """
+    stops = [(f"R{index % 20}", f"S{index}") for index in range(stop_count // 10)]
+    return [
+        ("routeConfig", RouteDetailsHandler, route_config_xml("R0", stop_count)),
+        ("predictionsForMultiStops", PredictionsHandler, predictions_multi_xml(stops, 5)),
+    ]
+
+
+def bench(stop_count, repeat=5):
+    """
+    Funtion to time parse over every feed, without and with a metrics registry
+
+    Returns
+    -------
+    list[dict]
+        one result per feed
+    """
+    results = []
+    for command, handler_class, data in get_feeds(stop_count):
+        query = f"{ApiHandler.DOMAIN}command={command}&a=bench"
+        seconds = {}
+        for name, metrics in (("disabled", None), ("enabled", MetricsRegistry())):
+            api_handler = ApiHandler(transport=MemoryTransport(data), metrics=metrics)
+            timer = timeit.Timer(lambda: api_handler.parse(handler_class(), query))
+            number, _ = timer.autorange()
+            seconds[name] = min(timer.repeat(repeat, number)) / number
+        results.append(
+            {
+                "benchmark": f"instrumentation.{command}.{stop_count}",
+                "seconds_disabled": seconds["disabled"],
+                "seconds_enabled": seconds["enabled"],
+                "overhead": seconds["enabled"] / seconds["disabled"] - 1,
+            }
+        )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, default=2000)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for result in bench(arguments.stops):
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<48} disabled {result['seconds_disabled'] * 1000:8.2f} ms"
+                f"  enabled {result['seconds_enabled'] * 1000:8.2f} ms"
+                f"  overhead {result['overhead']:+.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+    Benchmark of the memory held by the data classes, comparing them with
+    equivalent classes that keep a per-instance __dict__ instead of __slots__
+
+    Usage: python benchmarks/bench_memory.py [--stops 10000] [--json]
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import tracemalloc
+import types
+from xml.sax import parseString
+
+from nextbus_api_parser import data_classes, xml_handlers
+from nextbus_api_parser.xml_handlers import RouteDetailsHandler
+
+from synthetic import agency_route_configs
+
+# classes of data_classes, with a representative set of XML attributes for each
+MODELS = {
+    "Agency": {"tag": "sf-muni", "title": "San Francisco Muni", "regionTitle": "California"},
+    "Route": {"tag": "N", "title": "N-Judah", "shortTitle": "N"},
+    "Stop": {
+        "tag": "5205",
+        "title": "Judah St & 9th Ave",
+        "lat": "37.7622",
+        "lon": "-122.4664",
+        "stopId": "15205",
+    },
+    "Direction": {"tag": "N____O_F00", "title": "Outbound to Ocean Beach", "name": "Outbound"},
+    "Point": {"lat": "37.7622", "lon": "-122.4664"},
+    "Directions": {"title": "Outbound to Ocean Beach"},
+    "Prediction": {
+        "epochTime": "1700000000000",
+        "seconds": "300",
+        "minutes": "5",
+        "isDeparture": "false",
+        "dirTag": "N____O_F00",
+        "block": "9705",
+        "tripTag": "11467549",
+    },
+    "Error": {"shouldRetry": "false"},
+}
+
+
+def without_slots(cls):
+    """
+    Funtion to make a copy of a data class that keeps a per-instance __dict__
+
+    Parameters
+    ----------
+    cls : type
+        data class using __slots__
+
+    Returns
+    -------
+    type
+        equivalent class without __slots__
+    """
+    namespace = {
+        name: value
+        for name, value in vars(cls).items()
+        if name not in ("__slots__", "__dict__", "__weakref__")
+        and not isinstance(value, types.MemberDescriptorType)
+    }
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+@contextlib.contextmanager
+def dict_based_models():
+    """Context manager that swaps every data class for its copy without __slots__"""
+    originals = {}
+    for module in (data_classes, xml_handlers):
+        for name, value in list(vars(module).items()):
+            if isinstance(value, type) and "__slots__" in vars(value):
+                originals[(module, name)] = value
+    copies = {cls: without_slots(cls) for cls in set(originals.values())}
+    for (module, name), cls in originals.items():
+        setattr(module, name, copies[cls])
+    try:
+        yield
+    finally:
+        for (module, name), cls in originals.items():
+            setattr(module, name, cls)
+
+
+def measure(build):
+    """
+    Funtion to measure the memory still held by the result of build once it returns
+
+    Returns
+    -------
+    int
+        bytes allocated by build that are still alive
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_per_object(count):
+    """
+    Funtion to measure the memory of each data class per instance
+
+    Returns
+    -------
+    list[dict]
+        one result per data class
+    """
+    results = []
+    for name, attributes in MODELS.items():
+        sizes = {}
+        for variant in ("dict", "slots"):
+            context = dict_based_models() if variant == "dict" else contextlib.nullcontext()
+            with context:
+                cls = getattr(data_classes, name)
+                sizes[variant] = measure(
+                    lambda cls=cls: [cls(attributes) for _ in range(count)]
+                ) / count
+        results.append(
+            {
+                "benchmark": f"memory.per_object.{name}",
+                "dict_bytes": round(sizes["dict"], 1),
+                "slots_bytes": round(sizes["slots"], 1),
+                "saving": round(1 - sizes["slots"] / sizes["dict"], 3),
+            }
+        )
+    return results
+
+
+def bench_agency(stop_count):
+    """
+    Funtion to measure the memory of the parsed routeConfigs of a synthetic agency
+
+    Returns
+    -------
+    list[dict]
+        a single result covering the whole agency
+    """
+    configs = agency_route_configs(stop_count)
+
+    def parse_agency():
+        routes = []
+        for _, xml in configs:
+            handler = RouteDetailsHandler()
+            parseString(xml, handler)
+            routes.append(handler.route)
+        return routes
+
+    sizes = {}
+    with dict_based_models():
+        sizes["dict"] = measure(parse_agency)
+    sizes["slots"] = measure(parse_agency)
+    return [
+        {
+            "benchmark": f"memory.agency.{stop_count}_stops",
+            "dict_bytes": sizes["dict"],
+            "slots_bytes": sizes["slots"],
+            "saving": round(1 - sizes["slots"] / sizes["dict"], 3),
+        }
+    ]
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, default=10000)
+    argument_parser.add_argument("--count", type=int, default=10000)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    results = bench_per_object(arguments.count) + bench_agency(arguments.stops)
+    for result in results:
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<40} dict {result['dict_bytes']:>12} B"
+                f"  slots {result['slots_bytes']:>12} B  saving {result['saving']:.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
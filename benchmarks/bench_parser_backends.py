@@ -0,0 +1,104 @@
+"""
+    Benchmark of the throughput of each parser backend, in MB of xml feed parsed
+    into data classes per second
+
+    Usage: python benchmarks/bench_parser_backends.py [--stops 2000] [--json]
+"""
+
+import argparse
+import json
+import timeit
+
+from nextbus_api_parser.parser_backends import BACKENDS, get_backend
+from nextbus_api_parser.xml_handlers import PredictionsHandler, RouteDetailsHandler
+
+from synthetic import predictions_multi_xml, route_config_xml
+
+CHUNK_SIZE = 65536  # bytes fed to the parser at a time, as read from a connection
+
+
+def parse(backend, handler_class, data):
+    """
+    Funtion to feed a whole feed to a new handler, one chunk at a time
+
+    Returns
+    -------
+    xml.sax.ContentHandler
+        the handler, holding the parsed data classes
+    """
+    handler = handler_class()
+    parser = backend.create_parser(handler)
+    for start in range(0, len(data), CHUNK_SIZE):
+        parser.feed(data[start : start + CHUNK_SIZE])
+    parser.close()
+    return handler
+
+
+def get_feeds(stop_count):
+    """
+    Funtion to build the synthetic feeds parsed by the benchmark
+
+    Returns
+    -------
+    list[tuple[str, type, bytes]]
+        name, handler class and xml of each feed
+    """
+    stops = [(f"R{index % 20}", f"S{index}") for index in range(stop_count // 10)]
+    return [
+        ("routeConfig", RouteDetailsHandler, route_config_xml("R0", stop_count)),
+        ("predictionsForMultiStops", PredictionsHandler, predictions_multi_xml(stops, 5)),
+    ]
+
+
+def bench(stop_count, repeat=5):
+    """
+    Funtion to time every available backend over every feed
+
+    Returns
+    -------
+    list[dict]
+        one result per feed and backend
+    """
+    results = []
+    for feed_name, handler_class, data in get_feeds(stop_count):
+        for backend_name in BACKENDS:
+            try:
+                backend = get_backend(backend_name)
+            except ImportError:
+                # optional backend whose dependency isn't installed
+                continue
+            seconds = min(
+                timeit.repeat(
+                    lambda: parse(backend, handler_class, data), number=1, repeat=repeat
+                )
+            )
+            results.append(
+                {
+                    "benchmark": f"parser_backends.{feed_name}.{backend_name}",
+                    "bytes": len(data),
+                    "seconds": seconds,
+                    "mb_per_s": round(len(data) / seconds / 1e6, 2),
+                }
+            )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, default=2000)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for result in bench(arguments.stops):
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<48} {result['bytes'] / 1e6:6.2f} MB"
+                f"  {result['seconds'] * 1000:8.2f} ms  {result['mb_per_s']:7.2f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+    Benchmark of interactive predictions calls made while a backlog of bulk routeConfig
+    calls waits on the rate limiter, comparing the latency of the predictions with and
+    without priorities
+
+    Usage: python benchmarks/bench_rate_limiter.py [--rate 20] [--bulk 100]
+                                                   [--interactive 20] [--json]
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.rate_limiter import PRIORITY_DEFAULT, RateLimiter
+
+import stub_server
+
+AGENCY_TAG = "sf-muni"
+
+
+def bench_priorities(domain, rate, bulk_count, interactive_count, prioritized):
+    """
+    Funtion to time predictions calls made once bulk_count routeConfig calls are waiting
+    on a limiter allowing rate calls per second
+
+    Returns
+    -------
+    tuple[list[float], float]
+        seconds taken by each predictions call, and by the whole run
+    """
+    priorities = None
+    if not prioritized:
+        priorities = dict.fromkeys(RateLimiter.DEFAULT_PRIORITIES, PRIORITY_DEFAULT)
+    rate_limiter = RateLimiter(rate, None, burst=1 / rate, priorities=priorities)
+    latencies = []
+    lock = threading.Lock()
+
+    def get_predictions(api_handler, index):
+        start = time.perf_counter()
+        api_handler.get_predictions(AGENCY_TAG, "N", str(index))
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    with ApiHandler(domain, rate_limiter=rate_limiter, coalesce=False) as api_handler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=bulk_count + interactive_count) as executor:
+            for index in range(bulk_count):
+                executor.submit(
+                    api_handler.get_route_details,
+                    AGENCY_TAG,
+                    f"{stub_server.SYNTHETIC_PREFIX}{index}",
+                )
+            # let the bulk calls queue up before the interactive ones arrive
+            time.sleep(2 / rate)
+            for index in range(interactive_count):
+                executor.submit(get_predictions, api_handler, index)
+        return latencies, time.perf_counter() - start
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument(
+        "--rate", type=float, default=20, help="API calls allowed per second"
+    )
+    argument_parser.add_argument("--bulk", type=int, default=100)
+    argument_parser.add_argument("--interactive", type=int, default=20)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    server, domain = stub_server.start()
+    try:
+        for prioritized in (False, True):
+            latencies, seconds = bench_priorities(
+                domain, arguments.rate, arguments.bulk, arguments.interactive, prioritized
+            )
+            result = {
+                "benchmark": "rate_limiter."
+                + ("prioritized" if prioritized else "fifo")
+                + f".bulk-{arguments.bulk}.interactive-{arguments.interactive}",
+                "median_latency": statistics.median(latencies),
+                "max_latency": max(latencies),
+                "seconds": seconds,
+            }
+            if arguments.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{result['benchmark']:<48} predictions median"
+                    f" {result['median_latency'] * 1000:8.1f} ms  max"
+                    f" {result['max_latency'] * 1000:8.1f} ms  total {seconds:6.2f} s"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
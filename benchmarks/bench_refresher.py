@@ -0,0 +1,98 @@
+"""
+    Benchmark of the number of API queries made to keep subscribers' predictions fresh,
+    comparing PredictionRefresher with every subscriber polling its own stop
+
+    Usage: python benchmarks/bench_refresher.py [--stops 100 1000] [--json]
+"""
+
+import argparse
+import json
+import random
+
+from nextbus_api_parser.api_handler import BaseApiHandler
+from nextbus_api_parser.prediction_refresher import PredictionRefresher
+
+DURATION = 600  # simulated seconds
+INTERVALS = (15, 30, 60)  # refresh intervals asked for by the subscribers
+SUBSCRIBERS_PER_STOP = 3  # average number of subscribers of a stop
+ROUTES = 20  # number of routes the stops are spread over
+
+
+class CountingApiHandler(BaseApiHandler):
+    """API handler that counts the queries it would send instead of sending them"""
+
+    def __init__(self):
+        BaseApiHandler.__init__(self)
+        self.queries = 0
+
+    def get_predictions_multi(self, agency_tag, stops):
+        """Method to count the queries of a multi stop call, returning no predictions"""
+        self.queries += len(self.get_multi_stop_queries(agency_tag, stops))
+        return {}
+
+
+def bench(stop_count, seed=0):
+    """
+    Funtion to simulate subscribers joining over the first minute and staying subscribed
+
+    Returns
+    -------
+    dict
+        queries made by subscribers polling on their own and by the refresher
+    """
+    rng = random.Random(seed)
+    subscribers = [
+        (
+            rng.uniform(0, 60),  # time the subscriber joins
+            f"R{index % ROUTES}",
+            f"S{index}",
+            rng.choice(INTERVALS),
+        )
+        for index in range(stop_count)
+        for _ in range(rng.randint(1, 2 * SUBSCRIBERS_PER_STOP - 1))
+    ]
+    # every subscriber polls its stop on its own, one query per refresh
+    naive_queries = sum(
+        int((DURATION - joined_at) // interval) + 1 for joined_at, _, _, interval in subscribers
+    )
+
+    now = [0.0]
+    api_handler = CountingApiHandler()
+    refresher = PredictionRefresher(api_handler, clock=lambda: now[0])
+    pending = sorted(subscribers)
+    for second in range(DURATION):
+        now[0] = float(second)
+        while pending and pending[0][0] <= second:
+            _, route_tag, stop_tag, interval = pending.pop(0)
+            refresher.subscribe("agency", route_tag, stop_tag, interval)
+        refresher.refresh_due()
+    return {
+        "benchmark": f"refresher.queries.{stop_count}",
+        "subscribers": len(subscribers),
+        "naive_queries": naive_queries,
+        "refresher_queries": api_handler.queries,
+        "reduction": round(naive_queries / api_handler.queries, 1),
+    }
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, nargs="+", default=[100, 1000])
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for stop_count in arguments.stops:
+        result = bench(stop_count)
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<28} {result['subscribers']:>6} subscribers"
+                f"  naive {result['naive_queries']:>8} queries"
+                f"  refresher {result['refresher_queries']:>6} queries  x{result['reduction']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+    Benchmark of get_route_details when only some parts of the route are needed,
+    comparing a full parse with parts=("stops",) and with a lazy route
+
+    Usage: python benchmarks/bench_route_parts.py [--stops 600] [--json]
+"""
+
+import argparse
+import json
+import timeit
+import tracemalloc
+from functools import partial
+
+from nextbus_api_parser.api_handler import ApiHandler
+
+import stub_server
+
+AGENCY_TAG = "sf-muni"
+CASES = (
+    ("full", {}, None),
+    ("parts-stops", {"parts": ("stops",)}, None),
+    ("lazy", {"lazy": True}, None),
+    ("lazy-stops", {"lazy": True}, "stops"),
+)  # name, get_route_details arguments, and route attribute accessed after the call
+
+
+def get_route(api_handler, route_tag, arguments, accessed):
+    """
+    Funtion to get a route and access one of its attributes
+
+    Returns
+    -------
+    Route
+        the route
+    """
+    route = api_handler.get_route_details(AGENCY_TAG, route_tag, **arguments)
+    if accessed is not None:
+        getattr(route, accessed)
+    return route
+
+
+def measure_retained(function):
+    """
+    Funtion to measure the memory retained by the result of a function
+
+    Returns
+    -------
+    int
+        bytes allocated by the call and still held once it returns
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def bench(domain, stop_count, repeat=5):
+    """
+    Funtion to time every case against the stub server
+
+    Returns
+    -------
+    list[dict]
+        one result per case
+    """
+    route_tag = f"{stub_server.SYNTHETIC_PREFIX}{stop_count}"
+    results = []
+    with ApiHandler(domain) as api_handler:
+        for name, arguments, accessed in CASES:
+            call = partial(get_route, api_handler, route_tag, arguments, accessed)
+            timer = timeit.Timer(call)
+            number, _ = timer.autorange()
+            results.append(
+                {
+                    "benchmark": f"route_parts.{name}.{stop_count}",
+                    "seconds": min(timer.repeat(repeat, number)) / number,
+                    "retained_bytes": measure_retained(call),
+                }
+            )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, default=600)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    server, domain = stub_server.start()
+    try:
+        for result in bench(domain, arguments.stops):
+            if arguments.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{result['benchmark']:<36} {result['seconds'] * 1000:8.2f} ms"
+                    f"  retained {result['retained_bytes'] / 1024:8.1f} KiB"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+    Benchmark of the schedule parsed into packed arrays by ScheduleHandler, against a naive
+    tree with an object per trip and per cell, comparing parse time, retained memory and
+    the time to look up the next departures at a stop
+
+    Usage: python benchmarks/bench_schedule.py [--stops 60] [--trips 200] [--json]
+"""
+
+import argparse
+import gc
+import json
+import random
+import timeit
+import tracemalloc
+
+from nextbus_api_parser.data_classes import get_xml_int
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.xml_handlers import DispatchHandler, ScheduleHandler
+
+from synthetic import schedule_xml
+
+LOOKUPS = 1000  # (stop, time) lookups timed per repetition
+DEPARTURES = 3  # departures returned by each lookup
+
+
+class Cell:
+    """Class of a cell of the naive tree: the time a trip reaches a stop"""
+
+    __slots__ = ("stop_tag", "epoch_time", "text")
+
+    def __init__(self, stop_tag, epoch_time):
+        self.stop_tag = stop_tag
+        self.epoch_time = epoch_time
+        self.text = ""
+
+
+class Trip:
+    """Class of a trip of the naive tree, with a cell per stop"""
+
+    __slots__ = ("block_id", "cells")
+
+    def __init__(self, block_id):
+        self.block_id = block_id
+        self.cells = []
+
+
+class Table:
+    """Class of a table of the naive tree, for a service class and direction"""
+
+    __slots__ = ("service_class", "direction", "stops", "trips")
+
+    def __init__(self, service_class, direction):
+        self.service_class = service_class
+        self.direction = direction
+        self.stops = []
+        self.trips = []
+
+
+class NaiveScheduleHandler(DispatchHandler):
+    """Class building the naive tree, keeping every element of the feed as an object"""
+
+    def __init__(self):
+        DispatchHandler.__init__(self)
+        self.tables = []
+        self.start_handlers.update(route=self.start_route, tr=self.start_tr, stop=self.start_stop)
+        self.end_handlers.update(header=self.end_header, stop=self.end_stop)
+        self.text_elements.add("stop")
+        self._in_header = True
+        self._text = None
+
+    def characters(self, content):
+        if self._text is not None:
+            self._text.append(content)
+
+    def start_route(self, attrs):
+        self.tables.append(Table(attrs.get("serviceClass"), attrs.get("direction")))
+        self._in_header = True
+
+    def end_header(self):
+        self._in_header = False
+
+    def start_tr(self, attrs):
+        self.tables[-1].trips.append(Trip(attrs.get("blockID")))
+
+    def start_stop(self, attrs):
+        self._text = []
+        if self._in_header:
+            self.tables[-1].stops.append([attrs.get("tag"), ""])
+        else:
+            self.tables[-1].trips[-1].cells.append(
+                Cell(attrs.get("tag"), get_xml_int(attrs, "epochTime"))
+            )
+
+    def end_stop(self):
+        text = "".join(self._text)
+        self._text = None
+        if self._in_header:
+            self.tables[-1].stops[-1][1] = text
+        else:
+            self.tables[-1].trips[-1].cells[-1].text = text
+
+    def get_departures(self, stop_tag, service_class, after=0, count=1, direction=None):
+        """Method to look up the next departures by scanning every cell of the service class"""
+        times = [
+            cell.epoch_time // 60000
+            for table in self.tables
+            if table.service_class == service_class
+            and direction in (None, table.direction)
+            for trip in table.trips
+            for cell in trip.cells
+            if cell.stop_tag == stop_tag and cell.epoch_time >= 0
+            and cell.epoch_time // 60000 >= after
+        ]
+        times.sort()
+        return times[:count]
+
+
+def parse(handler_class, data):
+    """
+    Funtion to parse a feed with a handler
+
+    Returns
+    -------
+    DispatchHandler
+        the handler, holding the parsed schedule
+    """
+    handler = handler_class()
+    parser = get_backend().create_parser(handler)
+    parser.feed(data)
+    parser.close()
+    return handler
+
+
+def measure_retained(function):
+    """
+    Funtion to measure the memory retained by the result of a function
+
+    Returns
+    -------
+    int
+        bytes allocated by the call and still held once it returns
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = function()
+        gc.collect()  # the parser is freed by the garbage collector, not with its handler
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def bench(stop_count, trip_count, repeat=5):
+    """
+    Funtion to time parsing and lookups with both representations
+
+    Returns
+    -------
+    list[dict]
+        one result per representation
+    """
+    route_tag = "R"
+    data = schedule_xml(route_tag, stop_count, trip_count)
+    generator = random.Random(0)
+    lookups = [
+        (f"{route_tag}-{generator.randrange(stop_count)}", generator.randrange(300, 1500))
+        for _ in range(LOOKUPS)
+    ]
+    compact = parse(ScheduleHandler, data).schedule
+    naive = parse(NaiveScheduleHandler, data)
+    for stop_tag, after in lookups[:50]:
+        # both representations must agree before they're compared
+        for direction in (None, "Inbound", "Outbound"):
+            assert compact.get_departures(stop_tag, "wkd", after, DEPARTURES, direction) == (
+                naive.get_departures(stop_tag, "wkd", after, DEPARTURES, direction)
+            )
+
+    results = []
+    for name, handler_class, lookup in (
+        ("compact", ScheduleHandler, compact.get_departures),
+        ("naive", NaiveScheduleHandler, naive.get_departures),
+    ):
+        parse_timer = timeit.Timer(lambda: parse(handler_class, data))
+        number, _ = parse_timer.autorange()
+        parse_seconds = min(parse_timer.repeat(repeat, number)) / number
+
+        def run_lookups():
+            for stop_tag, after in lookups:
+                lookup(stop_tag, "wkd", after, DEPARTURES)
+
+        lookup_timer = timeit.Timer(run_lookups)
+        number, _ = lookup_timer.autorange()
+        lookup_seconds = min(lookup_timer.repeat(repeat, number)) / number / LOOKUPS
+        results.append(
+            {
+                "benchmark": f"schedule.{name}.{stop_count}x{trip_count}",
+                "parse_seconds": parse_seconds,
+                "lookup_seconds": lookup_seconds,
+                "retained_bytes": measure_retained(lambda: parse(handler_class, data)),
+                "feed_bytes": len(data),
+            }
+        )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--stops", type=int, default=60)
+    argument_parser.add_argument("--trips", type=int, default=200)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for result in bench(arguments.stops, arguments.trips):
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<28} parse {result['parse_seconds'] * 1000:8.2f} ms"
+                f"  lookup {result['lookup_seconds'] * 1e6:9.2f} us"
+                f"  retained {result['retained_bytes'] / 1024:9.1f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+    Benchmark of many clients asking for the predictions of the same stops at the same
+    time, comparing the API handler with and without request coalescing
+
+    Usage: python benchmarks/bench_single_flight.py [--clients 200] [--stops 1 10]
+                                                    [--latency 0.1] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.async_api_handler import AsyncApiHandler
+
+import stub_server
+
+AGENCY_TAG = "sf-muni"
+
+
+def bench_threads(domain, clients, stop_count, coalesce):
+    """
+    Funtion to time clients threads each asking for the predictions of one of the stops
+
+    Returns
+    -------
+    tuple[float, int]
+        seconds taken, and number of API calls made
+    """
+    with ApiHandler(domain, coalesce=coalesce) as api_handler:
+        queries = []
+        api_handler.transport.fetch = count_calls(api_handler.transport.fetch, queries)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(
+                executor.map(
+                    lambda index: api_handler.get_predictions(
+                        AGENCY_TAG, "N", str(index % stop_count)
+                    ),
+                    range(clients),
+                )
+            )
+        return time.perf_counter() - start, len(queries)
+
+
+def bench_asyncio(domain, clients, stop_count, coalesce):
+    """
+    Funtion to time clients coroutines each asking for the predictions of one of the stops
+
+    Returns
+    -------
+    tuple[float, int]
+        seconds taken, and number of API calls made
+    """
+
+    async def run():
+        async with AsyncApiHandler(
+            domain, max_connections=clients, coalesce=coalesce
+        ) as api_handler:
+            queries = []
+            api_handler.parse = count_calls(api_handler.parse, queries)
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    api_handler.get_predictions(AGENCY_TAG, "N", str(index % stop_count))
+                    for index in range(clients)
+                )
+            )
+            return time.perf_counter() - start, len(queries)
+
+    return asyncio.run(run())
+
+
+def count_calls(function, calls):
+    """
+    Funtion to wrap a function so that its calls are appended to a list
+
+    Returns
+    -------
+    callable
+        the wrapped function
+    """
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return function(*args, **kwargs)
+
+    return counted
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--clients", type=int, default=200)
+    argument_parser.add_argument("--stops", type=int, nargs="+", default=[1, 10])
+    argument_parser.add_argument(
+        "--latency", type=float, default=0.1, help="seconds the stub server takes per query"
+    )
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    server, domain = stub_server.start(latency=arguments.latency)
+    try:
+        for stop_count in arguments.stops:
+            for kind, bench in (("threads", bench_threads), ("asyncio", bench_asyncio)):
+                without_seconds, without_calls = bench(domain, arguments.clients, stop_count, False)
+                with_seconds, with_calls = bench(domain, arguments.clients, stop_count, True)
+                result = {
+                    "benchmark": f"single_flight.{kind}.{arguments.clients}.stops-{stop_count}",
+                    "calls_without": without_calls,
+                    "calls_with": with_calls,
+                    "seconds_without": without_seconds,
+                    "seconds_with": with_seconds,
+                }
+                if arguments.json:
+                    print(json.dumps(result))
+                else:
+                    print(
+                        f"{result['benchmark']:<44} without {without_calls:>4} calls"
+                        f" {without_seconds * 1000:8.1f} ms  with {with_calls:>4} calls"
+                        f" {with_seconds * 1000:8.1f} ms"
+                    )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
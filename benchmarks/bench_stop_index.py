@@ -0,0 +1,155 @@
+"""
+    Benchmark of nearest-stop queries, comparing StopIndex with a naive scan
+    over every stop of every route
+
+    Usage: python benchmarks/bench_stop_index.py [--sizes 1000 10000 100000] [--json]
+"""
+
+import argparse
+import heapq
+import json
+import random
+import time
+
+from nextbus_api_parser.data_classes import Route
+from nextbus_api_parser.stop_index import StopIndex, haversine
+
+from synthetic import LAT_RANGE, LON_RANGE
+
+QUERIES = 200  # number of queries timed per benchmark
+NEAREST_COUNT = 5  # number of stops asked for by the nearest queries
+RADIUS = 400  # meters, radius of the within queries
+
+
+def make_routes(stop_count, stops_per_route=100, seed=0):
+    """
+    Funtion to build the routes of a synthetic agency without going through the xml feed
+
+    Returns
+    -------
+    list[Route]
+        routes with stop_count stops in total
+    """
+    rng = random.Random(seed)
+    routes = []
+    for route_index in range(max(1, stop_count // stops_per_route)):
+        route = Route(
+            {"tag": f"R{route_index}", "latMin": str(LAT_RANGE[0])}, is_detailed=True
+        )
+        for stop_index in range(stops_per_route):
+            route.add_stop(
+                {
+                    "tag": f"{route_index}-{stop_index}",
+                    "lat": str(rng.uniform(*LAT_RANGE)),
+                    "lon": str(rng.uniform(*LON_RANGE)),
+                }
+            )
+        routes.append(route)
+    return routes
+
+
+def naive_nearest(routes, lat, lon, count):
+    """Funtion to find the nearest stops by measuring the distance to every stop"""
+    return heapq.nsmallest(
+        count,
+        (
+            (haversine(lat, lon, stop.lat, stop.lon), stop.tag)
+            for route in routes
+            for stop in route.stops
+        ),
+    )
+
+
+def naive_within(routes, lat, lon, radius):
+    """Funtion to find the stops within a radius by measuring the distance to every stop"""
+    found = []
+    for route in routes:
+        for stop in route.stops:
+            distance = haversine(lat, lon, stop.lat, stop.lon)
+            if distance <= radius:
+                found.append((distance, stop.tag))
+    found.sort()
+    return found
+
+
+def time_per_query(function, locations):
+    """
+    Funtion to time a query function over a list of locations
+
+    Returns
+    -------
+    float
+        average seconds per query
+    """
+    start = time.perf_counter()
+    for lat, lon in locations:
+        function(lat, lon)
+    return (time.perf_counter() - start) / len(locations)
+
+
+def bench(stop_count, cell_size=None):
+    """
+    Funtion to time nearest and within queries over an agency of stop_count stops
+
+    Returns
+    -------
+    list[dict]
+        one result per kind of query
+    """
+    routes = make_routes(stop_count)
+    start = time.perf_counter()
+    index = StopIndex(routes, cell_size)
+    build_time = time.perf_counter() - start
+    rng = random.Random(1)
+    locations = [(rng.uniform(*LAT_RANGE), rng.uniform(*LON_RANGE)) for _ in range(QUERIES)]
+    # the naive scan is slow, it's timed over fewer queries
+    naive_locations = locations[: max(5, QUERIES * 1000 // stop_count)]
+
+    results = []
+    for kind, indexed, naive in (
+        (
+            "nearest",
+            lambda lat, lon: index.nearest(lat, lon, NEAREST_COUNT),
+            lambda lat, lon: naive_nearest(routes, lat, lon, NEAREST_COUNT),
+        ),
+        (
+            "within",
+            lambda lat, lon: index.within(lat, lon, RADIUS),
+            lambda lat, lon: naive_within(routes, lat, lon, RADIUS),
+        ),
+    ):
+        indexed_time = time_per_query(indexed, locations)
+        naive_time = time_per_query(naive, naive_locations)
+        results.append(
+            {
+                "benchmark": f"stop_index.{kind}.{stop_count}",
+                "build_s": build_time,
+                "naive_s": naive_time,
+                "indexed_s": indexed_time,
+                "speedup": round(naive_time / indexed_time, 1),
+            }
+        )
+    return results
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    argument_parser.add_argument("--cell-size", type=float, help="grid cell size in degrees")
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for stop_count in arguments.sizes:
+        for result in bench(stop_count, arguments.cell_size):
+            if arguments.json:
+                print(json.dumps(result))
+            else:
+                print(
+                    f"{result['benchmark']:<32} naive {result['naive_s'] * 1000:9.3f} ms"
+                    f"  indexed {result['indexed_s'] * 1000:7.3f} ms  x{result['speedup']}"
+                )
+
+
+if __name__ == "__main__":
+    main()
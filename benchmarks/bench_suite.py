@@ -0,0 +1,439 @@
+"""
+    Benchmark suite of the XML handlers and of the API handler methods, measuring parse
+    time, allocations (tracemalloc) and peak RSS over the recorded fixtures and over
+    synthetic feeds. API calls are answered by a local stub server instead of the network.
+
+    Every benchmark runs in a fresh process so its memory use isn't skewed by the others.
+    Save the results of two commits with --output and compare them with compare.py
+
+    Usage: python benchmarks/bench_suite.py [--scale 1] [--repeat 5] [--backend expat]
+                                            [--filter NAME] [--output FILE] [--json]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.parser_backends import DEFAULT_BACKEND, get_backend
+from nextbus_api_parser.xml_handlers import (
+    AgencyListHandler,
+    PredictionsHandler,
+    RouteDetailsHandler,
+    RouteListHandler,
+    StreamingRouteDetailsHandler,
+    VehicleLocationsHandler,
+)
+
+from stub_server import FIXTURES_DIRECTORY, SYNTHETIC_PREFIX
+from synthetic import (
+    agency_list_xml,
+    predictions_multi_xml,
+    predictions_xml,
+    route_config_xml,
+    route_list_xml,
+    vehicle_locations_xml,
+)
+
+CHUNK_SIZE = 65536  # bytes fed to the parser at a time, as read from a connection
+AGENCY_TAG = "sf-muni"  # agency of the recorded fixtures
+
+
+def read_fixture(name):
+    """
+    Funtion to read one of the recorded fixtures
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    with open(os.path.join(FIXTURES_DIRECTORY, f"{name}.xml"), "rb") as fixture:
+        return fixture.read()
+
+
+def get_handler_cases(scale):
+    """
+    Funtion to list the benchmarks of the XML handlers
+
+    Parameters
+    ----------
+    scale : float
+        factor applied to the size of the synthetic feeds
+
+    Returns
+    -------
+    dict[str, tuple[type, callable]]
+        handler class and function building the feed, keyed by benchmark name
+    """
+    agencies = int(1000 * scale)
+    routes = int(1000 * scale)
+    stops = int(10000 * scale)
+    points = int(100000 * scale)
+    predictions = int(1000 * scale)
+    multi_stops = [(f"R{index % 20}", f"S{index}") for index in range(int(150 * scale))]
+    vehicles = int(2000 * scale)
+    cases = {
+        "handler.AgencyListHandler.fixture": (
+            AgencyListHandler,
+            lambda: read_fixture("agencyList"),
+        ),
+        f"handler.AgencyListHandler.agencies-{agencies}": (
+            AgencyListHandler,
+            lambda: agency_list_xml(agencies),
+        ),
+        "handler.RouteListHandler.fixture": (RouteListHandler, lambda: read_fixture("routeList")),
+        f"handler.RouteListHandler.routes-{routes}": (
+            RouteListHandler,
+            lambda: route_list_xml(routes),
+        ),
+        "handler.PredictionsHandler.fixture": (
+            PredictionsHandler,
+            lambda: read_fixture("predictions"),
+        ),
+        "handler.PredictionsHandler.fixture-multi": (
+            PredictionsHandler,
+            lambda: read_fixture("predictionsForMultiStops"),
+        ),
+        f"handler.PredictionsHandler.predictions-{predictions}": (
+            PredictionsHandler,
+            lambda: predictions_xml("R0", "S0", predictions),
+        ),
+        f"handler.PredictionsHandler.multi-stops-{len(multi_stops)}": (
+            PredictionsHandler,
+            lambda: predictions_multi_xml(multi_stops, 5, directions=2),
+        ),
+        "handler.VehicleLocationsHandler.fixture": (
+            VehicleLocationsHandler,
+            lambda: read_fixture("vehicleLocations"),
+        ),
+        f"handler.VehicleLocationsHandler.vehicles-{vehicles}": (
+            VehicleLocationsHandler,
+            lambda: vehicle_locations_xml(vehicles),
+        ),
+    }
+    for handler_class in (RouteDetailsHandler, StreamingRouteDetailsHandler):
+        name = handler_class.__name__
+        cases[f"handler.{name}.fixture"] = (handler_class, lambda: read_fixture("routeConfig"))
+        cases[f"handler.{name}.stops-{stops}"] = (
+            handler_class,
+            lambda: route_config_xml("R0", stops),
+        )
+        cases[f"handler.{name}.points-{points}"] = (
+            handler_class,
+            lambda: route_config_xml("R0", 100, points_per_path=points // 100, path_count=100),
+        )
+    return cases
+
+
+def get_api_cases(scale):
+    """
+    Funtion to list the benchmarks of the API handler methods
+
+    Parameters
+    ----------
+    scale : float
+        factor applied to the size of the synthetic feeds
+
+    Returns
+    -------
+    dict[str, tuple[str, tuple]]
+        name and arguments of the method, keyed by benchmark name
+    """
+    synthetic_route = f"{SYNTHETIC_PREFIX}{int(10000 * scale)}"
+    small_route = f"{SYNTHETIC_PREFIX}{int(100 * scale)}"
+    multi_stops = [(f"R{index % 20}", f"S{index}") for index in range(int(300 * scale))]
+    return {
+        "api.get_agencies": ("get_agencies", ()),
+        "api.iter_agencies": ("iter_agencies", ()),
+        "api.get_routes": ("get_routes", (AGENCY_TAG,)),
+        "api.iter_routes": ("iter_routes", (AGENCY_TAG,)),
+        "api.get_route_details.fixture": ("get_route_details", (AGENCY_TAG, "14")),
+        f"api.get_route_details.{synthetic_route}": (
+            "get_route_details",
+            (AGENCY_TAG, synthetic_route),
+        ),
+        f"api.iter_route_details.{synthetic_route}": (
+            "iter_route_details",
+            (AGENCY_TAG, synthetic_route),
+        ),
+        "api.get_predictions": ("get_predictions", (AGENCY_TAG, "N", "5205")),
+        f"api.get_predictions_multi.stops-{len(multi_stops)}": (
+            "get_predictions_multi",
+            (AGENCY_TAG, multi_stops),
+        ),
+        "api.get_vehicle_locations": ("get_vehicle_locations", (AGENCY_TAG,)),
+        "api.map_predictions.requests-50": (
+            "map_predictions",
+            ([(AGENCY_TAG, "N", str(index)) for index in range(50)],),
+        ),
+        f"api.map_route_details.requests-20.{small_route}": (
+            "map_route_details",
+            ([(AGENCY_TAG, small_route)] * 20,),
+        ),
+    }
+
+
+def parse_feed(backend, handler_class, data):
+    """
+    Funtion to feed a whole feed to a new handler, one chunk at a time. The records of a
+    streaming handler are dropped as they're completed, like its consumers would
+
+    Returns
+    -------
+    xml.sax.ContentHandler
+        the handler, holding the parsed data classes
+    """
+    handler = handler_class()
+    records = getattr(handler, "records", None)
+    parser = backend.create_parser(handler)
+    for start in range(0, len(data), CHUNK_SIZE):
+        parser.feed(data[start : start + CHUNK_SIZE])
+        if records:
+            records.clear()
+    parser.close()
+    return handler
+
+
+def call_api(api_handler, method_name, arguments):
+    """
+    Funtion to call an API handler method, exhausting it if it's a generator
+
+    Returns
+    -------
+    any
+        the result of the call
+    """
+    result = getattr(api_handler, method_name)(*arguments)
+    if method_name.startswith("iter_"):
+        count = 0
+        for _ in result:
+            count += 1
+        return count
+    return result
+
+
+def reset_peak_rss():
+    """Funtion to reset the peak RSS of the process to its current RSS, where supported"""
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def get_peak_rss():
+    """
+    Funtion to get the peak RSS of the process
+
+    Returns
+    -------
+    int
+        peak RSS in KB, or None where it can't be measured
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes rather than KB
+    return peak_rss // 1024 if sys.platform == "darwin" else peak_rss
+
+
+def measure(run, repeat):
+    """
+    Funtion to measure the time taken, the memory allocated and the RSS used by a function
+
+    Parameters
+    ----------
+    run : callable
+        function to measure
+    repeat : int
+        number of timed samples, each sample calls the function enough times to take
+        at least 0.2 seconds
+
+    Returns
+    -------
+    dict
+        measurements of the function
+    """
+    gc.collect()
+    reset_peak_rss()
+    rss_before = get_peak_rss()
+    # the first call also warms up caches and connections
+    result = run()
+    rss_after = get_peak_rss()
+    del result
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    times = [seconds / number for seconds in timer.repeat(repeat, number)]
+    gc.collect()
+    tracemalloc.start()
+    result = run()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "seconds": min(times),
+        "seconds_median": statistics.median(times),
+        "alloc_peak_bytes": peak,
+        "alloc_retained_bytes": retained,
+        "peak_rss_kb": rss_after,
+        "rss_growth_kb": None if rss_before is None else rss_after - rss_before,
+    }
+
+
+def run_case(name, scale, repeat, backend_name, domain):
+    """
+    Funtion to run a single benchmark in the current process
+
+    Returns
+    -------
+    dict
+        result of the benchmark
+    """
+    handler_cases = get_handler_cases(scale)
+    result = {"benchmark": name}
+    if name in handler_cases:
+        handler_class, build_feed = handler_cases[name]
+        backend = get_backend(backend_name)
+        data = build_feed()
+        result.update(measure(lambda: parse_feed(backend, handler_class, data), repeat))
+        result["bytes"] = len(data)
+        result["mb_per_s"] = round(len(data) / result["seconds"] / 1e6, 2)
+    else:
+        method_name, arguments = get_api_cases(scale)[name]
+        with ApiHandler(domain, backend=backend_name) as api_handler:
+            result.update(
+                measure(lambda: call_api(api_handler, method_name, arguments), repeat)
+            )
+    return result
+
+
+def get_metadata(arguments):
+    """
+    Funtion to describe the conditions of a run, so results can be compared knowingly
+
+    Returns
+    -------
+    dict
+        commit, interpreter, platform and options of the run
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": arguments.backend,
+        "scale": arguments.scale,
+        "repeat": arguments.repeat,
+    }
+
+
+def run_suite(arguments):
+    """
+    Funtion to run every selected benchmark, each in its own process
+
+    Returns
+    -------
+    list[dict]
+        result of each benchmark
+    """
+    names = list(get_handler_cases(arguments.scale)) + list(get_api_cases(arguments.scale))
+    if arguments.filter:
+        names = [name for name in names if any(part in name for part in arguments.filter)]
+    script = os.path.abspath(__file__)
+    options = ["--scale", str(arguments.scale), "--repeat", str(arguments.repeat)]
+    options += ["--backend", arguments.backend]
+    stub_server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(script), "stub_server.py")],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        domain = stub_server.stdout.readline().strip()
+        results = []
+        for name in names:
+            output = subprocess.run(
+                [sys.executable, script, *options, "--domain", domain, "--run-case", name],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            results.append(json.loads(output))
+            if not arguments.json:
+                print_result(results[-1])
+        return results
+    finally:
+        stub_server.terminate()
+        stub_server.wait()
+
+
+def print_result(result):
+    """Function to print a result as a line of a table"""
+    throughput = f"{result['mb_per_s']:7.2f} MB/s" if "mb_per_s" in result else " " * 12
+    print(
+        f"{result['benchmark']:<60} {result['seconds'] * 1000:9.3f} ms {throughput}"
+        f"  alloc {result['alloc_peak_bytes'] / 1e6:8.2f} MB"
+        f"  rss {(result['peak_rss_kb'] or 0) / 1024:7.1f} MB",
+        flush=True,
+    )
+
+
+def main():
+    """Function to run the benchmark suite and print or save its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--scale", type=float, default=1.0)
+    argument_parser.add_argument("--repeat", type=int, default=5)
+    argument_parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    argument_parser.add_argument(
+        "--filter", nargs="+", help="only run the benchmarks whose name contains one of these"
+    )
+    argument_parser.add_argument("--output", help="file the results are saved to as JSON")
+    argument_parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    argument_parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    argument_parser.add_argument("--domain", help=argparse.SUPPRESS)
+    arguments = argument_parser.parse_args()
+
+    if arguments.run_case:
+        result = run_case(
+            arguments.run_case,
+            arguments.scale,
+            arguments.repeat,
+            arguments.backend,
+            arguments.domain,
+        )
+        print(json.dumps(result))
+        return
+
+    report = {"metadata": get_metadata(arguments), "results": run_suite(arguments)}
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+    if arguments.json:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+    Benchmark of typical consumer hot loops over parsed models, comparing the
+    typed fields of the data classes with the raw attribute strings they used to hold
+
+    Usage: python benchmarks/bench_typed_fields.py [--count 10000] [--json]
+"""
+
+import argparse
+import json
+import timeit
+from operator import attrgetter
+from xml.sax import parseString
+
+from nextbus_api_parser.xml_handlers import PredictionsHandler, RouteDetailsHandler
+
+from synthetic import predictions_xml, route_config_xml
+
+# bounding box used by the filtering benchmark, roughly a quarter of the synthetic area
+BOUNDING_BOX = (37.73, 37.79, -122.48, -122.40)
+
+
+class StringStop:
+    """Stop as it was before the typed fields, holding its raw attribute strings"""
+
+    __slots__ = ("tag", "lat", "lon")
+
+    def __init__(self, stop):
+        self.tag = stop.tag
+        self.lat = repr(stop.lat)
+        self.lon = repr(stop.lon)
+
+
+class StringPrediction:
+    """Prediction as it was before the typed fields, holding its raw attribute strings"""
+
+    __slots__ = ("seconds", "minutes", "epoch_time")
+
+    def __init__(self, prediction):
+        self.seconds = str(prediction.seconds)
+        self.minutes = str(prediction.minutes)
+        self.epoch_time = str(prediction.epoch_time)
+
+
+def best_time(function, repeat=5):
+    """
+    Funtion to time a function, keeping the fastest of several runs
+
+    Returns
+    -------
+    float
+        seconds taken by the fastest run
+    """
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def bench_sort_by_eta(count):
+    """
+    Funtion to time sorting predictions by their arrival time
+
+    Returns
+    -------
+    dict
+        timings before and after the typed fields
+    """
+    handler = PredictionsHandler()
+    parseString(predictions_xml("R0", "S0", count), handler)
+    typed = list(reversed(handler.predictions.directions[0].predictions))
+    strings = [StringPrediction(prediction) for prediction in typed]
+    before = best_time(lambda: sorted(strings, key=lambda prediction: int(prediction.seconds)))
+    after = best_time(lambda: sorted(typed, key=attrgetter("seconds")))
+    return {
+        "benchmark": f"typed_fields.sort_by_eta.{count}",
+        "before_s": before,
+        "after_s": after,
+        "speedup": round(before / after, 2),
+    }
+
+
+def bench_bounding_box(count):
+    """
+    Funtion to time filtering stops that lie within a bounding box
+
+    Returns
+    -------
+    dict
+        timings before and after the typed fields
+    """
+    handler = RouteDetailsHandler()
+    parseString(route_config_xml("R0", count, points_per_path=0, path_count=0), handler)
+    typed = [stop for stop in handler.route.stops if stop.lat is not None]
+    strings = [StringStop(stop) for stop in typed]
+    lat_min, lat_max, lon_min, lon_max = BOUNDING_BOX
+
+    def filter_strings():
+        return [
+            stop
+            for stop in strings
+            if lat_min <= float(stop.lat) <= lat_max and lon_min <= float(stop.lon) <= lon_max
+        ]
+
+    def filter_typed():
+        return [
+            stop
+            for stop in typed
+            if lat_min <= stop.lat <= lat_max and lon_min <= stop.lon <= lon_max
+        ]
+
+    assert len(filter_strings()) == len(filter_typed())
+    before = best_time(filter_strings)
+    after = best_time(filter_typed)
+    return {
+        "benchmark": f"typed_fields.bounding_box.{count}",
+        "before_s": before,
+        "after_s": after,
+        "speedup": round(before / after, 2),
+    }
+
+
+def main():
+    """Function to run the benchmark and print its results"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--count", type=int, default=10000)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    for result in (bench_sort_by_eta(arguments.count), bench_bounding_box(arguments.count)):
+        if arguments.json:
+            print(json.dumps(result))
+        else:
+            print(
+                f"{result['benchmark']:<40} before {result['before_s'] * 1000:8.3f} ms"
+                f"  after {result['after_s'] * 1000:8.3f} ms  x{result['speedup']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+    Script comparing two result files saved by bench_suite.py, typically of a base commit
+    and of a change, and flagging the benchmarks that regressed
+
+    Exits with status 1 if any benchmark regressed by more than the threshold
+
+    Usage: python benchmarks/compare.py BASELINE CURRENT [--threshold 0.1]
+                                        [--metrics seconds alloc_peak_bytes]
+"""
+
+import argparse
+import json
+import sys
+
+DEFAULT_METRICS = ["seconds", "alloc_peak_bytes", "alloc_retained_bytes"]
+
+
+def load_results(path):
+    """
+    Funtion to load a result file saved by bench_suite.py
+
+    Returns
+    -------
+    tuple[dict, dict[str, dict]]
+        metadata of the run, and its results keyed by benchmark name
+    """
+    with open(path, encoding="utf-8") as results_file:
+        report = json.load(results_file)
+    return report["metadata"], {result["benchmark"]: result for result in report["results"]}
+
+
+def compare(baseline, current, metrics, threshold):
+    """
+    Funtion to compare the results of the benchmarks run in both files
+
+    Parameters
+    ----------
+    baseline : dict[str, dict]
+        results of the baseline, keyed by benchmark name
+    current : dict[str, dict]
+        results being checked, keyed by benchmark name
+    metrics : list[str]
+        measurements compared, where lower is better
+    threshold : float
+        relative increase above which a measurement is a regression
+
+    Returns
+    -------
+    list[dict]
+        one comparison per benchmark and metric
+    """
+    comparisons = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        for metric in metrics:
+            before = baseline[name].get(metric)
+            after = result.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            comparisons.append(
+                {
+                    "benchmark": name,
+                    "metric": metric,
+                    "baseline": before,
+                    "current": after,
+                    "change": round(change, 4),
+                    "regression": change > threshold,
+                }
+            )
+    return comparisons
+
+
+def main():
+    """Function to compare two result files and print the comparison"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("baseline", help="results of the baseline")
+    argument_parser.add_argument("current", help="results being checked")
+    argument_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative increase that is a regression"
+    )
+    argument_parser.add_argument("--metrics", nargs="+", default=DEFAULT_METRICS)
+    argument_parser.add_argument("--json", action="store_true", help="print JSON lines")
+    arguments = argument_parser.parse_args()
+
+    baseline_metadata, baseline = load_results(arguments.baseline)
+    current_metadata, current = load_results(arguments.current)
+    comparisons = compare(baseline, current, arguments.metrics, arguments.threshold)
+    regressions = [comparison for comparison in comparisons if comparison["regression"]]
+
+    if arguments.json:
+        for comparison in comparisons:
+            print(json.dumps(comparison))
+    else:
+        print(f"baseline {baseline_metadata.get('commit')}  current {current_metadata.get('commit')}")
+        for key in ("python", "platform", "backend", "scale"):
+            if baseline_metadata.get(key) != current_metadata.get(key):
+                print(
+                    f"warning: {key} differs, {baseline_metadata.get(key)} "
+                    f"vs {current_metadata.get(key)}"
+                )
+        for comparison in comparisons:
+            flag = "  REGRESSION" if comparison["regression"] else ""
+            print(
+                f"{comparison['benchmark']:<60} {comparison['metric']:<22}"
+                f" {comparison['change']:+8.1%}{flag}"
+            )
+        missing = sorted(set(baseline) ^ set(current))
+        if missing:
+            print(f"not compared, only run once: {', '.join(missing)}")
+        print(f"{len(regressions)} regression(s) above {arguments.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
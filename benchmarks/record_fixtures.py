@@ -0,0 +1,72 @@
+"""
+    Script recording the fixtures used by the benchmark suite from the live NextBus API,
+    overwriting the files in benchmarks/fixtures
+
+    Usage: python benchmarks/record_fixtures.py [--agency sf-muni] [--route 14]
+                                                [--stop N 5205]
+"""
+
+import argparse
+import os
+from urllib.request import Request, urlopen
+from xml.sax import parse
+
+from nextbus_api_parser.api_handler import BaseApiHandler
+from nextbus_api_parser.xml_handlers import RouteDetailsHandler
+
+from stub_server import FIXTURES_DIRECTORY
+
+MULTI_STOPS = 6  # number of stops of the recorded predictionsForMultiStops feed
+
+
+def record(name, query):
+    """
+    Funtion to download the feed answering a query into the fixture of the same name
+
+    Parameters
+    ----------
+    name : str
+        name of the fixture, which is the API command of the query
+    query : str
+        API query string
+    """
+    request = Request(query, headers={"User-Agent": "nextbus_api_parser"})
+    with urlopen(request, timeout=30) as response:
+        data = response.read()
+    with open(os.path.join(FIXTURES_DIRECTORY, f"{name}.xml"), "wb") as fixture:
+        fixture.write(data)
+    print(f"{name:<26} {len(data):>10} bytes")
+
+
+def main():
+    """Function to record every fixture"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--agency", default="sf-muni")
+    argument_parser.add_argument("--route", default="14", help="route of the routeConfig feed")
+    argument_parser.add_argument(
+        "--stop", nargs=2, default=["N", "5205"], help="route and stop of the predictions feed"
+    )
+    arguments = argument_parser.parse_args()
+
+    api = BaseApiHandler()
+    record("agencyList", api.build_query(api.AGENCY_LIST_QUERY))
+    record("routeList", api.build_query(api.ROUTE_LIST_QUERY, arguments.agency))
+    record(
+        "routeConfig", api.build_query(api.ROUTE_DETAILS_QUERY, arguments.agency, arguments.route)
+    )
+    record("predictions", api.build_query(api.PREDICTIONS_QUERY, arguments.agency, *arguments.stop))
+    # the stops of the multi stop feed are the first stops of the recorded route
+    handler = RouteDetailsHandler()
+    parse(os.path.join(FIXTURES_DIRECTORY, "routeConfig.xml"), handler)
+    stop_tags = [stop.tag for stop in handler.route.stops[:MULTI_STOPS]]
+    record(
+        "predictionsForMultiStops",
+        api.get_multi_stop_queries(
+            arguments.agency, [(arguments.route, stop_tag) for stop_tag in stop_tags]
+        )[0],
+    )
+    record("vehicleLocations", api.get_vehicle_locations_query(arguments.agency))
+
+
+if __name__ == "__main__":
+    main()
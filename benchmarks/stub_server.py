@@ -0,0 +1,196 @@
+"""
+    Local HTTP server standing in for the NextBus API, used to benchmark the API handler
+    without the network. Queries are answered with the recorded fixtures, except for
+    routeConfig and schedule queries of routes tagged 'synthetic-<stops>', routeList queries
+    of agencies tagged 'synthetic-<routes>' and predictionsForMultiStops queries, which are
+    answered with synthetic feeds. Like the real API, predictions and
+    predictionsForMultiStops queries are answered with a single Error if any of their stops
+    is tagged 'invalid'. Every feed is sent with an ETag, and conditional queries whose
+    If-None-Match matches it are answered with '304 Not Modified'
+
+    Usage: python benchmarks/stub_server.py [--port 0] [--latency 0]
+"""
+
+import argparse
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from synthetic import predictions_multi_xml, route_config_xml, route_list_xml, schedule_xml
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+FEED_PATH = "/service/publicXMLFeed"  # path of the API queries, as on the real server
+SYNTHETIC_PREFIX = "synthetic-"  # prefix of the tags of synthetic routes
+INVALID_TAG = "invalid"  # tag of the stops the API doesn't know
+
+
+def error_xml(message, should_retry=False):
+    """
+    Funtion to build the feed of an Error flagged by the API
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    return (
+        '<?xml version="1.0" encoding="utf-8" ?>\n<body copyright="stub">\n'
+        f'<Error shouldRetry="{str(should_retry).lower()}">\n  {message}\n</Error>\n'
+        "</body>\n"
+    ).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=64)
+def get_feed(command, argument="", compressed=False):
+    """
+    Funtion to get the feed answering a query, feeds are built once and then reused
+
+    Parameters
+    ----------
+    command : str
+        API command of the query
+    argument : str, optional
+        route tag of a routeConfig or schedule query, agency tag of a routeList query, stop
+        tag of a predictions query, or the stops of a predictionsForMultiStops query joined
+        by commas, by default ""
+    compressed : bool, optional
+        whether the feed should be gzip compressed, by default False
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    if compressed:
+        return gzip.compress(get_feed(command, argument))
+    if command == "routeConfig" and argument.startswith(SYNTHETIC_PREFIX):
+        return route_config_xml(argument, int(argument[len(SYNTHETIC_PREFIX) :]))
+    if command == "schedule" and argument.startswith(SYNTHETIC_PREFIX):
+        return schedule_xml(argument, int(argument[len(SYNTHETIC_PREFIX) :]), 100)
+    if command == "routeList" and argument.startswith(SYNTHETIC_PREFIX):
+        return route_list_xml(int(argument[len(SYNTHETIC_PREFIX) :]))
+    if command == "predictionsForMultiStops":
+        stops = [tuple(stop.split("|", 1)) for stop in argument.split(",")]
+        if any(stop[-1] == INVALID_TAG for stop in stops):
+            return error_xml(f"Invalid stop tag {INVALID_TAG}")
+        return predictions_multi_xml(stops, 3, directions=2)
+    if command == "predictions" and argument == INVALID_TAG:
+        return error_xml(f"Invalid stop tag {INVALID_TAG}")
+    path = os.path.join(FIXTURES_DIRECTORY, f"{os.path.basename(command)}.xml")
+    if not os.path.isfile(path):
+        return error_xml(f'Command "{command}" is not available')
+    with open(path, "rb") as fixture:
+        return fixture.read()
+
+
+@functools.lru_cache(maxsize=64)
+def get_etag(command, argument=""):
+    """
+    Funtion to get the ETag of the feed answering a query, which only changes with the feed
+
+    Returns
+    -------
+    str
+        the ETag, quoted
+    """
+    return '"' + hashlib.sha1(get_feed(command, argument)).hexdigest()[:16] + '"'
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Class answering the API queries sent to the stub server"""
+
+    protocol_version = "HTTP/1.1"  # keeps connections alive, like the real server
+    # the headers and the body are written separately, with Nagle's algorithm the body
+    # would wait for the client's delayed acknowledgement of the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Method to answer a query with its feed"""
+        query = parse_qs(urlsplit(self.path).query)
+        command = query.get("command", [""])[0]
+        argument = ""
+        if command in ("routeConfig", "schedule"):
+            argument = query.get("r", [""])[0]
+        elif command == "routeList":
+            argument = query.get("a", [""])[0]
+        elif command == "predictions":
+            argument = query.get("s", [""])[0]
+        elif command == "predictionsForMultiStops":
+            argument = ",".join(query.get("stops", []))
+        etag = get_etag(command, argument)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+        data = get_feed(command, argument, compressed)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "text/xml;charset=UTF-8")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Method silencing the log of every query"""
+
+
+class StubServer(ThreadingHTTPServer):
+    """Class of the stub server, which accepts as many concurrent clients as benchmarked"""
+
+    daemon_threads = True
+    request_queue_size = 1024  # the default backlog of 5 drops bursts of connections
+
+
+def start(port=0, latency=0):
+    """
+    Funtion to start the stub server in a background thread
+
+    Parameters
+    ----------
+    port : int, optional
+        port listened to, by default any free port
+    latency : float, optional
+        seconds every query is delayed by, to simulate a remote server, by default 0
+
+    Returns
+    -------
+    tuple[ThreadingHTTPServer, str]
+        the server, and the domain to pass to the API handler
+    """
+    server = StubServer(("127.0.0.1", port), StubRequestHandler)
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{FEED_PATH}?"
+
+
+def main():
+    """Function to run the stub server until it's interrupted, printing its domain first"""
+    argument_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argument_parser.add_argument("--port", type=int, default=0)
+    argument_parser.add_argument(
+        "--latency", type=float, default=0, help="seconds every query is delayed by"
+    )
+    arguments = argument_parser.parse_args()
+
+    server, domain = start(arguments.port, arguments.latency)
+    print(domain, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+    Module generates synthetic NextBus XML feeds of any size, used by the
+    benchmarks to scale the number of agencies, routes, stops, points and predictions
+"""
+
+import random
+
+# area the synthetic coordinates are spread over, roughly San Francisco
+LAT_RANGE = (37.70, 37.82)
+LON_RANGE = (-122.52, -122.36)
+
+
+def agency_list_xml(agency_count):
+    """
+    Funtion to generate an agencyList feed
+
+    Parameters
+    ----------
+    agency_count : int
+        number of agencies in the feed
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', '<body copyright="synthetic">']
+    for index in range(agency_count):
+        lines.append(
+            f'<agency tag="agency-{index}" title="Agency {index}" '
+            f'shortTitle="A{index}" regionTitle="Region {index % 10}"/>'
+        )
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def route_list_xml(route_count):
+    """
+    Funtion to generate a routeList feed
+
+    Parameters
+    ----------
+    route_count : int
+        number of routes in the feed
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', '<body copyright="synthetic">']
+    for index in range(route_count):
+        lines.append(f'<route tag="R{index}" title="R{index}-Route {index}"/>')
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def route_config_xml(route_tag, stop_count, points_per_path=20, path_count=None, seed=0):
+    """
+    Funtion to generate a routeConfig feed shaped like the real ones: every stop is listed
+    once, then again by tag under one of two directions, followed by the route's paths
+
+    Parameters
+    ----------
+    route_tag : str
+        tag of the route
+    stop_count : int
+        number of stops on the route
+    points_per_path : int, optional
+        number of points in each path, by default 20
+    path_count : int, optional
+        number of paths, by default one per 5 stops
+    seed : int, optional
+        seed of the generated coordinates, by default 0
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    rng = random.Random(seed)
+    path_count = max(1, stop_count // 5) if path_count is None else path_count
+    lines = [
+        '<?xml version="1.0" encoding="utf-8" ?>',
+        '<body copyright="synthetic">',
+        f'<route tag="{route_tag}" title="{route_tag}-Route" color="660000" '
+        f'oppositeColor="ffffff" latMin="{LAT_RANGE[0]}" latMax="{LAT_RANGE[1]}" '
+        f'lonMin="{LON_RANGE[0]}" lonMax="{LON_RANGE[1]}">',
+    ]
+    stop_tags = [f"{route_tag}-{index}" for index in range(stop_count)]
+    for index, stop_tag in enumerate(stop_tags):
+        lines.append(
+            f'<stop tag="{stop_tag}" title="Main St &amp; {index} Ave" '
+            f'lat="{rng.uniform(*LAT_RANGE):.7f}" lon="{rng.uniform(*LON_RANGE):.7f}" '
+            f'stopId="{10000 + index}"/>'
+        )
+    half = stop_count // 2
+    for direction, tags in (("I", stop_tags[:half]), ("O", stop_tags[half:])):
+        lines.append(
+            f'<direction tag="{route_tag}_{direction}" title="{direction}bound" '
+            f'name="{direction}bound" useForUI="true">'
+        )
+        lines.extend(f'<stop tag="{stop_tag}" />' for stop_tag in tags)
+        lines.append("</direction>")
+    for _ in range(path_count):
+        lines.append("<path>")
+        lines.extend(
+            f'<point lat="{rng.uniform(*LAT_RANGE):.7f}" lon="{rng.uniform(*LON_RANGE):.7f}"/>'
+            for _ in range(points_per_path)
+        )
+        lines.append("</path>")
+    lines.extend(["</route>", "</body>"])
+    return "\n".join(lines).encode("utf-8")
+
+
+def agency_route_configs(stop_count, stops_per_route=100, points_per_path=20):
+    """
+    Funtion to generate the routeConfig feeds of a whole agency
+
+    Parameters
+    ----------
+    stop_count : int
+        total number of stops in the agency
+    stops_per_route : int, optional
+        number of stops on each route, by default 100
+    points_per_path : int, optional
+        number of points in each path, by default 20
+
+    Returns
+    -------
+    list[tuple[str, bytes]]
+        tag and routeConfig feed of each route
+    """
+    configs = []
+    for index in range(max(1, stop_count // stops_per_route)):
+        route_tag = f"R{index}"
+        configs.append(
+            (
+                route_tag,
+                route_config_xml(route_tag, stops_per_route, points_per_path, seed=index),
+            )
+        )
+    return configs
+
+
+def predictions_xml(route_tag, stop_tag, prediction_count, directions=1):
+    """
+    Funtion to generate a predictions feed for a single stop
+
+    Parameters
+    ----------
+    route_tag : str
+        tag of the route
+    stop_tag : str
+        tag of the stop
+    prediction_count : int
+        number of predictions in each direction
+    directions : int, optional
+        number of directions, by default 1
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    return predictions_multi_xml([(route_tag, stop_tag)], prediction_count, directions)
+
+
+def predictions_multi_xml(stops, prediction_count, directions=1):
+    """
+    Funtion to generate a predictionsForMultiStops feed
+
+    Parameters
+    ----------
+    stops : list[tuple[str, str]]
+        (route tag, stop tag) of each stop
+    prediction_count : int
+        number of predictions in each direction of each stop
+    directions : int, optional
+        number of directions per stop, by default 1
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    epoch = 1700000000000
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', '<body copyright="synthetic">']
+    for route_tag, stop_tag in stops:
+        lines.append(
+            f'<predictions agencyTitle="Synthetic Agency" routeTitle="{route_tag}-Route" '
+            f'routeTag="{route_tag}" stopTitle="Stop {stop_tag}" stopTag="{stop_tag}">'
+        )
+        for direction in range(directions):
+            lines.append(f'<direction title="Direction {direction}">')
+            for index in range(prediction_count):
+                seconds = 97 * index + 31 * direction
+                lines.append(
+                    f'<prediction epochTime="{epoch + seconds * 1000}" seconds="{seconds}" '
+                    f'minutes="{seconds // 60}" isDeparture="false" '
+                    f'affectedByLayover="{"true" if index % 3 == 0 else "false"}" '
+                    f'dirTag="{route_tag}_{direction}" vehicle="{1000 + index}" '
+                    f'block="{route_tag}{index}" tripTag="{5000 + index}" />'
+                )
+            lines.append("</direction>")
+        lines.append("</predictions>")
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def vehicle_locations_xml(vehicle_count, route_count=20, seed=0):
+    """
+    Funtion to generate a vehicleLocations feed
+
+    Parameters
+    ----------
+    vehicle_count : int
+        number of vehicles in the feed
+    route_count : int, optional
+        number of routes the vehicles are spread over, by default 20
+    seed : int, optional
+        seed of the generated coordinates, by default 0
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    rng = random.Random(seed)
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', '<body copyright="synthetic">']
+    for index in range(vehicle_count):
+        route_tag = f"R{index % route_count}"
+        lines.append(
+            f'<vehicle id="{1000 + index}" routeTag="{route_tag}" '
+            f'dirTag="{route_tag}_{"IO"[index % 2]}" lat="{rng.uniform(*LAT_RANGE):.6f}" '
+            f'lon="{rng.uniform(*LON_RANGE):.6f}" secsSinceReport="{rng.randrange(60)}" '
+            f'predictable="true" heading="{rng.randrange(360)}" '
+            f'speedKmHr="{rng.randrange(60)}"/>'
+        )
+    lines.append('<lastTime time="1700000000000"/>')
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def schedule_xml(route_tag, stop_count, trip_count, service_classes=("wkd", "sat", "sun")):
+    """
+    Funtion to generate a schedule feed: a table per service class and direction, whose
+    trips leave every few minutes from early morning to past midnight and take two minutes
+    between stops. Every fourth trip turns back half way, leaving its last cells empty
+
+    Parameters
+    ----------
+    route_tag : str
+        tag of the route
+    stop_count : int
+        number of stops in each direction
+    trip_count : int
+        number of trips in each table
+    service_classes : tuple[str], optional
+        service classes of the tables, by default weekdays, saturdays and sundays
+
+    Returns
+    -------
+    bytes
+        the xml feed
+    """
+    first_trip = 5 * 60  # minutes after midnight
+    headway = max(1, (25 * 60 - first_trip) // max(trip_count, 1))
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', '<body copyright="synthetic">']
+    for service_class in service_classes:
+        for direction in ("Inbound", "Outbound"):
+            stop_tags = [f"{route_tag}-{index}" for index in range(stop_count)]
+            if direction == "Outbound":
+                stop_tags.reverse()
+            lines.append(
+                f'<route tag="{route_tag}" title="{route_tag}-Route" scheduleClass="synthetic" '
+                f'serviceClass="{service_class}" direction="{direction}">'
+            )
+            lines.append("<header>")
+            for stop_tag in stop_tags:
+                lines.append(f'<stop tag="{stop_tag}">Stop {stop_tag}</stop>')
+            lines.append("</header>")
+            for trip in range(trip_count):
+                lines.append(f'<tr blockID="{trip % 40}">')
+                start = first_trip + trip * headway
+                for index, stop_tag in enumerate(stop_tags):
+                    if trip % 4 == 3 and index >= stop_count // 2:
+                        lines.append(f'<stop tag="{stop_tag}" epochTime="-1">--</stop>')
+                        continue
+                    minutes = start + 2 * index
+                    lines.append(
+                        f'<stop tag="{stop_tag}" epochTime="{minutes * 60000}">'
+                        f"{minutes // 60:02d}:{minutes % 60:02d}:00</stop>"
+                    )
+                lines.append("</tr>")
+            lines.append("</route>")
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
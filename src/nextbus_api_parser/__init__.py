@@ -1,18 +1,89 @@
 """
 Recommended file to import the directory as a regular package.
 Used to expose methods and classes to library level.
+
+The modules are only imported when one of their names is first used, e.g.
+nextbus_api_parser.ApiHandler, so that importing the package (which any of its modules,
+including the command-line interface, does first) stays fast.
 """
-from nextbus_api_parser.api_handler import ApiHandler
-from nextbus_api_parser.data_classes import (
-    Agency,
-    Route,
-    Stop,
-    Direction,
-    Path,
-    Point,
-    Predictions,
-    Directions,
-    Prediction,
-    Error,
-    get_xml_atrribute_value,
-)
+
+import importlib
+
+EXPORTS = {
+    "api_handler": ("ApiHandler",),
+    "async_api_handler": ("AsyncApiHandler",),
+    "cache": ("ResponseCache",),
+    "single_flight": ("SingleFlight", "AsyncSingleFlight"),
+    "instrumentation": ("MetricsRegistry", "RequestMetrics"),
+    "rate_limiter": (
+        "TokenBucket",
+        "RateLimiter",
+        "RetryPolicy",
+        "PRIORITY_INTERACTIVE",
+        "PRIORITY_DEFAULT",
+        "PRIORITY_BULK",
+    ),
+    "parser_backends": (
+        "SaxBackend",
+        "ExpatBackend",
+        "LxmlBackend",
+        "get_backend",
+    ),
+    "route_store": ("RouteStore", "StoredRoute"),
+    "lazy_route": ("LazyRoute",),
+    "exporter": ("AgencyExporter",),
+    "stop_index": ("StopIndex", "haversine"),
+    "vehicle_tracker": ("VehicleTracker",),
+    "prediction_refresher": ("PredictionRefresher", "Subscription"),
+    "data_classes": (
+        "Agency",
+        "Route",
+        "Stop",
+        "Direction",
+        "Path",
+        "PathPoints",
+        "Point",
+        "Predictions",
+        "Directions",
+        "Prediction",
+        "VehicleLocations",
+        "Vehicle",
+        "Schedule",
+        "Error",
+        "get_xml_atrribute_value",
+        "get_xml_float",
+        "get_xml_int",
+        "get_xml_bool",
+    ),
+}  # module -> names it exposes at library level
+
+MODULE_BY_NAME = {name: module for module, names in EXPORTS.items() for name in names}
+
+__all__ = list(MODULE_BY_NAME)
+
+
+def __getattr__(name):
+    """
+    Funtion called for the names that haven't been imported yet, which imports the module
+    exposing them
+
+    Parameters
+    ----------
+    name : str
+        name looked up in the package
+
+    Returns
+    -------
+    any
+        the class, function or constant
+    """
+    module = MODULE_BY_NAME.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value  # later lookups don't go through __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
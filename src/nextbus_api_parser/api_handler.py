@@ -3,24 +3,41 @@
     the NextBus API
 """
 
-from xml.sax import make_parser
-from xml.sax.handler import feature_namespaces
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.instrumentation import RequestMetrics, count_objects
+from nextbus_api_parser.lazy_route import LazyRoute
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.single_flight import SingleFlight
+from nextbus_api_parser.transport import HttpTransport
 from nextbus_api_parser.xml_handlers import (
+    ROUTE_PARTS,
     AgencyListHandler,
     RouteListHandler,
     RouteDetailsHandler,
     PredictionsHandler,
+    ScheduleHandler,
+    StreamingRouteDetailsHandler,
+    VehicleLocationsHandler,
+    get_route_parts,
 )
 
 
-class ApiHandler:
+class BaseApiHandler:
     """
-    Class designed to query and parse the API for specific data.
+    Class holding the API queries shared by the synchronous and asynchronous API handlers
 
     NOTE
     The parameters passed to the API are always Tags e.g. if you want
     to pass a specific bus stop to the API, you'd pass
     the tag associated with that bus stop to the API query.
+
+    Parameters
+    ----------
+    domain : str, optional
+        root url used in place of DOMAIN e.g. to query a mirror or a local stub server,
+        by default DOMAIN
     """
 
     DOMAIN = (
@@ -41,11 +58,446 @@ class ApiHandler:
         DOMAIN + "command=predictions&a={}&r={}&s={}"
     )  # API query string to get
     # predictions for a specific bus stop
+    PREDICTIONS_MULTI_QUERY = (
+        DOMAIN + "command=predictionsForMultiStops&a={}"
+    )  # API query string to get
+    # predictions for several bus stops at once, followed by one MULTI_STOP_PARAM per stop
+    VEHICLE_LOCATIONS_QUERY = (
+        DOMAIN + "command=vehicleLocations&a={}&t={}"
+    )  # API query string to get the locations of an agency's vehicles reported since a time
+    # in milliseconds since the epoch (0 for the last 15 minutes), optionally followed by
+    # ROUTE_PARAM
+    SCHEDULE_QUERY = (
+        DOMAIN + "command=schedule&a={}&r={}"
+    )  # API query string to get the scheduled times of a route
+    ROUTE_PARAM = "&r={}"  # tag of the route a query is narrowed to
+    MULTI_STOP_PARAM = "&stops={}|{}"  # route and stop tag of a single stop in a multi query
+    MAX_QUERY_LENGTH = 2000  # longest query url that is safely accepted by servers and proxies
+    MAX_STOPS_PER_QUERY = 150  # most stops the API accepts in a single multi query
+
+    def __init__(self, domain=None):
+        self.domain = domain or self.DOMAIN
+
+    def build_query(self, query, *args):
+        """
+        Method to fill in one of the API query strings, rooted at this handler's domain
+
+        Parameters
+        ----------
+        query : str
+            one of the *_QUERY API query strings
+        *args : str
+            values of the query's parameters
+
+        Returns
+        -------
+        str
+            API query
+        """
+        query = query.format(*args)
+        if self.domain != self.DOMAIN:
+            query = self.domain + query[len(self.DOMAIN):]
+        return query
+
+    def get_vehicle_locations_query(self, agency_tag, route_tag=None, since=None):
+        """
+        Method to build the query for the locations of an agency's vehicles
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str, optional
+            NextBus API tag of the route being queried, by default every route
+        since : int, optional
+            only get the vehicles reported after this time in milliseconds since the epoch,
+            by default those reported in the last 15 minutes
+
+        Returns
+        -------
+        str
+            API query
+        """
+        query = self.build_query(self.VEHICLE_LOCATIONS_QUERY, agency_tag, since or 0)
+        if route_tag is not None:
+            query += self.ROUTE_PARAM.format(route_tag)
+        return query
+
+    def get_multi_stop_queries(self, agency_tag, stops):
+        """
+        Method to split a list of stops into URL-length-safe predictionsForMultiStops queries
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        stops : list[tuple[str, str]]
+            (route tag, stop tag) pairs of the stops being queried
+
+        Returns
+        -------
+        list[str]
+            API queries which together cover every stop
+        """
+        return [query for query, _ in self.get_multi_stop_chunks(agency_tag, stops)]
+
+    def get_multi_stop_chunks(self, agency_tag, stops):
+        """
+        Method to split a list of stops into URL-length-safe predictionsForMultiStops queries,
+        along with the stops covered by each query
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        stops : list[tuple[str, str]]
+            (route tag, stop tag) pairs of the stops being queried
+
+        Returns
+        -------
+        list[tuple[str, list[tuple[str, str]]]]
+            (API query, (route tag, stop tag) pairs of its stops) for each query, which
+            together cover every stop
+        """
+        chunks = []
+        base_query = self.build_query(self.PREDICTIONS_MULTI_QUERY, agency_tag)
+        query = base_query
+        chunk = []
+        for route_tag, stop_tag in stops:
+            stop_param = self.MULTI_STOP_PARAM.format(route_tag, stop_tag)
+            if chunk and (
+                len(query) + len(stop_param) > self.MAX_QUERY_LENGTH
+                or len(chunk) >= self.MAX_STOPS_PER_QUERY
+            ):
+                # the current query is full, start a new one
+                chunks.append((query, chunk))
+                query = base_query
+                chunk = []
+            query += stop_param
+            chunk.append((route_tag, stop_tag))
+        if chunk:
+            chunks.append((query, chunk))
+        return chunks
+
+
+class ApiHandler(BaseApiHandler):
+    """
+    Class designed to query and parse the API for specific data.
+
+    An instance can be shared between threads, every query is parsed by its own xml parser.
+    Queries are downloaded by a transport, which feeds the xml parser as the data arrives.
+
+    Parameters
+    ----------
+    domain : str, optional
+        root url used in place of DOMAIN, by default DOMAIN
+    transport : HttpTransport, optional
+        object used to download queries, by default an HttpTransport with pooled
+        keep-alive connections
+    cache : ResponseCache, optional
+        cache of parsed results that are reused instead of repeating API calls, by default
+        results aren't cached
+    route_store : RouteStore, optional
+        on-disk store of route configurations read by get_route_details before making
+        an API call, by default route configurations aren't stored
+    backend : str or parser backend, optional
+        name of the parser backend ('sax', 'expat' or 'lxml') or a backend object, by default
+        the 'expat' backend (see parser_backends)
+    coalesce : bool, optional
+        whether identical queries made at the same time by several threads share a single
+        API call and parsed result (see single_flight), by default True
+    rate_limiter : RateLimiter, optional
+        limiter every API call waits for, and is charged the size of its response by (see
+        rate_limiter), by default API calls aren't limited
+    retry : RetryPolicy, optional
+        policy used to make an API call again when the API flags an Error with should_retry
+        set, by default the Error is returned right away
+    metrics : MetricsRegistry, optional
+        registry the timings, sizes, element and object counts, cache hits and errors of
+        the API calls are recorded in (see instrumentation), by default nothing is recorded
+    """
+
+    DEFAULT_MAX_WORKERS = 8  # number of worker threads used by the map_* methods
+
+    def __init__(
+        self,
+        domain=None,
+        transport=None,
+        cache=None,
+        route_store=None,
+        backend=None,
+        coalesce=True,
+        rate_limiter=None,
+        retry=None,
+        metrics=None,
+    ):
+        BaseApiHandler.__init__(self, domain)
+        self.transport = transport if transport is not None else HttpTransport()
+        self.cache = cache
+        self.route_store = route_store
+        self.backend = get_backend(backend)
+        # the shared results are returned to every caller, like cached results
+        self.single_flight = SingleFlight() if coalesce else None
+        self.rate_limiter = rate_limiter
+        self.retry = retry
+        self.metrics = metrics
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Method to release the connections held by the transport"""
+        self.transport.close()
+
+    def parse(self, handler, query, headers=None, chunks=None):
+        """
+        Method to make an API call and parse the xml feed with the given handler
 
-    def __init__(self):
-        # Initialize xml parser and attach it to the class
-        self.parser = make_parser()
-        self.parser.setFeature(feature_namespaces, 0)
+        The rest of the feed is still downloaded, so that the connection can be reused, but
+        is no longer parsed once the handler is complete.
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+        query : str
+            API query string
+        headers : dict[str, str], optional
+            extra headers sent with the query
+        chunks : list[bytes], optional
+            list the decoded chunks of the feed are appended to, to keep the feed. Any object
+            with an append method can be passed, e.g. to digest the feed as it's downloaded
+
+        Returns
+        -------
+        TransportResponse
+            status and headers of the response
+        """
+        request_metrics = None
+        if self.metrics is not None:
+            # the handler must be wrapped before the parser reads its start handlers
+            request_metrics = RequestMetrics(query, handler)
+        # parsers are cheap to create, and one that failed part way through a document
+        # can't be reused, so every query gets its own
+        parser = self.backend.create_parser(handler)
+        parser_feed, close = parser.feed, parser.close
+        if request_metrics is not None:
+            parser_feed = request_metrics.time_parse(parser_feed)
+            close = request_metrics.time_parse(close)
+
+        def feed(data):
+            if chunks is not None:
+                chunks.append(data)
+            if not getattr(handler, "complete", False):
+                parser_feed(data)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(query)
+        try:
+            response = self.transport.fetch(query, feed, headers)
+            if self.rate_limiter is not None:
+                self.rate_limiter.charge(query, response.bytes_received)
+            if not response.not_modified and not getattr(handler, "complete", False):
+                close()
+        except Exception as exception:
+            if request_metrics is not None:
+                request_metrics.error = type(exception).__name__
+                self.metrics.record_request(request_metrics)
+            raise
+        if request_metrics is not None:
+            request_metrics.objects = count_objects(list(vars(handler).values()))
+            self.record_request(request_metrics, handler, response)
+        return response
+
+    def iter_parse(self, handler, query, records_name):
+        """
+        Generator that makes an API call and yields the records built by the given handler
+        while the xml feed is still being downloaded
+
+        The handler parses each chunk of the feed as soon as it arrives, the records it has
+        completed are then yielded and dropped, so memory use doesn't grow with the size of
+        the feed. Results are never cached.
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+        query : str
+            API query string
+        records_name : str
+            name of the handler attribute listing the records it has completed
+
+        Yields
+        ------
+        any
+            the next record, or the Error flagged by the API as the last record
+        """
+        request_metrics = None
+        if self.metrics is not None:
+            request_metrics = RequestMetrics(query, handler)
+        parser = self.backend.create_parser(handler)
+        feed, close = parser.feed, parser.close
+        if request_metrics is not None:
+            feed, close = request_metrics.time_parse(feed), request_metrics.time_parse(close)
+        records = getattr(handler, records_name)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(query)
+        try:
+            with self.transport.open(query) as response:
+                try:
+                    for data in response.iter_body():
+                        feed(data)
+                        if records and handler.error is None:
+                            if request_metrics is not None:
+                                request_metrics.objects += count_objects(records)
+                            yield from records
+                            records.clear()
+                finally:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.charge(query, response.bytes_received)
+            close()
+        except Exception as exception:
+            if request_metrics is not None:
+                request_metrics.error = type(exception).__name__
+                self.metrics.record_request(request_metrics)
+            raise
+        if request_metrics is not None:
+            if handler.error is None:
+                request_metrics.objects += count_objects(records)
+            self.record_request(request_metrics, handler, response)
+        if handler.error is not None:
+            yield handler.error
+        else:
+            yield from records
+            records.clear()
+
+    def record_request(self, request_metrics, handler, response):
+        """
+        Method to record the measurements of an API call that completed in the metrics
+        registry
+
+        Parameters
+        ----------
+        request_metrics : RequestMetrics
+            measurements taken while the feed was parsed
+        handler : xml.sax.ContentHandler
+            handler that parsed the feed
+        response : TransportResponse
+            response of the API call
+        """
+        request_metrics.set_response(response)
+        if handler.error is not None:
+            request_metrics.error = type(handler.error).__name__
+        self.metrics.record_request(request_metrics)
+
+    def get_result(self, query, handler_class, result_name, key=None):
+        """
+        Method to get the parsed result of an API call, from the cache if it's still fresh
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        handler_class : callable
+            class of the xml handler that parses the feed, or a function creating the handler
+        result_name : str
+            name of the handler attribute holding the result once parsed
+        key : str, optional
+            key the result is cached and coalesced under, by default the query. Results
+            parsed differently from the same query need their own key
+
+        Returns
+        -------
+        any
+            The parsed result, or the Error flagged by the API
+        """
+        key = key or query
+        return self.get_cached(key, self.fetch_result, query, handler_class, result_name, key)
+
+    def get_cached(self, key, method, *args):
+        """
+        Method to get a result from the cache if it's still fresh, or else from one of the
+        fetch_* methods, sharing the call with identical ones in progress and retrying it as
+        the retry policy allows
+
+        Parameters
+        ----------
+        key : str
+            key the result is cached and coalesced under, usually the API query string
+        method : callable
+            bound fetch_* method of this class, which caches the result under key
+        *args : any
+            positional arguments of the method
+
+        Returns
+        -------
+        any
+            The result, or the Error flagged by the API
+        """
+        if self.cache is not None:
+            result = self.cache.get(key)
+            if result is not None:
+                if self.metrics is not None:
+                    self.metrics.record_cache_hit(key)
+                return result
+        if self.single_flight is not None:
+            return self.single_flight.do(key, self.call_with_retries, method, *args)
+        return self.call_with_retries(method, *args)
+
+    def call_with_retries(self, method, *args):
+        """
+        Method to call one of the fetch_* methods, calling it again as the retry policy
+        allows while it returns an Error with should_retry set
+
+        Parameters
+        ----------
+        method : callable
+            bound fetch_* method of this class
+        *args : any
+            positional arguments of the method
+
+        Returns
+        -------
+        any
+            The result of the last call
+        """
+        if self.retry is None:
+            return method(*args)
+        return self.retry.call(method, *args)
+
+    def fetch_result(self, query, handler_class, result_name, key=None):
+        """
+        Method to make an API call and parse its result, skipping the cache lookup and
+        request coalescing done by get_result
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        handler_class : callable
+            class of the xml handler that parses the feed, or a function creating the handler
+        result_name : str
+            name of the handler attribute holding the result once parsed
+        key : str, optional
+            key the result is cached under, by default the query
+
+        Returns
+        -------
+        any
+            The parsed result, or the Error flagged by the API
+        """
+        handler = handler_class()
+        response = self.parse(handler, query)
+        if handler.error is not None:
+            # if an error was flagged, return the error instead
+            return handler.error
+        result = getattr(handler, result_name)
+        if self.cache is not None:
+            self.cache.put(key or query, result, response.bytes_decoded)
+        return result
 
     def get_agencies(self):
         """
@@ -56,12 +508,8 @@ class ApiHandler:
         list[Agency]
             Available agencies
         """
-        handler = AgencyListHandler()
-        query = self.AGENCY_LIST_QUERY
-        self.parser.setContentHandler(handler)
-        self.parser.parse(query)
-        # if an error was flagged, return the error instead
-        return handler.agencies if (handler.error is None) else handler.error
+        query = self.build_query(self.AGENCY_LIST_QUERY)
+        return self.get_result(query, AgencyListHandler, "agencies")
 
     def get_routes(self, agency_tag):
         """
@@ -77,35 +525,184 @@ class ApiHandler:
         list[Route]
             Routes associated with the agency
         """
-        handler = RouteListHandler()
-        query = self.ROUTE_LIST_QUERY.format(agency_tag)
-        self.parser.setContentHandler(handler)
-        self.parser.parse(query)
-        # if an error was flagged, return the error instead
-        return handler.routes if (handler.error is None) else handler.error
+        query = self.build_query(self.ROUTE_LIST_QUERY, agency_tag)
+        return self.get_result(query, RouteListHandler, "routes")
 
-    def get_route_details(self, agency_tag, route_tag):
+    def get_route_details(self, agency_tag, route_tag, parts=None, lazy=False):
         """
         Method to make an API call to get a detailed description of a specific route
 
+        The route store always keeps whole routes, so it's only used when every part of the
+        route is parsed right away.
+
         Parameters
         ----------
         agency_tag : str
             NextBus API tag of the agency being queried
         route_tag : str
             NextBus API tag of the route being queried
+        parts : iterable[str], optional
+            parts of the route to parse among 'stops', 'directions' and 'paths', by default
+            all of them. The others are skipped while parsing and left empty, e.g.
+            parts=("stops",) skips the paths, which make up most of the feed
+        lazy : bool, optional
+            if True, return a LazyRoute that keeps the feed and only parses its stops,
+            directions or paths when they're first accessed, parts is then ignored.
+            By default False
 
         Returns
         -------
         Route
             Detailed description of the queried route
         """
-        handler = RouteDetailsHandler()
-        query = self.ROUTE_DETAILS_QUERY.format(agency_tag, route_tag)
-        self.parser.setContentHandler(handler)
-        self.parser.parse(query)
-        # if an error was flagged, return the error instead
-        return handler.route if (handler.error is None) else handler.error
+        query = self.build_query(self.ROUTE_DETAILS_QUERY, agency_tag, route_tag)
+        if lazy:
+            key = query + "#lazy"
+            return self.get_cached(key, self.fetch_lazy_route_details, query, key)
+        parts = get_route_parts(parts)
+        if parts != ROUTE_PARTS:
+            return self.get_result(
+                query,
+                partial(RouteDetailsHandler, parts),
+                "route",
+                query + "#parts=" + ",".join(parts),
+            )
+        if self.route_store is None:
+            return self.get_result(query, RouteDetailsHandler, "route")
+        return self.get_cached(
+            query, self.fetch_stored_route_details, query, agency_tag, route_tag
+        )
+
+    def fetch_lazy_route_details(self, query, key):
+        """
+        Method to make an API call for a detailed description of a specific route, only
+        parsing the route itself and keeping the rest of the feed to be parsed on demand
+
+        Parameters
+        ----------
+        query : str
+            API query string of the route
+        key : str
+            key the route is cached under
+
+        Returns
+        -------
+        LazyRoute
+            Detailed description of the queried route
+        """
+        handler = RouteDetailsHandler(())
+        chunks = []
+        response = self.parse(handler, query, chunks=chunks)
+        if handler.error is not None:
+            # if an error was flagged, return the error instead
+            return handler.error
+        route = LazyRoute(handler.route, b"".join(chunks), self.backend)
+        if self.cache is not None:
+            self.cache.put(key, route, response.bytes_decoded)
+        return route
+
+    def fetch_stored_route_details(self, query, agency_tag, route_tag):
+        """
+        Method to get a detailed description of a specific route from the route store,
+        making an API call if it's missing or stale
+
+        Parameters
+        ----------
+        query : str
+            API query string of the route
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+
+        Returns
+        -------
+        Route
+            Detailed description of the queried route
+        """
+        stored_route = self.route_store.load(agency_tag, route_tag)
+        if stored_route is not None and self.route_store.is_fresh(stored_route):
+            route = stored_route.route
+            size = stored_route.size
+        else:
+            # ask the API to only send the route if it changed since it was stored
+            headers = stored_route.get_validators() if stored_route is not None else None
+            handler = RouteDetailsHandler()
+            response = self.parse(handler, query, headers)
+            if response.not_modified:
+                self.route_store.touch(agency_tag, route_tag)
+                route = stored_route.route
+                size = stored_route.size
+            elif handler.error is not None:
+                # if an error was flagged, return the error instead
+                return handler.error
+            else:
+                route = handler.route
+                size = response.bytes_decoded
+                self.route_store.save(
+                    agency_tag,
+                    route_tag,
+                    route,
+                    response.headers.get("ETag", ""),
+                    response.headers.get("Last-Modified", ""),
+                    size,
+                )
+        if self.cache is not None:
+            self.cache.put(query, route, size)
+        return route
+
+    def iter_agencies(self):
+        """
+        Generator that makes an API call for the available agencies and yields each
+        agency as soon as it's parsed
+
+        Yields
+        ------
+        Agency
+            the next available agency, or the Error flagged by the API
+        """
+        query = self.build_query(self.AGENCY_LIST_QUERY)
+        yield from self.iter_parse(AgencyListHandler(), query, "agencies")
+
+    def iter_routes(self, agency_tag):
+        """
+        Generator that makes an API call for the routes associated with an agency and
+        yields each route as soon as it's parsed
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+
+        Yields
+        ------
+        Route
+            the next route associated with the agency, or the Error flagged by the API
+        """
+        query = self.build_query(self.ROUTE_LIST_QUERY, agency_tag)
+        yield from self.iter_parse(RouteListHandler(), query, "routes")
+
+    def iter_route_details(self, agency_tag, route_tag):
+        """
+        Generator that makes an API call for a detailed description of a specific route and
+        yields its parts as soon as they are parsed
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+
+        Yields
+        ------
+        Route | Stop | Direction | Path | Point
+            the Route (without its stops, directions and paths), then each of its Stops,
+            each of its Directions, and each of its Paths followed by the Points of that
+            path. Or the Error flagged by the API
+        """
+        query = self.build_query(self.ROUTE_DETAILS_QUERY, agency_tag, route_tag)
+        yield from self.iter_parse(StreamingRouteDetailsHandler(), query, "records")
 
     def get_predictions(self, agency_tag, route_tag, stop_tag):
         """
@@ -125,9 +722,175 @@ class ApiHandler:
         Predictions
             Header data and a list of bus predictions at a bus stop from the API
         """
-        handler = PredictionsHandler()
-        query = self.PREDICTIONS_QUERY.format(agency_tag, route_tag, stop_tag)
-        self.parser.setContentHandler(handler)
-        self.parser.parse(query)
-        # if an error was flagged, return the error instead
-        return handler.predictions if (handler.error is None) else handler.error
+        query = self.build_query(
+            self.PREDICTIONS_QUERY, agency_tag, route_tag, stop_tag
+        )
+        return self.get_result(query, PredictionsHandler, "predictions")
+
+    def get_predictions_multi(self, agency_tag, stops):
+        """
+        Method to make batched API calls to get bus predictions for several stops of an agency
+
+        The stops are split into as few predictionsForMultiStops queries as the maximum
+        query length allows, rather than making one query per stop. The API answers a query
+        with a single Error if any of its stops is invalid, so an Error only stands for the
+        stops of the query it was flagged for, the other queries keep their predictions.
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        stops : list[tuple[str, str]]
+            (route tag, stop tag) pairs of the stops being queried
+
+        Returns
+        -------
+        dict[tuple[str, str], Predictions | Error]
+            Header data and a list of bus predictions for each stop, or the Error flagged by
+            the API for the query of the stop, keyed by (route tag, stop tag)
+        """
+        results = {}
+        for query, chunk in self.get_multi_stop_chunks(agency_tag, stops):
+            predictions_list = self.get_result(query, PredictionsHandler, "predictions_list")
+            if isinstance(predictions_list, Error):
+                results.update(dict.fromkeys(chunk, predictions_list))
+                continue
+            for predictions in predictions_list:
+                results[(predictions.route_tag, predictions.stop_tag)] = predictions
+        return results
+
+    def get_vehicle_locations(self, agency_tag, route_tag=None, since=None):
+        """
+        Method to make an API call to get the locations of an agency's vehicles
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str, optional
+            NextBus API tag of the route being queried, by default every route
+        since : int, optional
+            only get the vehicles reported after this time in milliseconds since the epoch,
+            usually the last_time of the previous call, by default those reported in the
+            last 15 minutes
+
+        Returns
+        -------
+        VehicleLocations
+            Locations of the vehicles, with the time to pass as since in the next call
+        """
+        query = self.get_vehicle_locations_query(agency_tag, route_tag, since)
+        return self.get_result(query, VehicleLocationsHandler, "vehicle_locations")
+
+    def get_schedule(self, agency_tag, route_tag):
+        """
+        Method to make an API call to get the schedule of a route, e.g. to fall back on when
+        few predictions are available
+
+        The schedule is parsed as it's downloaded into packed arrays of times per stop and
+        service class, see Schedule.get_departures to look up the next scheduled times
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+
+        Returns
+        -------
+        Schedule
+            Scheduled times of the route at each of its stops, per service class
+        """
+        query = self.build_query(self.SCHEDULE_QUERY, agency_tag, route_tag)
+        return self.get_result(query, ScheduleHandler, "schedule")
+
+    def map_predictions(self, requests, max_workers=None):
+        """
+        Method to concurrently get bus predictions for several stops
+
+        Parameters
+        ----------
+        requests : list[tuple[str, str, str]]
+            (agency tag, route tag, stop tag) of each stop being queried
+        max_workers : int, optional
+            number of worker threads, by default DEFAULT_MAX_WORKERS
+
+        Returns
+        -------
+        list[Predictions | Error]
+            Predictions for each request, in the same order as requests. A failed request
+            yields an Error without stopping the others
+        """
+        return self.map_requests(self.get_predictions, requests, max_workers)
+
+    def map_route_details(self, requests, max_workers=None):
+        """
+        Method to concurrently get detailed descriptions of several routes
+
+        Parameters
+        ----------
+        requests : list[tuple[str, str]]
+            (agency tag, route tag) of each route being queried
+        max_workers : int, optional
+            number of worker threads, by default DEFAULT_MAX_WORKERS
+
+        Returns
+        -------
+        list[Route | Error]
+            Detailed description of each route, in the same order as requests. A failed
+            request yields an Error without stopping the others
+        """
+        return self.map_requests(self.get_route_details, requests, max_workers)
+
+    def map_requests(self, method, requests, max_workers=None):
+        """
+        Method to concurrently call one of this class' get_* methods for several requests
+
+        Parameters
+        ----------
+        method : callable
+            bound get_* method of this class
+        requests : list[tuple]
+            positional arguments of each call to method
+        max_workers : int, optional
+            number of worker threads, by default DEFAULT_MAX_WORKERS
+
+        Returns
+        -------
+        list[any]
+            Result of each call, in the same order as requests. An exception raised by a
+            call is returned as an Error instead
+        """
+        requests = list(requests)
+        if not requests:
+            return []
+        max_workers = min(max_workers or self.DEFAULT_MAX_WORKERS, len(requests))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(
+                executor.map(lambda arguments: call_safely(method, arguments), requests)
+            )
+
+
+def call_safely(method, arguments):
+    """
+    Funtion to call a method, turning any exception it raises into an Error
+
+    Parameters
+    ----------
+    method : callable
+        method to call
+    arguments : tuple
+        positional arguments of the call
+
+    Returns
+    -------
+    any
+        Result of the call, or an Error describing the exception it raised
+    """
+    try:
+        return method(*arguments)
+    except Exception as exception:  # pylint: disable=broad-except
+        error = Error({})
+        error.set_message(f"{type(exception).__name__}: {exception}")
+        return error
@@ -0,0 +1,498 @@
+"""
+    Module contains the asynchronous API handler class used in handling queries to
+    the NextBus API from asyncio applications
+"""
+
+import asyncio
+import ssl
+import zlib
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from nextbus_api_parser.api_handler import BaseApiHandler
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.single_flight import AsyncSingleFlight
+from nextbus_api_parser.xml_handlers import (
+    AgencyListHandler,
+    RouteListHandler,
+    RouteDetailsHandler,
+    PredictionsHandler,
+    ScheduleHandler,
+    VehicleLocationsHandler,
+)
+
+
+class AsyncApiHandler(BaseApiHandler):
+    """
+    Class designed to query and parse the API for specific data from asyncio code.
+
+    HTTP connections are kept alive and reused between queries, and the bytes of each
+    response are fed to the xml handlers as they arrive rather than once the whole
+    response has been downloaded. The instance should be closed once it's no longer needed,
+    either with close() or by using it as an async context manager.
+
+    The connections and the limit on the queries in flight belong to the event loop they
+    were created on. An instance can be used again from another event loop, e.g. in a
+    second asyncio.run(), in which case they're created again on the new loop. It should
+    still be closed before the end of each loop, which can't close its connections once
+    it's stopped.
+
+    Parameters
+    ----------
+    domain : str, optional
+        root url used in place of DOMAIN, by default DOMAIN
+    max_connections : int, optional
+        most queries in flight at once, by default DEFAULT_MAX_CONNECTIONS
+    timeout : float, optional
+        seconds after which a query is abandoned, by default DEFAULT_TIMEOUT
+    backend : str or parser backend, optional
+        name of the parser backend ('sax', 'expat' or 'lxml') or a backend object, by default
+        the 'expat' backend (see parser_backends)
+    coalesce : bool, optional
+        whether identical queries awaited at the same time share a single API call and
+        parsed result (see single_flight), by default True
+    """
+
+    DEFAULT_MAX_CONNECTIONS = 8
+    DEFAULT_TIMEOUT = 30
+    READ_SIZE = 65536  # most bytes read from a connection at a time
+    REQUEST = (
+        "GET {} HTTP/1.1\r\n"
+        "Host: {}\r\n"
+        "User-Agent: nextbus_api_parser\r\n"
+        "Accept-Encoding: gzip\r\n"
+        "Connection: keep-alive\r\n\r\n"
+    )  # HTTP request sent for every API query
+
+    def __init__(
+        self, domain=None, max_connections=None, timeout=None, backend=None, coalesce=True
+    ):
+        BaseApiHandler.__init__(self, domain)
+        self.backend = get_backend(backend)
+        # the shared results are returned to every caller
+        self.single_flight = AsyncSingleFlight() if coalesce else None
+        self.max_connections = max_connections or self.DEFAULT_MAX_CONNECTIONS
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        # the semaphore is created on first use so that it belongs to the running event loop
+        self._semaphore = None
+        self._loop = None  # event loop the semaphore and the connections belong to
+        self._ssl_context = None
+        # idle keep-alive connections, keyed by (scheme, host, port)
+        self._idle_connections = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Method to close every idle keep-alive connection, waiting until they're closed"""
+        connections, self._idle_connections = self._idle_connections, {}
+        if self._loop is not asyncio.get_running_loop():
+            # the connections were opened on another loop, which can't close them anymore
+            return
+        await asyncio.gather(
+            *(_close_connection(writer) for pool in connections.values() for _, writer in pool)
+        )
+
+    async def parse(self, handler, query):
+        """
+        Method to make an API call and feed the xml feed to the given handler as it arrives
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+        query : str
+            API query string
+        """
+        self._use_running_loop()
+        async with self._semaphore:
+            await asyncio.wait_for(self._fetch(handler, query), self.timeout)
+
+    async def get_result(self, query, handler_class, result_name):
+        """
+        Coroutine to get the parsed result of an API call, sharing the call in progress
+        with the same query if there is one
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        handler_class : type
+            class of the xml handler that parses the feed
+        result_name : str
+            name of the handler attribute holding the result once parsed
+
+        Returns
+        -------
+        any
+            The parsed result, or the Error flagged by the API
+        """
+        self._use_running_loop()
+        if self.single_flight is not None:
+            return await self.single_flight.do(
+                query, self.fetch_result, query, handler_class, result_name
+            )
+        return await self.fetch_result(query, handler_class, result_name)
+
+    async def fetch_result(self, query, handler_class, result_name):
+        """
+        Coroutine to make an API call and parse its result, without sharing it
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        handler_class : type
+            class of the xml handler that parses the feed
+        result_name : str
+            name of the handler attribute holding the result once parsed
+
+        Returns
+        -------
+        any
+            The parsed result, or the Error flagged by the API
+        """
+        handler = handler_class()
+        await self.parse(handler, query)
+        # if an error was flagged, return the error instead
+        return getattr(handler, result_name) if (handler.error is None) else handler.error
+
+    async def get_agencies(self):
+        """
+        Coroutine to make an API call to get a list of available agencies
+
+        Returns
+        -------
+        list[Agency]
+            Available agencies
+        """
+        query = self.build_query(self.AGENCY_LIST_QUERY)
+        return await self.get_result(query, AgencyListHandler, "agencies")
+
+    async def get_routes(self, agency_tag):
+        """
+        Coroutine to make an API call to get a list of routes associated with an agency
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+
+        Returns
+        -------
+        list[Route]
+            Routes associated with the agency
+        """
+        query = self.build_query(self.ROUTE_LIST_QUERY, agency_tag)
+        return await self.get_result(query, RouteListHandler, "routes")
+
+    async def get_route_details(self, agency_tag, route_tag):
+        """
+        Coroutine to make an API call to get a detailed description of a specific route
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+
+        Returns
+        -------
+        Route
+            Detailed description of the queried route
+        """
+        query = self.build_query(self.ROUTE_DETAILS_QUERY, agency_tag, route_tag)
+        return await self.get_result(query, RouteDetailsHandler, "route")
+
+    async def get_predictions(self, agency_tag, route_tag, stop_tag):
+        """
+        Coroutine to make an API call to get bus predictions for a specific stop on a route
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+        stop_tag : str
+            NextBus API tag of the stop being queried
+
+        Returns
+        -------
+        Predictions
+            Header data and a list of bus predictions at a bus stop from the API
+        """
+        query = self.build_query(self.PREDICTIONS_QUERY, agency_tag, route_tag, stop_tag)
+        return await self.get_result(query, PredictionsHandler, "predictions")
+
+    async def get_predictions_multi(self, agency_tag, stops):
+        """
+        Coroutine to make concurrent batched API calls to get bus predictions for several
+        stops of an agency. An Error flagged by the API only stands for the stops of the
+        query it was flagged for, as in ApiHandler.get_predictions_multi
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        stops : list[tuple[str, str]]
+            (route tag, stop tag) pairs of the stops being queried
+
+        Returns
+        -------
+        dict[tuple[str, str], Predictions | Error]
+            Header data and a list of bus predictions for each stop, or the Error flagged by
+            the API for the query of the stop, keyed by (route tag, stop tag)
+        """
+        chunks = self.get_multi_stop_chunks(agency_tag, stops)
+        predictions_lists = await asyncio.gather(
+            *(
+                self.get_result(query, PredictionsHandler, "predictions_list")
+                for query, _ in chunks
+            )
+        )
+        results = {}
+        for (_, chunk), predictions_list in zip(chunks, predictions_lists):
+            if isinstance(predictions_list, Error):
+                results.update(dict.fromkeys(chunk, predictions_list))
+                continue
+            for predictions in predictions_list:
+                results[(predictions.route_tag, predictions.stop_tag)] = predictions
+        return results
+
+    async def get_vehicle_locations(self, agency_tag, route_tag=None, since=None):
+        """
+        Coroutine to make an API call to get the locations of an agency's vehicles
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str, optional
+            NextBus API tag of the route being queried, by default every route
+        since : int, optional
+            only get the vehicles reported after this time in milliseconds since the epoch,
+            by default those reported in the last 15 minutes
+
+        Returns
+        -------
+        VehicleLocations
+            Locations of the vehicles, with the time to pass as since in the next call
+        """
+        query = self.get_vehicle_locations_query(agency_tag, route_tag, since)
+        return await self.get_result(query, VehicleLocationsHandler, "vehicle_locations")
+
+    async def get_schedule(self, agency_tag, route_tag):
+        """
+        Coroutine to make an API call to get the schedule of a route
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+
+        Returns
+        -------
+        Schedule
+            Scheduled times of the route at each of its stops, per service class
+        """
+        query = self.build_query(self.SCHEDULE_QUERY, agency_tag, route_tag)
+        return await self.get_result(query, ScheduleHandler, "schedule")
+
+    def _use_running_loop(self):
+        """
+        Method to create the semaphore on first use, and again along with the pool of
+        connections and the shared calls whenever the instance is used from another loop
+        """
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._semaphore = asyncio.Semaphore(self.max_connections)
+        # the connections of the previous loop can't be read from this one
+        self._idle_connections = {}
+        if self.single_flight is not None:
+            self.single_flight = AsyncSingleFlight()
+
+    async def _fetch(self, handler, query):
+        """
+        Method to send a query over a pooled connection and parse its response
+
+        An idle connection may have been closed by the server in the meantime, in which
+        case the query is sent again over a new connection
+        """
+        url = urlsplit(query)
+        default_port = 443 if url.scheme == "https" else 80
+        key = (url.scheme, url.hostname, url.port or default_port)
+        host = url.netloc.rpartition("@")[2]
+        path = (url.path or "/") + ("?" + url.query if url.query else "")
+        request = self.REQUEST.format(path, host).encode("latin-1")
+
+        pool = self._idle_connections.setdefault(key, [])
+        while pool:
+            reader, writer = pool.pop()
+            if reader.at_eof():
+                await _close_connection(writer)
+                continue
+            try:
+                await self._request(key, reader, writer, request, query, handler, True)
+                return
+            except _StaleConnection:
+                # _request has closed the connection, try the next one
+                pass
+        reader, writer = await self._connect(key)
+        await self._request(key, reader, writer, request, query, handler, False)
+
+    async def _connect(self, key):
+        """Method to open a new connection to (scheme, host, port)"""
+        scheme, host, port = key
+        context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            context = self._ssl_context
+        return await asyncio.open_connection(host, port, ssl=context)
+
+    async def _request(self, key, reader, writer, request, query, handler, reused):
+        """Method to send a request over a connection and feed the response to the handler"""
+        try:
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await reader.readline()
+            except ConnectionError as error:
+                if reused:
+                    raise _StaleConnection() from error
+                raise
+            if not status_line:
+                if reused:
+                    raise _StaleConnection()
+                raise ConnectionError("connection closed before a response was received")
+
+            version, status, reason = _parse_status_line(status_line)
+            headers = await _read_headers(reader)
+            if status != 200:
+                raise HTTPError(query, status, reason, headers, None)
+
+            reusable = version == "HTTP/1.1" and headers.get("connection", "") != "close"
+            parser = self.backend.create_parser(handler)
+            decoder = None
+            if headers.get("content-encoding") == "gzip":
+                decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+            if headers.get("transfer-encoding", "") == "chunked":
+                body = _iter_chunked_body(reader, self.READ_SIZE)
+            elif "content-length" in headers:
+                body = _iter_sized_body(reader, int(headers["content-length"]), self.READ_SIZE)
+            else:
+                # the end of the response is signaled by closing the connection
+                reusable = False
+                body = _iter_body_until_closed(reader, self.READ_SIZE)
+
+            async for data in body:
+                if decoder is not None:
+                    data = decoder.decompress(data)
+                if data:
+                    parser.feed(data)
+            if decoder is not None:
+                parser.feed(decoder.flush())
+        except BaseException:
+            # the state of the connection is unknown, it can't be reused. It's aborted rather
+            # than closed, so that it's closed at once even if the query was cancelled
+            writer.transport.abort()
+            raise
+
+        if reusable and len(self._idle_connections.setdefault(key, [])) < self.max_connections:
+            self._idle_connections[key].append((reader, writer))
+        else:
+            await _close_connection(writer)
+        parser.close()
+
+
+class _StaleConnection(Exception):
+    """Raised when a reused keep-alive connection turns out to have been closed"""
+
+
+async def _close_connection(writer):
+    """Coroutine to close a connection and wait until its transport is closed"""
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        # the connection was already broken, it's closed all the same
+        pass
+
+
+def _parse_status_line(status_line):
+    """
+    Funtion to split an HTTP status line
+
+    Returns
+    -------
+    tuple[str, int, str]
+        HTTP version, status code and reason phrase
+    """
+    version, status, reason = (status_line.decode("latin-1").strip().split(" ", 2) + [""])[:3]
+    return version, int(status), reason
+
+
+async def _read_headers(reader):
+    """
+    Coroutine to read the headers of an HTTP response
+
+    Returns
+    -------
+    dict[str, str]
+        headers keyed by lowercase name, values are lowercased for the headers that
+        control how the body is read
+    """
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        value = value.strip()
+        if name in ("connection", "content-encoding", "transfer-encoding"):
+            value = value.lower()
+        headers[name] = value
+
+
+async def _iter_sized_body(reader, length, read_size):
+    """Async generator of the chunks of a body with a known length"""
+    while length > 0:
+        data = await reader.read(min(length, read_size))
+        if not data:
+            raise ConnectionError("connection closed before the response was complete")
+        length -= len(data)
+        yield data
+
+
+async def _iter_chunked_body(reader, read_size):
+    """Async generator of the chunks of a body sent with chunked transfer encoding"""
+    while True:
+        size = int((await reader.readline()).split(b";")[0], 16)
+        if size == 0:
+            # skip the trailers
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return
+        async for data in _iter_sized_body(reader, size, read_size):
+            yield data
+        await reader.readline()  # the line break that ends the chunk
+
+
+async def _iter_body_until_closed(reader, read_size):
+    """Async generator of the chunks of a body that ends when the connection is closed"""
+    while True:
+        data = await reader.read(read_size)
+        if not data:
+            return
+        yield data
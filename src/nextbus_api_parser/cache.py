@@ -0,0 +1,175 @@
+"""
+    Module contains the cache used by the API handler to avoid repeating
+    API calls whose results are still fresh
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+
+class ResponseCache:
+    """
+    Class that keeps the parsed results of recent API calls, keyed by query.
+
+    Every API command has its own time to live, feeds that rarely change such as routeConfig
+    are kept for a day while predictions are only kept for a few seconds. The least recently
+    used entries are evicted once either the number of entries or their total size (the size
+    of the xml feeds they were parsed from) goes over its limit. Hits return the very objects
+    that were cached, so they shouldn't be modified. An instance can be shared between threads.
+
+    Parameters
+    ----------
+    ttls : dict[str, float], optional
+        seconds to keep the results of each API command, merged over DEFAULT_TTLS.
+        A ttl of 0 disables caching for that command
+    max_entries : int, optional
+        most results kept at once, by default DEFAULT_MAX_ENTRIES
+    max_bytes : int, optional
+        largest total size of the results kept at once, by default DEFAULT_MAX_BYTES
+    clock : callable, optional
+        function returning the current time in seconds, by default time.monotonic
+    """
+
+    DEFAULT_TTLS = {
+        "agencyList": 24 * 60 * 60,
+        "routeList": 24 * 60 * 60,
+        "routeConfig": 24 * 60 * 60,
+        "schedule": 24 * 60 * 60,
+        "predictions": 10,
+        "predictionsForMultiStops": 10,
+    }  # seconds to keep the results of each API command
+    DEFAULT_TTL = 0  # seconds to keep the results of commands missing from the ttls
+    DEFAULT_MAX_ENTRIES = 1024
+    DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, ttls=None, max_entries=None, max_bytes=None, clock=time.monotonic):
+        self.ttls = dict(self.DEFAULT_TTLS)
+        self.ttls.update(ttls or {})
+        self.max_entries = max_entries or self.DEFAULT_MAX_ENTRIES
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        self.clock = clock
+        self.hits = 0  # number of lookups that found a fresh result
+        self.misses = 0  # number of lookups that didn't
+        self.evictions = 0  # number of results dropped to respect the size limits
+        self.size = 0  # total size of the results currently kept
+        self._lock = threading.Lock()
+        # query -> (expiry time, size, result), ordered from least to most recently used
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query):
+        """
+        Method to look up the result of a query
+
+        Parameters
+        ----------
+        query : str
+            API query string
+
+        Returns
+        -------
+        any
+            The cached result, or None if there's no fresh result for the query
+        """
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(query)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(query)
+            self.misses += 1
+            return None
+
+    def put(self, query, result, size=0):
+        """
+        Method to keep the result of a query until its command's ttl runs out
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        result : any
+            parsed result of the query
+        size : int, optional
+            size of the xml feed the result was parsed from, by default 0
+        """
+        ttl = self.ttls.get(get_command(query), self.DEFAULT_TTL)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if query in self._entries:
+                self._remove(query)
+            self._entries[query] = (self.clock() + ttl, size, result)
+            self.size += size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, query=None, command=None):
+        """
+        Method to drop cached results so the next lookups go to the API
+
+        Parameters
+        ----------
+        query : str, optional
+            drop only the result of this API query string
+        command : str, optional
+            drop only the results of this API command e.g. 'routeConfig'.
+            If neither query nor command is given, every result is dropped
+        """
+        with self._lock:
+            if query is not None:
+                if query in self._entries:
+                    self._remove(query)
+            elif command is not None:
+                for cached_query in list(self._entries):
+                    if get_command(cached_query) == command:
+                        self._remove(cached_query)
+            else:
+                self._entries.clear()
+                self.size = 0
+
+    def stats(self):
+        """
+        Method to summarize how effective the cache has been
+
+        Returns
+        -------
+        dict[str, int]
+            counts of hits, misses and evictions, with the current number and size of entries
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.size,
+            }
+
+    def _remove(self, query):
+        """Method to drop an entry, the lock must be held by the caller"""
+        self.size -= self._entries.pop(query)[1]
+
+
+def get_command(query):
+    """
+    Funtion to extract the API command from a query string
+
+    Parameters
+    ----------
+    query : str
+        API query string
+
+    Returns
+    -------
+    str
+        the API command e.g. 'routeConfig', or a blank string if the query doesn't have one
+    """
+    return parse_qs(urlsplit(query).query).get("command", [""])[0]
@@ -0,0 +1,443 @@
+"""
+    Module implements the non-interactive command-line interface, which makes the API calls
+    given on the command line and writes the results to stdout as JSON lines or CSV, for
+    scripts, cron jobs and load tests
+
+    Usage: nextbus [--format jsonl|csv] [--workers 8] [--domain URL] COMMAND [TARGET ...]
+
+        nextbus agencies
+        nextbus routes AGENCY [AGENCY ...]
+        nextbus route-config [--table stops] AGENCY ROUTE [ROUTE ...]
+        nextbus predictions AGENCY ROUTE:STOP [ROUTE:STOP ...]
+        nextbus vehicles [--since MS] AGENCY [ROUTE ...]
+
+    Only argparse and sys are imported up front, the API handler and the output modules are
+    imported once the arguments have been parsed, so that --help and argument errors are
+    instant and every command only loads what it uses.
+"""
+
+import argparse
+import sys
+
+COLUMNS = {
+    "agencies": ("agency_tag", "title", "region", "short_title"),
+    "routes": ("agency_tag", "route_tag", "title", "short_title"),
+    "predictions": (
+        "agency_tag",
+        "route_tag",
+        "stop_tag",
+        "route_title",
+        "stop_title",
+        "direction_title",
+        "minutes",
+        "seconds",
+        "epoch_time",
+        "is_departure",
+        "is_schedule_based",
+        "delayed",
+        "affected_by_layover",
+        "dir_tag",
+        "trip_tag",
+        "block",
+        "branch",
+    ),
+    "vehicles": (
+        "agency_tag",
+        "vehicle_id",
+        "route_tag",
+        "dir_tag",
+        "lat",
+        "lon",
+        "secs_since_report",
+        "predictable",
+        "heading",
+        "speed_km_hr",
+        "leading_vehicle_id",
+    ),
+}  # command -> columns of its rows, route-config uses the tables of the exporter
+ROUTE_CONFIG_TABLES = ("routes", "stops", "direction_stops", "path_points")
+
+
+class JsonLinesWriter:
+    """
+    Class that writes rows to a stream as JSON objects, one per line
+
+    Parameters
+    ----------
+    output : io.TextIOBase
+        stream the rows are written to
+    columns : tuple[str]
+        names of the columns, in the order of the values of each row
+    """
+
+    def __init__(self, output, columns):
+        import json  # pylint: disable=import-outside-toplevel
+
+        self.output = output
+        self.columns = columns
+        self.dumps = json.dumps
+
+    def write_rows(self, rows):
+        """
+        Method to write rows and flush them, so that they're streamed as they're fetched
+
+        Parameters
+        ----------
+        rows : iterable[tuple]
+            values of each row
+        """
+        columns = self.columns
+        self.output.writelines(self.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+        self.output.flush()
+
+
+class CsvWriter:
+    """
+    Class that writes rows to a stream as CSV, after a header row
+
+    Parameters
+    ----------
+    output : io.TextIOBase
+        stream the rows are written to
+    columns : tuple[str]
+        names of the columns, in the order of the values of each row
+    """
+
+    def __init__(self, output, columns):
+        import csv  # pylint: disable=import-outside-toplevel
+
+        self.output = output
+        self.writer = csv.writer(output, lineterminator="\n")
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        """
+        Method to write rows and flush them, so that they're streamed as they're fetched
+
+        Parameters
+        ----------
+        rows : iterable[tuple]
+            values of each row, None values are written as empty values
+        """
+        self.writer.writerows(rows)
+        self.output.flush()
+
+
+WRITERS = {"jsonl": JsonLinesWriter, "csv": CsvWriter}  # output format -> writer class
+
+
+def get_agency_rows(agencies):
+    """
+    Funtion to generate the rows of the agencies command
+
+    Yields
+    ------
+    tuple
+        the row of each agency
+    """
+    for agency in agencies:
+        yield (agency.tag, agency.title, agency.region, agency.short)
+
+
+def get_route_list_rows(agency_tag, routes):
+    """
+    Funtion to generate the rows of the routes command
+
+    Yields
+    ------
+    tuple
+        the row of each route of the agency
+    """
+    for route in routes:
+        yield (agency_tag, route.tag, route.title, route.short)
+
+
+def get_prediction_rows(agency_tag, predictions_by_stop):
+    """
+    Funtion to generate the rows of the predictions command
+
+    Yields
+    ------
+    tuple
+        the row of each prediction of each stop, stops without predictions or whose query
+        failed have no rows
+    """
+    from nextbus_api_parser.data_classes import Error  # pylint: disable=import-outside-toplevel
+
+    for (route_tag, stop_tag), predictions in predictions_by_stop.items():
+        if isinstance(predictions, Error):
+            continue
+        for direction in predictions.directions:
+            for prediction in direction.predictions:
+                yield (
+                    agency_tag,
+                    route_tag,
+                    stop_tag,
+                    predictions.route_title,
+                    predictions.stop_title,
+                    direction.title,
+                    prediction.minutes,
+                    prediction.seconds,
+                    prediction.epoch_time,
+                    prediction.is_departure,
+                    prediction.is_schedule_based,
+                    prediction.delayed,
+                    prediction.affected_by_layover,
+                    prediction.dir_tag,
+                    prediction.trip_tag,
+                    prediction.block,
+                    prediction.branch,
+                )
+
+
+def get_vehicle_rows(agency_tag, vehicle_locations):
+    """
+    Funtion to generate the rows of the vehicles command
+
+    Yields
+    ------
+    tuple
+        the row of each vehicle
+    """
+    for vehicle in vehicle_locations.vehicles:
+        yield (
+            agency_tag,
+            vehicle.id,
+            vehicle.route_tag,
+            vehicle.dir_tag,
+            vehicle.lat,
+            vehicle.lon,
+            vehicle.secs_since_report,
+            vehicle.predictable,
+            vehicle.heading,
+            vehicle.speed_km_hr,
+            vehicle.leading_vehicle_id,
+        )
+
+
+def parse_stop(value):
+    """
+    Funtion to parse a stop given on the command line
+
+    Parameters
+    ----------
+    value : str
+        route tag and stop tag separated by a colon
+
+    Returns
+    -------
+    tuple[str, str]
+        (route tag, stop tag) of the stop
+    """
+    route_tag, separator, stop_tag = value.partition(":")
+    if not separator or not route_tag or not stop_tag:
+        raise argparse.ArgumentTypeError(f"expected ROUTE:STOP, got {value!r}")
+    return route_tag, stop_tag
+
+
+def get_argument_parser():
+    """
+    Funtion to build the parser of the command line
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        the parser, with one subparser per command
+    """
+    argument_parser = argparse.ArgumentParser(
+        prog="nextbus", description="Query the NextBus API and write the results to stdout"
+    )
+    argument_parser.add_argument(
+        "--format", choices=list(WRITERS), default="jsonl", help="output format"
+    )
+    argument_parser.add_argument(
+        "--workers", type=int, default=None, help="number of API calls made at once"
+    )
+    argument_parser.add_argument("--domain", help="root url of the API, e.g. of a stub server")
+    commands = argument_parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("agencies", help="list the agencies")
+    routes = commands.add_parser("routes", help="list the routes of agencies")
+    routes.add_argument("agencies", nargs="+", metavar="AGENCY")
+    route_config = commands.add_parser("route-config", help="describe routes of an agency")
+    route_config.add_argument("agency", metavar="AGENCY")
+    route_config.add_argument("routes", nargs="+", metavar="ROUTE")
+    route_config.add_argument(
+        "--table",
+        choices=ROUTE_CONFIG_TABLES,
+        default="stops",
+        help="part of the routes written out, one row per route, stop, stop of a direction "
+        "or point of a path",
+    )
+    predictions = commands.add_parser("predictions", help="get the predictions of stops")
+    predictions.add_argument("agency", metavar="AGENCY")
+    predictions.add_argument("stops", nargs="+", type=parse_stop, metavar="ROUTE:STOP")
+    vehicles = commands.add_parser("vehicles", help="get the locations of an agency's vehicles")
+    vehicles.add_argument("agency", metavar="AGENCY")
+    vehicles.add_argument(
+        "routes", nargs="*", metavar="ROUTE", help="routes queried, by default every route"
+    )
+    vehicles.add_argument(
+        "--since",
+        type=int,
+        default=None,
+        help="only vehicles reported since this time in milliseconds since the epoch",
+    )
+    return argument_parser
+
+
+def get_calls(arguments, api_handler):
+    """
+    Funtion to list the API calls of a command, and how their results are turned into rows
+
+    Parameters
+    ----------
+    arguments : argparse.Namespace
+        the parsed command line
+    api_handler : ApiHandler
+        handler used to make the API calls
+
+    Returns
+    -------
+    tuple[tuple[str], list[tuple[str, callable, tuple, callable]]]
+        columns of the rows, and the target, method, arguments and row generator of each
+        call. Row generators take the result of their call
+    """
+    # pylint: disable=import-outside-toplevel
+    command = arguments.command
+    if command == "agencies":
+        return COLUMNS[command], [("agencies", api_handler.get_agencies, (), get_agency_rows)]
+    if command == "routes":
+        return COLUMNS[command], [
+            (
+                agency_tag,
+                api_handler.get_routes,
+                (agency_tag,),
+                lambda routes, agency_tag=agency_tag: get_route_list_rows(agency_tag, routes),
+            )
+            for agency_tag in dict.fromkeys(arguments.agencies)
+        ]
+    if command == "route-config":
+        from nextbus_api_parser import exporter
+
+        get_rows = {
+            "routes": exporter.get_route_rows,
+            "stops": exporter.get_stop_rows,
+            "direction_stops": exporter.get_direction_stop_rows,
+            "path_points": exporter.get_path_point_rows,
+        }[arguments.table]
+        # only the part of the routes that's written out is parsed
+        parts = {"stops": ("stops",), "direction_stops": ("directions",), "path_points": ("paths",)}
+        agency_tag = arguments.agency
+        return tuple(name for name, _ in exporter.TABLES[arguments.table]), [
+            (
+                f"{agency_tag}:{route_tag}",
+                api_handler.get_route_details,
+                (agency_tag, route_tag, parts.get(arguments.table, ())),
+                lambda route, route_tag=route_tag: get_rows(agency_tag, route_tag, route),
+            )
+            for route_tag in dict.fromkeys(arguments.routes)
+        ]
+    if command == "predictions":
+        # the stops are batched into as few predictionsForMultiStops calls as possible, which
+        # are made concurrently like the calls of the other commands
+        agency_tag = arguments.agency
+        chunks = api_handler.get_multi_stop_chunks(agency_tag, dict.fromkeys(arguments.stops))
+        return COLUMNS[command], [
+            (
+                agency_tag,
+                api_handler.get_predictions_multi,
+                (agency_tag, stops),
+                lambda results: get_prediction_rows(agency_tag, results),
+            )
+            for _, stops in chunks
+        ]
+    agency_tag = arguments.agency
+    route_tags = list(dict.fromkeys(arguments.routes)) or [None]
+    return COLUMNS[command], [
+        (
+            agency_tag if route_tag is None else f"{agency_tag}:{route_tag}",
+            api_handler.get_vehicle_locations,
+            (agency_tag, route_tag, arguments.since),
+            lambda vehicle_locations: get_vehicle_rows(agency_tag, vehicle_locations),
+        )
+        for route_tag in route_tags
+    ]
+
+
+def run(arguments, output, errors):
+    """
+    Funtion to make the API calls of a command concurrently and write the rows of their
+    results as they come in, in the order of the targets
+
+    Parameters
+    ----------
+    arguments : argparse.Namespace
+        the parsed command line
+    output : io.TextIOBase
+        stream the rows are written to
+    errors : io.TextIOBase
+        stream the errors are reported on
+
+    Returns
+    -------
+    int
+        exit status, 1 if any call failed
+    """
+    # pylint: disable=import-outside-toplevel
+    from concurrent.futures import ThreadPoolExecutor
+    from nextbus_api_parser.api_handler import ApiHandler, call_safely
+    from nextbus_api_parser.data_classes import Error
+
+    status = 0
+    with ApiHandler(arguments.domain) as api_handler:
+        columns, calls = get_calls(arguments, api_handler)
+        writer = WRITERS[arguments.format](output, columns)
+        max_workers = min(arguments.workers or api_handler.DEFAULT_MAX_WORKERS, len(calls))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(lambda call: call_safely(call[1], call[2]), calls)
+            for (target, _, _, get_rows), result in zip(calls, results):
+                if isinstance(result, Error):
+                    errors.write(f"nextbus: {target}: {result.message}\n")
+                    status = 1
+                    continue
+                if isinstance(result, dict):
+                    # batched calls flag errors per stop, the other stops are still written
+                    for key, value in result.items():
+                        if isinstance(value, Error):
+                            errors.write(f"nextbus: {target}:{':'.join(key)}: {value.message}\n")
+                            status = 1
+                writer.write_rows(get_rows(result))
+    return status
+
+
+def main(arguments=None):
+    """
+    Function run by the nextbus console script
+
+    Parameters
+    ----------
+    arguments : list[str], optional
+        command line arguments, by default sys.argv[1:]
+
+    Returns
+    -------
+    int
+        exit status, 0 if every call succeeded
+    """
+    arguments = get_argument_parser().parse_args(arguments)
+    try:
+        return run(arguments, sys.stdout, sys.stderr)
+    except BrokenPipeError:
+        # the reader went away, e.g. piped to head. stdout is pointed at devnull so that
+        # flushing it at exit doesn't raise again
+        import os  # pylint: disable=import-outside-toplevel
+
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
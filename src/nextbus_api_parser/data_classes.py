@@ -1,7 +1,17 @@
 """
     Module contains the data classes used to handle data from the API
+
+    The data classes use __slots__ rather than a per-instance __dict__, since a large agency
+    is made of hundreds of thousands of them. Coordinates, times and flags are converted to
+    float, int and bool once while parsing, a missing value is stored as None
 """
 
+from array import array
+from bisect import bisect_left
+from collections.abc import Sequence
+
+NAN = float("nan")  # stored in place of missing coordinates in packed coordinate arrays
+
 
 class Agency:
     """
@@ -13,6 +23,8 @@ class Agency:
         XML attributes describing the Agency
     """
 
+    __slots__ = ("tag", "title", "region", "short")
+
     def __init__(self, attributes):
         # a tag used to identify this agency by the API
         self.tag = get_xml_atrribute_value(attributes, "tag")
@@ -37,6 +49,22 @@ class Route:
         of the route, by default False
     """
 
+    __slots__ = (
+        "tag",
+        "title",
+        "short",
+        "color",
+        "opposide_color",
+        "lat_min",
+        "lat_max",
+        "lon_min",
+        "lon_max",
+        "stops",
+        "stop_by_tag",
+        "directions",
+        "paths",
+    )
+
     def __init__(self, attributes, is_detailed=False):
         self.tag = get_xml_atrribute_value(
             attributes, "tag"
@@ -58,12 +86,14 @@ class Route:
             # contrasts most with the hex color of this route
 
             # the below cordinates express the boundaries of the route
-            self.lat_min = get_xml_atrribute_value(attributes, "latMin")
-            self.lat_max = get_xml_atrribute_value(attributes, "latMax")
-            self.lon_min = get_xml_atrribute_value(attributes, "lonMin")
-            self.lon_max = get_xml_atrribute_value(attributes, "lonMax")
+            self.lat_min = get_xml_float(attributes, "latMin")
+            self.lat_max = get_xml_float(attributes, "latMax")
+            self.lon_min = get_xml_float(attributes, "lonMin")
+            self.lon_max = get_xml_float(attributes, "lonMax")
 
             self.stops = []  # a list of stops associated with this route
+            # the same stops keyed by tag, the directions refer to them by tag
+            self.stop_by_tag = {}
             self.directions = []  # a list of directions associated with this route
             self.paths = []  # a list cordinates that the route follows
 
@@ -77,14 +107,17 @@ class Route:
             XML attributes describing the Stop
         add_to_direction : bool, optional
             If add_to_direction is false, the stop is added
-            to the list of stops associated in general with this route. Otherwise, the route is
-            being associated specifically to the last direction that was added to this route.
+            to the list of stops associated in general with this route. Otherwise, the stop
+            (which was already added to the route) is being associated specifically to the last
+            direction that was added to this route, by its tag.
             This is because of the structure of the XML tree, by default False
         """
         if add_to_direction:
             self.directions[-1].add_stop(attributes)
         else:
-            self.stops.append(Stop(attributes))
+            stop = Stop(attributes)
+            self.stops.append(stop)
+            self.stop_by_tag[stop.tag] = stop
 
     def add_direction(self, attributes):
         """
@@ -95,7 +128,7 @@ class Route:
         attributes : dict
             XML attributes describing the Direction
         """
-        self.directions.append(Direction(attributes))
+        self.directions.append(Direction(attributes, self.stop_by_tag))
 
     def add_path(self, attributes):
         """
@@ -131,6 +164,8 @@ class Stop:
         XML attributes describing the Stop
     """
 
+    __slots__ = ("tag", "title", "short_title", "stop_id", "lat", "lon")
+
     def __init__(self, attributes):
         self.tag = get_xml_atrribute_value(
             attributes, "tag"
@@ -144,10 +179,10 @@ class Stop:
         self.stop_id = get_xml_atrribute_value(
             attributes, "stopId", "unknown"
         )  # the bus stop number
-        self.lat = get_xml_atrribute_value(
+        self.lat = get_xml_float(
             attributes, "lat"
         )  # geographical latitude of the bus stop
-        self.lon = get_xml_atrribute_value(
+        self.lon = get_xml_float(
             attributes, "lon"
         )  # geographical longitude of the bus stop
 
@@ -156,13 +191,20 @@ class Direction:
     """
     Data class that stores the data about the directions of a specific route in the API
 
+    The stops of a direction are listed by tag in stop_tags, in the order the route serves
+    them, and are looked up in the stop table of the route rather than copied
+
     Parameters
     ----------
     attributes : dict
         XML attributes describing the Direction
+    stop_table : dict[str, Stop], optional
+        the stops of the route keyed by tag, by default the stops can only be listed by tag
     """
 
-    def __init__(self, attributes):
+    __slots__ = ("tag", "title", "name", "stop_tags", "stop_table")
+
+    def __init__(self, attributes, stop_table=None):
         self.tag = get_xml_atrribute_value(
             attributes, "tag"
         )  # a tag used to identify the route by the API
@@ -172,7 +214,21 @@ class Direction:
         self.name = get_xml_atrribute_value(
             attributes, "name"
         )  # a simplified name of the route
-        self.stops = []  # a list of stops associated with this route
+        self.stop_tags = []  # tags of the stops associated with this route, in order
+        self.stop_table = stop_table if stop_table is not None else {}
+
+    @property
+    def stops(self):
+        """
+        The stops associated with this direction, in order
+
+        Returns
+        -------
+        list[Stop]
+            the stops of stop_tags found in the stop table of the route
+        """
+        stop_table = self.stop_table
+        return [stop_table[tag] for tag in self.stop_tags if tag in stop_table]
 
     def add_stop(self, attributes):
         """
@@ -181,26 +237,48 @@ class Direction:
         Parameters
         ----------
         attributes : dict
-            XML attributes describing the Stop
+            XML attributes referring to the Stop by tag
         """
-        self.stops.append(Stop(attributes))
+        self.stop_tags.append(get_xml_atrribute_value(attributes, "tag"))
 
 
 class Path:
     """
     Data class that stores the data about a Path associated with a specific route in the API
 
+    The coordinates of the path's points are packed into two arrays of doubles, lats and
+    lons, rather than being kept as one object per point. A missing coordinate is stored
+    as nan.
+
     Parameters
     ----------
     attributes : dict
         XML attributes describing the Path
     """
 
+    __slots__ = ("lats", "lons", "attributes")
+
     def __init__(self, attributes):
-        self.points = []  # a list of points associated with this path
-        self.attributes = attributes
+        self.lats = array("d")  # geographical latitudes of the points of this path
+        self.lons = array("d")  # geographical longitudes of the points of this path
+        self.attributes = dict(attributes)
+
+    def __len__(self):
+        return len(self.lats)
 
-    def add_point(self, point):
+    @property
+    def points(self):
+        """
+        The points of this path, as a read-only sequence that builds Point objects on access
+
+        Returns
+        -------
+        PathPoints
+            sequence of the points associated with this path
+        """
+        return PathPoints(self)
+
+    def add_point(self, attributes):
         """
         Method to add a specific point to this path
 
@@ -209,7 +287,64 @@ class Path:
         attributes : dict
             XML attributes describing the Point
         """
-        self.points.append(point)
+        lat = get_xml_float(attributes, "lat")
+        lon = get_xml_float(attributes, "lon")
+        self.lats.append(NAN if lat is None else lat)
+        self.lons.append(NAN if lon is None else lon)
+
+    def get_coordinates(self):
+        """
+        Method to get the coordinates of this path without copying them
+
+        Returns
+        -------
+        tuple[memoryview, memoryview]
+            latitudes and longitudes of the points of this path, as views of doubles
+        """
+        return memoryview(self.lats), memoryview(self.lons)
+
+    def to_numpy(self):
+        """
+        Method to get the coordinates of this path as NumPy arrays, without copying them.
+        NumPy is an optional dependency, it must be installed separately
+
+        Returns
+        -------
+        tuple[numpy.ndarray, numpy.ndarray]
+            latitudes and longitudes of the points of this path
+        """
+        import numpy  # pylint: disable=import-outside-toplevel
+
+        return numpy.frombuffer(self.lats), numpy.frombuffer(self.lons)
+
+
+class PathPoints(Sequence):
+    """
+    Read-only sequence of the points of a Path, which builds a Point object for each
+    point when it's accessed
+
+    Parameters
+    ----------
+    path : Path
+        the path whose points are viewed
+    """
+
+    __slots__ = ("path",)
+
+    def __init__(self, path):
+        self.path = path
+
+    def __len__(self):
+        return len(self.path.lats)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        return Point.from_coordinates(self.path.lats[index], self.path.lons[index])
+
+    def __iter__(self):
+        for lat, lon in zip(self.path.lats, self.path.lons):
+            yield Point.from_coordinates(lat, lon)
 
 
 class Point:
@@ -222,14 +357,38 @@ class Point:
         XML attributes describing the Point
     """
 
+    __slots__ = ("lat", "lon")
+
     def __init__(self, attributes):
-        self.lat = get_xml_atrribute_value(
+        self.lat = get_xml_float(
             attributes, "lat"
         )  # geographical latitude of this point
-        self.lon = get_xml_atrribute_value(
+        self.lon = get_xml_float(
             attributes, "lon"
         )  # geographical longitude of this point
 
+    @classmethod
+    def from_coordinates(cls, lat, lon):
+        """
+        Method to create a point from coordinates that have already been parsed
+
+        Parameters
+        ----------
+        lat : float
+            geographical latitude of the point
+        lon : float
+            geographical longitude of the point
+
+        Returns
+        -------
+        Point
+            the point
+        """
+        point = cls.__new__(cls)
+        point.lat = lat
+        point.lon = lon
+        return point
+
 
 class Predictions:
     """
@@ -241,6 +400,16 @@ class Predictions:
         XML attributes describing the Predictions
     """
 
+    __slots__ = (
+        "agency_title",
+        "route_tag",
+        "route_title",
+        "stop_title",
+        "stop_tag",
+        "dir_title",
+        "directions",
+    )
+
     def __init__(self, attributes):
         self.agency_title = get_xml_atrribute_value(
             attributes, "agencyTitle"
@@ -301,6 +470,8 @@ class Directions:
         XML attributes describing the Directions
     """
 
+    __slots__ = ("title", "predictions")
+
     def __init__(self, attributes):
         self.title = get_xml_atrribute_value(
             attributes, "title"
@@ -323,17 +494,31 @@ class Prediction:
         XML attributes describing the Prediction
     """
 
+    __slots__ = (
+        "seconds",
+        "minutes",
+        "epoch_time",
+        "is_departure",
+        "block",
+        "dir_tag",
+        "trip_tag",
+        "branch",
+        "affected_by_layover",
+        "is_schedule_based",
+        "delayed",
+    )
+
     def __init__(self, attributes):
-        self.seconds = get_xml_atrribute_value(
+        self.seconds = get_xml_int(
             attributes, "seconds"
         )  # arrival time in seconds
-        self.minutes = get_xml_atrribute_value(
+        self.minutes = get_xml_int(
             attributes, "minutes"
         )  # arrival time in minutes
-        self.epoch_time = get_xml_atrribute_value(
+        self.epoch_time = get_xml_int(
             attributes, "epochTime"
-        )  # arrival time in epoch
-        self.is_departure = get_xml_atrribute_value(attributes, "isDepature")
+        )  # arrival time in milliseconds since the epoch
+        self.is_departure = get_xml_bool(attributes, "isDeparture")
         self.block = get_xml_atrribute_value(
             attributes, "block"
         )  # block number assigned to a vehicle
@@ -345,11 +530,234 @@ class Prediction:
         self.branch = get_xml_atrribute_value(
             attributes, "branch"
         )  # only for toronto TTC agency
-        self.affected_by_layover = get_xml_atrribute_value(
-            attributes, "affectedByLayover"
+        self.affected_by_layover = get_xml_bool(attributes, "affectedByLayover")
+        self.is_schedule_based = get_xml_bool(attributes, "isScheduleBased")
+        self.delayed = get_xml_bool(attributes, "delayed")
+
+
+class VehicleLocations:
+    """
+    Data class that stores the vehicle locations reported by the API since a given time
+
+    Parameters
+    ----------
+    vehicles : list[Vehicle], optional
+        vehicles whose location was reported
+    """
+
+    __slots__ = ("vehicles", "last_time")
+
+    def __init__(self, vehicles=None):
+        self.vehicles = vehicles if vehicles is not None else []
+        self.last_time = None  # time of the most recent report in milliseconds since the
+        # epoch, sent back to the API to only get the vehicles reported after it
+
+    def add_vehicle(self, attributes):
+        """
+        Method to add a vehicle location
+
+        Parameters
+        ----------
+        attributes : dict
+            XML attributes describing the Vehicle
+        """
+        self.vehicles.append(Vehicle(attributes))
+
+    def set_last_time(self, attributes):
+        """
+        Method to set the time of the most recent report
+
+        Parameters
+        ----------
+        attributes : dict
+            XML attributes describing the lastTime
+        """
+        self.last_time = get_xml_int(attributes, "time")
+
+
+class Vehicle:
+    """
+    Data class that stores the reported location of a specific vehicle in the API
+
+    Parameters
+    ----------
+    attributes : dict
+        XML attributes describing the Vehicle
+    """
+
+    __slots__ = (
+        "id",
+        "route_tag",
+        "dir_tag",
+        "lat",
+        "lon",
+        "secs_since_report",
+        "predictable",
+        "heading",
+        "speed_km_hr",
+        "leading_vehicle_id",
+    )
+
+    def __init__(self, attributes):
+        self.id = get_xml_atrribute_value(
+            attributes, "id"
+        )  # id used to identify the vehicle by the API
+        self.route_tag = get_xml_atrribute_value(
+            attributes, "routeTag"
+        )  # tag of the route the vehicle is serving
+        self.dir_tag = get_xml_atrribute_value(
+            attributes, "dirTag"
+        )  # tag of the direction the vehicle is serving
+        self.lat = get_xml_float(
+            attributes, "lat"
+        )  # geographical latitude of the vehicle
+        self.lon = get_xml_float(
+            attributes, "lon"
+        )  # geographical longitude of the vehicle
+        self.secs_since_report = get_xml_int(
+            attributes, "secsSinceReport"
+        )  # age of the location when it was sent by the API
+        self.predictable = get_xml_bool(
+            attributes, "predictable"
+        )  # whether the vehicle is used for predictions
+        self.heading = get_xml_int(
+            attributes, "heading"
+        )  # direction the vehicle is heading in degrees, negative if unknown
+        self.speed_km_hr = get_xml_float(
+            attributes, "speedKmHr"
+        )  # speed of the vehicle
+        self.leading_vehicle_id = get_xml_atrribute_value(
+            attributes, "leadingVehicleId"
+        )  # id of the vehicle pulling this one, for trains
+
+
+class Schedule:
+    """
+    Data class that stores the scheduled times of a route from the API
+
+    The API lists the schedule as one table per service class (e.g. 'wkd' for weekdays)
+    and direction, with a row per trip and a cell per stop. Rather than one object per
+    cell, the times of each stop are packed into a sorted array of unsigned shorts per
+    table, in minutes after midnight of the service day. Trips running past midnight have
+    times above 1440.
+    """
+
+    __slots__ = ("route_tag", "route_title", "schedule_class", "stop_titles", "times")
+
+    def __init__(self):
+        self.route_tag = None
+        self.route_title = None
+        self.schedule_class = None  # version of the schedule, e.g. '2023_06_24'
+        self.stop_titles = {}  # title of each stop, keyed by tag
+        self.times = {}  # service class -> direction -> stop tag -> array of minutes
+        # after midnight
+
+    @property
+    def service_classes(self):
+        """
+        The service classes of the schedule
+
+        Returns
+        -------
+        list[str]
+            service classes e.g. ['wkd', 'sat', 'sun'], in the order of the feed
+        """
+        return list(self.times)
+
+    def get_directions(self, service_class):
+        """
+        Method to get the directions scheduled for a service class
+
+        Parameters
+        ----------
+        service_class : str
+            service class of the day, e.g. 'wkd'
+
+        Returns
+        -------
+        list[str]
+            directions e.g. ['Inbound', 'Outbound'], in the order of the feed
+        """
+        return list(self.times.get(service_class, {}))
+
+    def add_table(self, attributes):
+        """
+        Method to add the table of a service class and direction
+
+        Parameters
+        ----------
+        attributes : dict
+            XML attributes describing the table
+
+        Returns
+        -------
+        dict[str, array]
+            the times of the stops of the table keyed by tag, which the times of its trips
+            are appended to
+        """
+        if self.route_tag is None:
+            self.route_tag = get_xml_atrribute_value(attributes, "tag")
+            self.route_title = get_xml_atrribute_value(attributes, "title")
+            self.schedule_class = get_xml_atrribute_value(attributes, "scheduleClass")
+        directions = self.times.setdefault(
+            get_xml_atrribute_value(attributes, "serviceClass"), {}
         )
-        self.is_schedule_based = get_xml_atrribute_value(attributes, "isScheduleBased")
-        self.delayed = get_xml_atrribute_value(attributes, "delayed")
+        return directions.setdefault(get_xml_atrribute_value(attributes, "direction"), {})
+
+    def sort(self, service_class, direction):
+        """
+        Method to sort the times of the stops of a table, which the API lists by trip
+        rather than by time
+
+        Parameters
+        ----------
+        service_class : str
+            service class of the table
+        direction : str
+            direction of the table
+        """
+        for stop_times in self.times.get(service_class, {}).get(direction, {}).values():
+            stop_times[:] = array("H", sorted(stop_times))
+
+    def get_departures(self, stop_tag, service_class, after=0, count=1, direction=None):
+        """
+        Method to get the next scheduled times at a stop, with a binary search
+
+        At stops served in both directions, e.g. termini and loops, the times of every
+        direction are merged unless a direction is given
+
+        Parameters
+        ----------
+        stop_tag : str
+            NextBus API tag of the stop
+        service_class : str
+            service class of the day, e.g. 'wkd'
+        after : int, optional
+            minutes after midnight from which to look, included, by default 0
+        count : int, optional
+            most times returned, by default 1
+        direction : str, optional
+            direction of the trips, e.g. 'Inbound', by default every direction
+
+        Returns
+        -------
+        list[int]
+            the times in minutes after midnight, earliest first, empty if the stop isn't
+            served after that time
+        """
+        directions = self.times.get(service_class, {})
+        if direction is not None:
+            tables = [directions.get(direction, {})]
+        else:
+            tables = directions.values()
+        departures = []
+        for table in tables:
+            stop_times = table.get(stop_tag)
+            if stop_times is not None:
+                start = bisect_left(stop_times, after)
+                departures.extend(stop_times[start : start + count])
+        departures.sort()
+        return departures[:count]
 
 
 class Error:
@@ -362,9 +770,11 @@ class Error:
         XML attributes describing the Error
     """
 
+    __slots__ = ("message", "should_retry")
+
     def __init__(self, attributes):
         self.message = ""
-        self.should_retry = get_xml_atrribute_value(attributes, "shouldRetry")
+        self.should_retry = get_xml_bool(attributes, "shouldRetry")
         # shouldRetry represents if the user should try making the call again after 10 seconds
 
     def set_message(self, chars):
@@ -402,3 +812,68 @@ def get_xml_atrribute_value(attribute, key, default_text=""):
         If the default string wasn't provided; a blank string will be returned
     """
     return attribute[key] if key in attribute else default_text
+
+
+def get_xml_float(attribute, key):
+    """
+    Funtion to safely extract a decimal number from an xml attribute dict
+
+    Parameters
+    ----------
+    attribute : dict
+        XML attributes to extract value from
+    key : any
+        desired attribute name
+
+    Returns
+    -------
+    float
+        The attribute's value, or None if it doesn't exist or isn't a number
+    """
+    try:
+        return float(attribute[key])
+    except (KeyError, ValueError):
+        return None
+
+
+def get_xml_int(attribute, key):
+    """
+    Funtion to safely extract a whole number from an xml attribute dict
+
+    Parameters
+    ----------
+    attribute : dict
+        XML attributes to extract value from
+    key : any
+        desired attribute name
+
+    Returns
+    -------
+    int
+        The attribute's value, or None if it doesn't exist or isn't a whole number
+    """
+    try:
+        return int(attribute[key])
+    except (KeyError, ValueError):
+        return None
+
+
+def get_xml_bool(attribute, key):
+    """
+    Funtion to safely extract a flag from an xml attribute dict
+
+    Parameters
+    ----------
+    attribute : dict
+        XML attributes to extract value from
+    key : any
+        desired attribute name
+
+    Returns
+    -------
+    bool
+        True if the attribute is 'true', False if it's any other value,
+        or None if it doesn't exist
+    """
+    value = attribute.get(key)
+    return None if value is None else value == "true"
@@ -0,0 +1,545 @@
+"""
+    Module contains the agency exporter, which writes the route configurations of a whole
+    agency to normalized CSV or Parquet tables for analytics
+"""
+
+import contextlib
+import csv
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+from nextbus_api_parser.api_handler import call_safely
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.xml_handlers import RouteDetailsHandler
+
+TABLES = {
+    "routes": (
+        ("agency_tag", "string"),
+        ("route_tag", "string"),
+        ("title", "string"),
+        ("short_title", "string"),
+        ("color", "string"),
+        ("opposite_color", "string"),
+        ("lat_min", "float"),
+        ("lat_max", "float"),
+        ("lon_min", "float"),
+        ("lon_max", "float"),
+    ),
+    "stops": (
+        ("agency_tag", "string"),
+        ("route_tag", "string"),
+        ("stop_tag", "string"),
+        ("stop_id", "string"),
+        ("title", "string"),
+        ("short_title", "string"),
+        ("lat", "float"),
+        ("lon", "float"),
+    ),
+    "direction_stops": (
+        ("agency_tag", "string"),
+        ("route_tag", "string"),
+        ("direction_tag", "string"),
+        ("direction_title", "string"),
+        ("direction_name", "string"),
+        ("stop_sequence", "int"),
+        ("stop_tag", "string"),
+    ),
+    "path_points": (
+        ("agency_tag", "string"),
+        ("route_tag", "string"),
+        ("path_index", "int"),
+        ("point_sequence", "int"),
+        ("lat", "float"),
+        ("lon", "float"),
+    ),
+}  # table name -> (column name, column type) of each column
+
+
+class AgencyExporter:
+    """
+    Class that exports the route configurations of an agency to normalized tables: routes,
+    the stops of each route, the stops of each direction in order, and the points of each
+    path in order.
+
+    Every table is a directory holding a directory per agency with one file per route, so
+    routes are fetched concurrently and each one is written as soon as it's parsed, without
+    holding the whole agency in memory. The files can be read back as a single table by
+    most tools, e.g. pyarrow.dataset or DuckDB. A manifest per agency keeps the validators
+    and a digest of the feed of every exported route, so that an incremental export only
+    downloads and rewrites the routes that changed, and deletes the files of the routes
+    that were removed. Several agencies can be exported to the same directory.
+
+    Parameters
+    ----------
+    api_handler : ApiHandler
+        handler used to make the API calls
+    directory : str
+        directory the tables are written to, it's created if it doesn't exist
+    file_format : str, optional
+        'csv' or 'parquet', by default 'csv'. Parquet needs pyarrow, which is an optional
+        dependency that must be installed separately
+    max_workers : int, optional
+        number of routes fetched at once, by default the api_handler's DEFAULT_MAX_WORKERS
+    """
+
+    FILE_FORMATS = {"csv": ".csv", "parquet": ".parquet"}  # file format -> file extension
+    MANIFEST_NAME = "manifest.json"  # suffix of the name of the manifest of each agency
+    MANIFEST_VERSION = 2  # manifests written with another version are ignored
+
+    def __init__(self, api_handler, directory, file_format="csv", max_workers=None):
+        if file_format not in self.FILE_FORMATS:
+            raise ValueError(
+                f"unknown file format {file_format!r}, expected one of {list(self.FILE_FORMATS)}"
+            )
+        if file_format == "parquet":
+            # fail before anything is downloaded if pyarrow is missing
+            import pyarrow  # pylint: disable=import-outside-toplevel,unused-import
+
+        self.api_handler = api_handler
+        self.directory = directory
+        self.file_format = file_format
+        self.max_workers = max_workers or api_handler.DEFAULT_MAX_WORKERS
+        for table in TABLES:
+            os.makedirs(os.path.join(directory, table), exist_ok=True)
+
+    def export(self, agency_tag, incremental=True):
+        """
+        Method to export every route of an agency
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being exported
+        incremental : bool, optional
+            whether routes that haven't changed since the previous export to this directory
+            are skipped, by default True
+
+        Returns
+        -------
+        dict[str, any] | Error
+            tags of the routes that were 'exported', were 'unchanged' or 'removed', and the
+            'errors' of the routes that failed keyed by tag. Or the Error flagged by the API
+            for the list of routes
+        """
+        routes = self.api_handler.get_routes(agency_tag)
+        if isinstance(routes, Error):
+            return routes
+        previous_routes = self.load_manifest(agency_tag) if incremental else {}
+        route_tags = list(dict.fromkeys(route.tag for route in routes))
+        summary = {"exported": [], "unchanged": [], "removed": [], "errors": {}}
+        manifest_routes = {}
+
+        def export_route(route_tag):
+            return call_safely(
+                self.api_handler.call_with_retries,
+                (self.export_route, agency_tag, route_tag, previous_routes.get(route_tag)),
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for route_tag, outcome in zip(route_tags, executor.map(export_route, route_tags)):
+                if isinstance(outcome, Error):
+                    summary["errors"][route_tag] = outcome.message
+                    if route_tag in previous_routes:
+                        # the files of the previous export are kept until it succeeds again
+                        manifest_routes[route_tag] = previous_routes[route_tag]
+                    continue
+                entry, changed = outcome
+                manifest_routes[route_tag] = entry
+                summary["exported" if changed else "unchanged"].append(route_tag)
+
+        for route_tag in previous_routes:
+            if route_tag not in manifest_routes:
+                self.remove_route(agency_tag, route_tag)
+                summary["removed"].append(route_tag)
+        self.save_manifest(agency_tag, manifest_routes)
+        return summary
+
+    def export_route(self, agency_tag, route_tag, previous_entry=None):
+        """
+        Method to fetch a route and write its rows to every table, unless it hasn't changed
+        since the export described by previous_entry
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being exported
+        route_tag : str
+            NextBus API tag of the route being exported
+        previous_entry : dict[str, str], optional
+            manifest entry of the previous export of the route, by default it's exported
+
+        Returns
+        -------
+        tuple[dict[str, str], bool] | Error
+            the manifest entry of the route and whether its files were written, or the Error
+            flagged by the API
+        """
+        if previous_entry is not None and not self.has_route(agency_tag, route_tag):
+            previous_entry = None
+        headers = {}
+        if previous_entry is not None:
+            if previous_entry.get("etag"):
+                headers["If-None-Match"] = previous_entry["etag"]
+            if previous_entry.get("last_modified"):
+                headers["If-Modified-Since"] = previous_entry["last_modified"]
+        query = self.api_handler.build_query(
+            self.api_handler.ROUTE_DETAILS_QUERY, agency_tag, route_tag
+        )
+        handler = RouteDetailsHandler()
+        digest = FeedDigest()
+        response = self.api_handler.parse(handler, query, headers, digest)
+        if response.not_modified:
+            return previous_entry, False
+        if handler.error is not None:
+            return handler.error
+        entry = {
+            "etag": response.headers.get("ETag", ""),
+            "last_modified": response.headers.get("Last-Modified", ""),
+            "digest": digest.hexdigest(),
+        }
+        if previous_entry is not None and previous_entry.get("digest") == entry["digest"]:
+            # the API sent the same feed again
+            return entry, False
+        self.write_route(agency_tag, route_tag, handler.route)
+        return entry, True
+
+    def write_route(self, agency_tag, route_tag, route):
+        """
+        Method to write the rows of a route to the file of the route in every table
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route, as listed by the agency
+        route : Route
+            detailed description of the route
+        """
+        write = write_parquet if self.file_format == "parquet" else write_csv
+        for table in TABLES:
+            # the directory of the agency in the table
+            os.makedirs(
+                os.path.dirname(self.get_path(table, agency_tag, route_tag)), exist_ok=True
+            )
+        for table, rows in (
+            ("routes", get_route_rows(agency_tag, route_tag, route)),
+            ("stops", get_stop_rows(agency_tag, route_tag, route)),
+            ("direction_stops", get_direction_stop_rows(agency_tag, route_tag, route)),
+            ("path_points", get_path_point_rows(agency_tag, route_tag, route)),
+        ):
+            write(self.get_path(table, agency_tag, route_tag), TABLES[table], rows)
+
+    def remove_route(self, agency_tag, route_tag):
+        """
+        Method to delete the files of a route from every table
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+        """
+        for table in TABLES:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.get_path(table, agency_tag, route_tag))
+
+    def has_route(self, agency_tag, route_tag):
+        """
+        Method to check that the files of a route exist in every table
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+
+        Returns
+        -------
+        bool
+            True if none of the files is missing
+        """
+        return all(
+            os.path.isfile(self.get_path(table, agency_tag, route_tag)) for table in TABLES
+        )
+
+    def get_path(self, table, agency_tag, route_tag):
+        """
+        Method to get the path of the file of a route in a table
+
+        Parameters
+        ----------
+        table : str
+            name of the table, one of TABLES
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+
+        Returns
+        -------
+        str
+            path of the file
+        """
+        file_name = quote(route_tag, safe="") + self.FILE_FORMATS[self.file_format]
+        return os.path.join(self.directory, table, quote(agency_tag, safe=""), file_name)
+
+    def get_manifest_path(self, agency_tag):
+        """
+        Method to get the path of the manifest of an agency
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency
+
+        Returns
+        -------
+        str
+            path of the manifest
+        """
+        return os.path.join(self.directory, quote(agency_tag, safe="") + "." + self.MANIFEST_NAME)
+
+    def load_manifest(self, agency_tag):
+        """
+        Method to read the manifest of the previous export of an agency to this directory
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being exported
+
+        Returns
+        -------
+        dict[str, dict[str, str]]
+            manifest entry of every exported route keyed by tag, empty if there's no usable
+            manifest for the agency and file format
+        """
+        try:
+            with open(self.get_manifest_path(agency_tag), encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+        if (
+            manifest.get("version") != self.MANIFEST_VERSION
+            or manifest.get("agency_tag") != agency_tag
+            or manifest.get("file_format") != self.file_format
+        ):
+            return {}
+        return manifest.get("routes", {})
+
+    def save_manifest(self, agency_tag, routes):
+        """
+        Method to write the manifest of an export, replacing the previous one
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the exported agency
+        routes : dict[str, dict[str, str]]
+            manifest entry of every exported route keyed by tag
+        """
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "agency_tag": agency_tag,
+            "file_format": self.file_format,
+            "routes": routes,
+        }
+        with open_atomically(
+            self.get_manifest_path(agency_tag), "w", encoding="utf-8"
+        ) as manifest_file:
+            json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+
+
+class FeedDigest:
+    """
+    Class that digests the chunks of a feed as they're downloaded, rather than keeping the
+    feed to digest it once it's complete. It's passed to ApiHandler.parse in place of a list
+    """
+
+    def __init__(self):
+        self._sha1 = hashlib.sha1()
+        self.append = self._sha1.update  # called with each chunk of the feed
+
+    def hexdigest(self):
+        """
+        Method to get the digest of the chunks appended so far
+
+        Returns
+        -------
+        str
+            SHA-1 digest in hexadecimal
+        """
+        return self._sha1.hexdigest()
+
+
+def get_route_rows(agency_tag, route_tag, route):
+    """
+    Funtion to generate the rows of a route in the routes table
+
+    Yields
+    ------
+    tuple
+        the row of the route
+    """
+    yield (
+        agency_tag,
+        route_tag,
+        route.title,
+        route.short,
+        route.color,
+        route.opposide_color,
+        route.lat_min,
+        route.lat_max,
+        route.lon_min,
+        route.lon_max,
+    )
+
+
+def get_stop_rows(agency_tag, route_tag, route):
+    """
+    Funtion to generate the rows of a route in the stops table
+
+    Yields
+    ------
+    tuple
+        the row of each stop of the route
+    """
+    for stop in route.stops:
+        yield (
+            agency_tag,
+            route_tag,
+            stop.tag,
+            stop.stop_id,
+            stop.title,
+            stop.short_title,
+            stop.lat,
+            stop.lon,
+        )
+
+
+def get_direction_stop_rows(agency_tag, route_tag, route):
+    """
+    Funtion to generate the rows of a route in the direction_stops table
+
+    Yields
+    ------
+    tuple
+        the row of each stop of each direction of the route, in order
+    """
+    for direction in route.directions:
+        for sequence, stop_tag in enumerate(direction.stop_tags):
+            yield (
+                agency_tag,
+                route_tag,
+                direction.tag,
+                direction.title,
+                direction.name,
+                sequence,
+                stop_tag,
+            )
+
+
+def get_path_point_rows(agency_tag, route_tag, route):
+    """
+    Funtion to generate the rows of a route in the path_points table, missing coordinates
+    are written as empty values
+
+    Yields
+    ------
+    tuple
+        the row of each point of each path of the route, in order
+    """
+    for path_index, path in enumerate(route.paths):
+        for sequence, (lat, lon) in enumerate(zip(path.lats, path.lons)):
+            yield (
+                agency_tag,
+                route_tag,
+                path_index,
+                sequence,
+                None if math.isnan(lat) else lat,
+                None if math.isnan(lon) else lon,
+            )
+
+
+def write_csv(path, columns, rows):
+    """
+    Funtion to write a CSV file with a header row, replacing it atomically
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    columns : tuple[tuple[str, str]]
+        name and type of each column
+    rows : iterable[tuple]
+        rows of the file, None values are written as empty values
+    """
+    with open_atomically(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow([name for name, _ in columns])
+        writer.writerows(rows)
+
+
+def write_parquet(path, columns, rows):
+    """
+    Funtion to write a Parquet file, replacing it atomically. pyarrow is an optional
+    dependency, it must be installed separately
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    columns : tuple[tuple[str, str]]
+        name and type of each column
+    rows : iterable[tuple]
+        rows of the file, None values are written as nulls
+    """
+    import pyarrow  # pylint: disable=import-outside-toplevel
+    import pyarrow.parquet  # pylint: disable=import-outside-toplevel
+
+    types = {"string": pyarrow.string(), "float": pyarrow.float64(), "int": pyarrow.int32()}
+    schema = pyarrow.schema([(name, types[column_type]) for name, column_type in columns])
+    values = list(zip(*rows)) or [()] * len(columns)
+    table = pyarrow.Table.from_arrays(
+        [pyarrow.array(column, type=field.type) for column, field in zip(values, schema)],
+        schema=schema,
+    )
+    with open_atomically(path, "wb") as parquet_file:
+        pyarrow.parquet.write_table(table, parquet_file)
+
+
+@contextlib.contextmanager
+def open_atomically(path, mode, **kwargs):
+    """
+    Funtion to open a temporary file that replaces the file at path once it's closed, so
+    that readers never see a half written file
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    mode : str
+        mode the file is opened in, 'w' or 'wb'
+    **kwargs : any
+        other arguments of open
+
+    Yields
+    ------
+    io.IOBase
+        the temporary file
+    """
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temporary_path, mode, **kwargs) as file:
+            yield file
+        os.replace(temporary_path, path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_path)
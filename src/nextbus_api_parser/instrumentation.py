@@ -0,0 +1,420 @@
+"""
+    Module contains the metrics registry used by the API handler to record where the
+    time of each API call goes, and to export the totals for monitoring
+"""
+
+import json
+import os
+import threading
+import time
+from nextbus_api_parser.cache import get_command
+
+
+SCALAR_TYPES = frozenset((str, int, float, bool, type(None)))  # skipped by count_objects
+
+
+class MetricsRegistry:
+    """
+    Class that keeps running totals of the API calls made by an API handler.
+
+    Every API call is recorded as a RequestMetrics: its time split into the connect,
+    time-to-first-byte, download and parse phases, the bytes received, the XML elements
+    processed by its handler, the data class objects built, and the type of its error if it
+    failed ('Error' for the errors flagged by the API, otherwise the name of the exception).
+    The totals are labelled by API command and can be exported in the Prometheus text
+    format or as JSON lines. Callbacks added with add_callback are also called with each
+    RequestMetrics, on the thread that made the call. An instance can be shared between
+    threads and API handlers.
+
+    Nothing is recorded, and the handlers aren't wrapped, unless a registry is passed to
+    the API handler, so it costs nothing when it isn't used.
+    """
+
+    PREFIX = "nextbus_"  # prefix of the exported metric names
+    METRICS = {
+        "requests_total": ("counter", "API calls made"),
+        "request_seconds": ("summary", "Seconds spent in each phase of the API calls"),
+        "bytes_received_total": ("counter", "Bytes of the responses as sent over the network"),
+        "bytes_decoded_total": ("counter", "Bytes of the responses once decompressed"),
+        "elements_total": ("counter", "XML elements processed by the handlers"),
+        "objects_total": ("counter", "Data class objects built from the responses"),
+        "cache_hits_total": ("counter", "Results served from the cache"),
+        "errors_total": ("counter", "Failed API calls, by type of error"),
+    }  # name -> (Prometheus type, help text) of the exported metrics
+    PHASES = ("connect", "first_byte", "download", "parse")
+
+    def __init__(self):
+        self.callbacks = []  # functions called with each RequestMetrics
+        self._lock = threading.Lock()
+        self._values = {}  # (name, sorted label pairs) -> value
+
+    def add_callback(self, callback):
+        """
+        Method to add a function called with the RequestMetrics of every API call
+
+        Parameters
+        ----------
+        callback : callable
+            function taking a RequestMetrics
+        """
+        self.callbacks.append(callback)
+
+    def increment(self, name, value=1, **labels):
+        """
+        Method to add to one of the metrics
+
+        Parameters
+        ----------
+        name : str
+            name of the metric, without PREFIX
+        value : float, optional
+            amount added, by default 1
+        **labels : str
+            labels of the metric e.g. command='predictions'
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def get(self, name, **labels):
+        """
+        Method to get the value of one of the metrics
+
+        Parameters
+        ----------
+        name : str
+            name of the metric, without PREFIX, e.g. 'requests_total' or 'request_seconds_sum'
+        **labels : str
+            labels of the metric
+
+        Returns
+        -------
+        float
+            value of the metric, 0 if nothing was recorded for it
+        """
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0)
+
+    def record_request(self, request_metrics):
+        """
+        Method to add the measurements of an API call to the totals, and pass them on to
+        the callbacks
+
+        Parameters
+        ----------
+        request_metrics : RequestMetrics
+            measurements of the API call
+        """
+        command = request_metrics.command
+        self.increment("requests_total", command=command)
+        for phase in self.PHASES:
+            seconds = getattr(request_metrics, phase + "_seconds")
+            self.increment("request_seconds_sum", seconds, command=command, phase=phase)
+            self.increment("request_seconds_count", command=command, phase=phase)
+        self.increment("bytes_received_total", request_metrics.bytes_received, command=command)
+        self.increment("bytes_decoded_total", request_metrics.bytes_decoded, command=command)
+        for element, count in request_metrics.elements.items():
+            if not count:
+                continue
+            self.increment(
+                "elements_total", count, handler=request_metrics.handler_name, element=element
+            )
+        self.increment("objects_total", request_metrics.objects, command=command)
+        if request_metrics.error is not None:
+            self.increment("errors_total", command=command, type=request_metrics.error)
+        for callback in self.callbacks:
+            callback(request_metrics)
+
+    def record_cache_hit(self, query):
+        """
+        Method to count a result served from the cache instead of an API call
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        """
+        self.increment("cache_hits_total", command=get_command(query))
+
+    def samples(self):
+        """
+        Method to list the current value of every metric
+
+        Returns
+        -------
+        list[tuple[str, dict[str, str], float]]
+            name (without PREFIX), labels and value of each metric, sorted by name and labels
+        """
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(name, dict(labels), value) for (name, labels), value in items]
+
+    def to_prometheus(self):
+        """
+        Method to export the metrics in the Prometheus text format
+
+        Returns
+        -------
+        str
+            the metrics, one sample per line
+        """
+        lines = []
+        described = set()
+        for name, labels, value in self.samples():
+            metric = name
+            if metric not in self.METRICS:
+                # the _sum and _count samples of a summary
+                metric = name.rsplit("_", 1)[0]
+            if metric not in described and metric in self.METRICS:
+                metric_type, help_text = self.METRICS[metric]
+                lines.append(f"# HELP {self.PREFIX}{metric} {help_text}")
+                lines.append(f"# TYPE {self.PREFIX}{metric} {metric_type}")
+                described.add(metric)
+            label_text = ",".join(
+                f'{label}="{escape_label(label_value)}"' for label, label_value in labels.items()
+            )
+            if label_text:
+                label_text = "{" + label_text + "}"
+            lines.append(f"{self.PREFIX}{name}{label_text} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self):
+        """
+        Method to export the metrics as JSON lines
+
+        Returns
+        -------
+        str
+            one {"name", "labels", "value"} JSON object per line
+        """
+        return "".join(
+            json.dumps({"name": self.PREFIX + name, "labels": labels, "value": value}) + "\n"
+            for name, labels, value in self.samples()
+        )
+
+    def write_prometheus(self, path):
+        """
+        Method to write the metrics to a file in the Prometheus text format, e.g. for the
+        textfile collector of the node exporter. The file is replaced atomically
+
+        Parameters
+        ----------
+        path : str
+            path of the file
+        """
+        write_atomically(path, self.to_prometheus())
+
+    def write_json_lines(self, path):
+        """
+        Method to write the metrics to a file as JSON lines, replacing it atomically
+
+        Parameters
+        ----------
+        path : str
+            path of the file
+        """
+        write_atomically(path, self.to_json_lines())
+
+
+class RequestMetrics:
+    """
+    Class holding the measurements of a single API call, filled in by the API handler
+
+    Parameters
+    ----------
+    query : str
+        API query string
+    handler : xml.sax.ContentHandler
+        handler that parses the feed, whose start handlers are wrapped to count the
+        elements it processes (see count_elements)
+    """
+
+    __slots__ = (
+        "query",
+        "command",
+        "handler_name",
+        "connect_seconds",
+        "first_byte_seconds",
+        "download_seconds",
+        "parse_seconds",
+        "bytes_received",
+        "bytes_decoded",
+        "elements",
+        "objects",
+        "error",
+    )
+
+    def __init__(self, query, handler):
+        self.query = query
+        self.command = get_command(query)
+        self.handler_name = type(handler).__name__
+        self.connect_seconds = 0.0
+        self.first_byte_seconds = 0.0
+        self.download_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.elements = count_elements(handler)  # element title -> number processed
+        self.objects = 0
+        self.error = None  # type of the error the call failed with, if any
+
+    def time_parse(self, function):
+        """
+        Method to wrap a function so that the time spent in it counts as parsing
+
+        Parameters
+        ----------
+        function : callable
+            function to wrap, e.g. the feed method of an xml parser
+
+        Returns
+        -------
+        callable
+            the wrapped function
+        """
+
+        def timed(*args):
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                self.parse_seconds += time.perf_counter() - start
+
+        return timed
+
+    def set_response(self, response):
+        """
+        Method to copy the timings and sizes measured by the transport
+
+        Parameters
+        ----------
+        response : TransportResponse
+            response of the API call
+        """
+        self.connect_seconds = response.connect_seconds
+        self.first_byte_seconds = response.first_byte_seconds
+        self.download_seconds = response.download_seconds
+        self.bytes_received = response.bytes_received
+        self.bytes_decoded = response.bytes_decoded
+
+    def to_dict(self):
+        """
+        Method to get the measurements as a dict, e.g. to log them as JSON
+
+        Returns
+        -------
+        dict[str, any]
+            value of each measurement, keyed by name
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def count_elements(handler):
+    """
+    Funtion to wrap the start handlers of an xml handler so that the elements they process
+    are counted. It must be called before a parser is created for the handler, since parser
+    backends may read the handlers when they create the parser
+
+    Parameters
+    ----------
+    handler : xml.sax.ContentHandler
+        handler to wrap, handlers without start_handlers are left as they are
+
+    Returns
+    -------
+    dict[str, int]
+        number of elements processed, keyed by title, which is updated as they're processed
+    """
+    start_handlers = getattr(handler, "start_handlers", None)
+    if start_handlers is None:
+        return {}
+    counts = dict.fromkeys(start_handlers, 0)
+
+    def wrap(name, method):
+        def counted(attrs):
+            counts[name] += 1
+            method(attrs)
+
+        return counted
+
+    for name, method in start_handlers.items():
+        start_handlers[name] = wrap(name, method)
+    return counts
+
+
+def count_objects(values):
+    """
+    Funtion to count the data class objects reachable from a list of values through lists,
+    tuples and the slots of the data classes. Dicts are skipped, since the data classes only
+    use them to index objects that are also listed elsewhere, and so are nested lists whose
+    first item isn't a data class or a list, since the data classes never mix objects and
+    plain values in a list
+
+    Parameters
+    ----------
+    values : list[any]
+        values to look into e.g. the attributes of a handler, any of which may be a data
+        class object or a list of them
+
+    Returns
+    -------
+    int
+        number of distinct data class objects
+    """
+    seen = set()
+    pending = list(values)
+    slots_by_type = {}  # the lookups that fail are slow, so each type is only looked up once
+    while pending:
+        value = pending.pop()
+        value_type = type(value)
+        if value_type in SCALAR_TYPES:
+            continue
+        if value_type is list or value_type is tuple:
+            # only the first item is checked, lists of plain values are skipped as a whole
+            if value and type(value[0]) not in SCALAR_TYPES:
+                pending.extend(value)
+            continue
+        slots = slots_by_type.get(value_type, False)
+        if slots is False:
+            slots = slots_by_type[value_type] = getattr(value_type, "__slots__", None)
+        if slots and id(value) not in seen:
+            seen.add(id(value))
+            for name in slots:
+                item = getattr(value, name, None)
+                if type(item) not in SCALAR_TYPES:
+                    pending.append(item)
+    return len(seen)
+
+
+def escape_label(value):
+    """
+    Funtion to escape a label value for the Prometheus text format
+
+    Parameters
+    ----------
+    value : str
+        label value
+
+    Returns
+    -------
+    str
+        the escaped value
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_atomically(path, text):
+    """
+    Funtion to replace the contents of a file, so that readers never see it half written
+
+    Parameters
+    ----------
+    path : str
+        path of the file
+    text : str
+        new contents of the file
+    """
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(temporary_path, path)
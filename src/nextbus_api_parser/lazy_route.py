@@ -0,0 +1,179 @@
+"""
+    Module contains the lazy route, a detailed route whose stops, directions and
+    paths are only parsed from the routeConfig feed when they're first accessed
+"""
+
+import threading
+from nextbus_api_parser.data_classes import Route
+from nextbus_api_parser.xml_handlers import ROUTE_PARTS, RouteDetailsHandler
+
+SECTION_TAGS = (b"<stop", b"<direction", b"<path")  # first tag of each of ROUTE_PARTS
+
+
+def lazy_part(slot_name, part):
+    """
+    Funtion to create the property of a LazyRoute that loads a part of the route on first
+    access, and keeps it in the matching Route slot
+
+    Parameters
+    ----------
+    slot_name : str
+        name of the Route slot holding the part
+    part : str
+        part of the route that fills the slot, one of ROUTE_PARTS
+
+    Returns
+    -------
+    property
+        the property
+    """
+    slot = getattr(Route, slot_name)
+
+    def get_part(self):
+        try:
+            return slot.__get__(self, LazyRoute)
+        except AttributeError:
+            self.load(part)
+            return slot.__get__(self, LazyRoute)
+
+    def set_part(self, value):
+        slot.__set__(self, value)
+
+    return property(get_part, set_part, doc=f"The {slot_name} of the route, loaded on first access")
+
+
+class LazyRoute(Route):
+    """
+    Data class of a detailed description of a route whose stops, directions and paths are
+    parsed from the routeConfig feed the first time they're accessed, rather than when the
+    route is parsed.
+
+    The feed is kept until every part has been loaded. The API lists the stops, then the
+    directions, then the paths, so each part is parsed from its own section of the feed,
+    with the others skipped. Loading the directions also loads the stops, which they refer
+    to. An instance can be shared between threads.
+
+    Parameters
+    ----------
+    route : Route
+        the route parsed without its stops, directions and paths
+    feed : bytes
+        the whole routeConfig feed of the route
+    backend : parser backend
+        backend used to parse the parts of the feed
+    """
+
+    __slots__ = ("feed", "backend", "_sections", "_lock")
+
+    stops = lazy_part("stops", "stops")
+    stop_by_tag = lazy_part("stop_by_tag", "stops")
+    directions = lazy_part("directions", "directions")
+    paths = lazy_part("paths", "paths")
+
+    def __init__(self, route, feed, backend):
+        # pylint: disable=super-init-not-called
+        for name in (
+            "tag",
+            "title",
+            "short",
+            "color",
+            "opposide_color",
+            "lat_min",
+            "lat_max",
+            "lon_min",
+            "lon_max",
+        ):
+            setattr(self, name, getattr(route, name))
+        self.feed = feed
+        self.backend = backend
+        self._sections = None  # (header end, {part: (start, end)}) once the feed is split
+        self._lock = threading.Lock()
+
+    def is_loaded(self, part):
+        """
+        Method to check whether a part of the route has been loaded
+
+        Parameters
+        ----------
+        part : str
+            one of ROUTE_PARTS
+
+        Returns
+        -------
+        bool
+            True if the part has been parsed
+        """
+        try:
+            getattr(Route, part).__get__(self, LazyRoute)
+        except AttributeError:
+            return False
+        return True
+
+    def load(self, part):
+        """
+        Method to parse a part of the route from the feed, unless it has already been
+
+        Parameters
+        ----------
+        part : str
+            one of ROUTE_PARTS
+        """
+        with self._lock:
+            if self.is_loaded(part):
+                return
+            handler = RouteDetailsHandler((part,))
+            parser = self.backend.create_parser(handler)
+            sections = self._get_sections()
+            if sections is None:
+                parser.feed(self.feed)
+            else:
+                header_end, part_sections = sections
+                start, end = part_sections[part]
+                # the header opens the document and the route, parts are then only parsed
+                # up to the start of the next one, which leaves the document unfinished
+                parser.feed(self.feed[:header_end])
+                parser.feed(self.feed[start:end])
+            route = handler.route
+            if part == "stops":
+                Route.stops.__set__(self, route.stops)
+                Route.stop_by_tag.__set__(self, route.stop_by_tag)
+            elif part == "paths":
+                Route.paths.__set__(self, route.paths)
+        if part == "directions":
+            # the directions look their stops up in the stop table of this route
+            stop_by_tag = self.stop_by_tag
+            for direction in route.directions:
+                direction.stop_table = stop_by_tag
+            with self._lock:
+                if not self.is_loaded("directions"):
+                    Route.directions.__set__(self, route.directions)
+        if all(self.is_loaded(loaded_part) for loaded_part in ROUTE_PARTS):
+            self.feed = None
+
+    def _get_sections(self):
+        """
+        Method to find where each part of the route starts and ends in the feed, the lock
+        must be held by the caller
+
+        Returns
+        -------
+        tuple[int, dict[str, tuple[int, int]]]
+            end of the header, and (start, end) of each part. None if the parts aren't in
+            the expected order, they're then parsed from the whole feed
+        """
+        if self._sections is None:
+            # '<' can't appear in attribute values, so the tags can be searched for as is
+            starts = [self.feed.find(tag) for tag in SECTION_TAGS]
+            found = [start for start in starts if start >= 0]
+            if found != sorted(found):
+                self._sections = False
+            else:
+                part_sections = {}
+                for part, start in zip(ROUTE_PARTS, starts):
+                    if start < 0:
+                        part_sections[part] = (0, 0)
+                    else:
+                        end = min((other for other in found if other > start), default=None)
+                        part_sections[part] = (start, len(self.feed) if end is None else end)
+                self._sections = (found[0] if found else len(self.feed), part_sections)
+        return self._sections or None
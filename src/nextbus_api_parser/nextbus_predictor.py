@@ -1,10 +1,19 @@
 """
     Module implements a command-line interface which uses the other modules
     to query specific bus predictions from the NextBus API
+
+    Usage: python nextbus_predictor.py
+           python nextbus_predictor.py --watch AGENCY ROUTE:STOP [ROUTE:STOP ...] [--interval 30]
 """
 
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.api_handler import ApiHandler, call_safely
+from nextbus_api_parser.cache import ResponseCache
+from nextbus_api_parser.cli import parse_stop
 from nextbus_api_parser.data_classes import Error
 
 class NextBusPredictor:
@@ -17,22 +26,30 @@ class NextBusPredictor:
     PREDICTIONS_DISPLAY = "predictions" # level 4, the user is viewing the predictions
 
     def __init__(self):
+        self.agencies = []
         self.routes = []
         self.stops = []
         self.route = None
         self.predictions = None
         self.active = True # if active is true, the script will not terminate
-        self.api_handler = ApiHandler() # initialize the API Handler that'll be used to make
-        # API calls and parse the xml feed
-        self.agencies = self.api_handler.get_agencies() # get a list of available agencies
-        # from the api
+        self.api_handler = ApiHandler(cache=ResponseCache(ttls={"predictions": 0}))
+        # initialize the API Handler that'll be used to make API calls and parse the xml feed.
+        # Its cache keeps agencies, routes and route details so moving back to a level
+        # doesn't make an API call, but not predictions, which change too quickly to be kept
+        self.prefetches = {} # API calls made in the background for the level the user is
+        # most likely to move to next, keyed by API command and tags (see fetch)
+        self.executor = ThreadPoolExecutor(max_workers=1) # runs the prefetches, one at a
+        # time so they don't compete with the calls the user is waiting for
+        self.last_selections = {} # the option last selected at each level, the one most
+        # likely to be selected again when the user comes back to that level
         self.selections = [] # whenever a user selects an agency, route .etc. to expand on,
         # the number representing the selected category will be appended
         self.level = 0 # this integer will continually be the length of the list of selections,
         # it gives an idea of what category the user is narrowed in on
-        self.max = len(self.agencies) # this tracks the maximum number of categories in the
+        self.max = 0 # this tracks the maximum number of categories in the
         # current level i.e the highest value a user can input for a selection
         self.error_message = ""
+        self.update_level() # get a list of available agencies from the api
         self.begin()
 
     def begin(self):
@@ -41,10 +58,15 @@ class NextBusPredictor:
             "\nWelcome to my script. It handles user input to make and interprete" +
             "NextBus API calls to get bus predictions"
         )
-        self.handle_prompt_and_input()
+        self.run()
+
+    def run(self):
+        """Method that handles main flow of the script, one prompt at a time until it's closed"""
+        while self.active:
+            self.handle_prompt_and_input()
 
     def handle_prompt_and_input(self):
-        """Method that handles main flow of the script"""
+        """Method that displays the prompt of the current level and handles the user's input"""
         user_input = self.get_number_input(self.get_prompt()) # display the appropriate
         # prompt and collect user input
         if user_input == -1:
@@ -68,18 +90,12 @@ class NextBusPredictor:
                         # when displaying predictions, an input of 0 implies
                         # that the user opted to go back to the very first level
                         self.selections = []
-                    elif user_input == 1:
-                        if len(self.error_message) > 0:
-                            # if there was an error and the user opted to refresh,
-                            # refresh and restart the method
-                            self.update_level()
-                            self.handle_prompt_and_input()
-                        # when displaying predictions, an input of 1 implies that the user
-                        # opted to refresh the predictions
-                        # there is no need to do anything, when the code escapes these
-                        # conditional statements and self.update_level() and then
-                        # self.handle_prompt_and_input() are called, the predictions will refresh
+                    # an input of 1 implies that the user opted to refresh the predictions,
+                    # or to retry the API call that failed. There is no need to do anything,
+                    # self.update_level() below makes the call again, since neither
+                    # predictions nor errors are kept
                 else:
+                    self.last_selections[self.get_current_level()] = user_input
                     self.selections.append(user_input)
                 self.update_level()
             else:
@@ -87,7 +103,7 @@ class NextBusPredictor:
                 # maximum number of available choices
                 # display error and allow them try again
                 print(f"Incorrect input, please select an int ranging from -2 - {self.max - 1}")
-        self.handle_prompt_and_input() # restart the method at the new level
+        # run calls this method again, at the new level
 
 
     def get_prompt(self):
@@ -162,23 +178,22 @@ class NextBusPredictor:
         """
         now = datetime.now() # time the predictions were displayed (current time)
         dt_string = now.strftime("%d/%m/%Y %H:%M:%S")
-        prediction_data = "\nNext Buses Available"
-        directions = self.predictions.directions
+        lines = [""] # the lines are joined once rather than concatenated one by one
         if self.predictions.dir_title:
             # This attribute is only provided by the API when there are no
             # predictions available for that stop
             # Therefore, if it's not empty, let the user know that there
             # are no available predictions
-            prediction_data = "\nNo Predictions Available"
+            lines.append("No Predictions Available")
         else:
-            for direction in directions:
-                prediction_data += f"\n\tDirection: {direction.title}"
-                prediction_list = direction.predictions
-                for prediction in prediction_list:
-                    eta = prediction.minutes + " minutes"
-                    prediction_data += f"\n\t\t{eta}"
-        prediction_data += f"\n\nInformation as of {dt_string}\n"
-        return prediction_data
+            lines.append("Next Buses Available")
+            for direction in self.predictions.directions:
+                lines.append(f"\tDirection: {direction.title}")
+                for prediction in direction.predictions:
+                    lines.append(f"\t\t{prediction.minutes} minutes")
+        lines.append("")
+        lines.append(f"Information as of {dt_string}")
+        return "\n".join(lines) + "\n"
 
     def get_number_input(self, prompt):
         """
@@ -232,65 +247,164 @@ class NextBusPredictor:
         if self.get_current_level() == self.AGENCY_SELECTION:
             # get the list of available agencies and update the maximum number
             # of options to the number of available agencies
-            self.agencies = self.api_handler.get_agencies()
-            if self.agencies is Error:
+            agencies = self.fetch(("agencyList",), self.api_handler.get_agencies)
+            if isinstance(agencies, Error):
                 # if the api handler returned an error, set the error message and
                 # update the maximum number of options
                 # to the available options displayed in the prompt (see method get_prompt)
                 # then end the method without doing anything else
-                self.error_message = self.agencies.message
-                self.max = 2
+                self.set_error(agencies)
                 return
+            self.agencies = agencies
             self.max = len(self.agencies)
+            # the user is most likely to expand on the agency they picked last time
+            agency = self.get_likely_option(self.agencies)
+            if agency is not None:
+                self.prefetch(("routeList", agency.tag), self.api_handler.get_routes, agency.tag)
         elif self.get_current_level() == self.ROUTE_SELECTION:
             # get the list of routes associated with the agency the user selected
             # and updated the maximum number of options
             # to the number of available routes
-            self.routes = self.api_handler.get_routes(current_agency)
-            if self.routes is Error:
+            routes = self.fetch(
+                ("routeList", current_agency), self.api_handler.get_routes, current_agency)
+            if isinstance(routes, Error):
                 # if the api handler returned an error, set the error message and update the
                 # maximum number of options
                 # to the available options displayed in the prompt (see method get_prompt)
                 # then end the method without doing anything else
-                self.error_message = self.routes.message
-                self.max = 2
+                self.set_error(routes)
                 return
+            self.routes = routes
             self.max = len(self.routes)
+            # the user is most likely to expand on the route they picked last time
+            route = self.get_likely_option(self.routes)
+            if route is not None:
+                self.prefetch(
+                    ("routeConfig", current_agency, route.tag),
+                    self.api_handler.get_route_details,
+                    current_agency,
+                    route.tag,
+                )
         elif self.get_current_level() == self.STOP_SELECTION:
             # get a detailed description of the route the user selected and updated the maximum
             # number of options to the number of
             # stops associated with that route
-            self.route = self.api_handler.get_route_details(current_agency, current_route)
-            if self.route is Error:
+            route = self.fetch(
+                ("routeConfig", current_agency, current_route),
+                self.api_handler.get_route_details,
+                current_agency,
+                current_route,
+            )
+            if isinstance(route, Error):
                 # if the api handler returned an error, set the error message and update the
                 # maximum number of options
                 # to the available options displayed in the prompt (see method get_prompt)
                 # then end the method without doing anything else
-                self.error_message = self.route.message
-                self.max = 2
+                self.set_error(route)
                 return
+            self.route = route
             self.stops = self.route.stops
             self.max = len(self.stops)
         elif self.get_current_level() == self.PREDICTIONS_DISPLAY:
-            # get the list of routes associated with the agency the user selected
-            # and update the maximum number of options
+            # get the predictions for the stop the user selected, they're fetched every time
+            # since they change by the minute (the cache doesn't keep them), and update the maximum number of options
             # to the available options displayed in the prompt (see method get_prompt)
-            self.predictions = self.api_handler.get_predictions(
+            predictions = self.api_handler.get_predictions(
                 current_agency, current_route, current_stop)
-            if self.predictions is Error:
+            if isinstance(predictions, Error):
                 # if the api handler returned an error, set the error message and
                 # update the maximum number of options
                 # to the available options displayed in the prompt (see method get_prompt)
                 # then end the method without doing anything else
-                self.error_message = self.predictions.message
-                self.max = 2
+                self.set_error(predictions)
                 return
+            self.predictions = predictions
             self.max = 2
 
+    def set_error(self, error):
+        """
+        Method to display an error flagged by the API instead of the current level
+
+        Parameters
+        ----------
+        error : Error
+            the error returned by the api handler
+        """
+        self.error_message = error.message
+        self.max = 2 # the options displayed in the prompt (see method get_prompt)
+
+    def fetch(self, key, method, *args):
+        """
+        Method to get the result of an API call, waiting for it if it's being prefetched,
+        or else making the call, which the api handler's cache answers if it was already made
+
+        Parameters
+        ----------
+        key : tuple[str]
+            API command and tags identifying the call
+        method : callable
+            api handler method making the call
+        *args : str
+            arguments of the method
+
+        Returns
+        -------
+        any
+            result of the call, or the Error flagged by the API, which isn't cached so that
+            refreshing makes the call again
+        """
+        future = self.prefetches.pop(key, None)
+        if future is not None and not future.done():
+            return future.result()
+        # a finished prefetch is in the cache for as long as its ttl allows
+        return method(*args)
+
+    def prefetch(self, key, method, *args):
+        """
+        Method to make an API call in the background, unless it's already being made, so
+        that its result is cached by the time the user moves to the level that needs it
+
+        Parameters
+        ----------
+        key : tuple[str]
+            API command and tags identifying the call
+        method : callable
+            api handler method making the call
+        *args : str
+            arguments of the method
+        """
+        future = self.prefetches.get(key)
+        if future is None or future.done():
+            self.prefetches[key] = self.executor.submit(call_safely, method, args)
+
+    def get_likely_option(self, options):
+        """
+        Method to guess which option of the current level the user will select, i.e. the
+        one they selected last time they were at this level, or else the first one
+
+        Parameters
+        ----------
+        options : list
+            options of the current level
+
+        Returns
+        -------
+        any
+            the option, None if there are no options
+        """
+        if not options:
+            return None
+        index = self.last_selections.get(self.get_current_level(), 0)
+        return options[index] if index < len(options) else options[0]
+
     def close(self):
         """Method to terminate the script"""
         print("Thank you for using my script")
-        quit() # terminate script
+        self.active = False # run stops once the current prompt has been handled
+        for future in self.prefetches.values():
+            future.cancel() # drop the prefetches that haven't started
+        self.executor.shutdown(wait=False)
+        self.api_handler.close()
 
     def get_current_level(self):
         """
@@ -313,4 +427,257 @@ class NextBusPredictor:
             return self.STOP_SELECTION
         elif self.level == 3:
             return self.PREDICTIONS_DISPLAY
-NextBusPredictor()
+
+
+class PredictionsDashboard:
+    """
+    Class that keeps the predictions of several stops of an agency on screen, refreshed on
+    a timer.
+
+    Every refresh fetches all the stops with one batched predictionsForMultiStops call (see
+    ApiHandler.get_predictions_multi), so the API is polled once per interval however many
+    stops are watched. Between refreshes the ETAs count down locally from the epoch time of
+    each prediction, and only the lines of the screen that changed are redrawn.
+
+    Parameters
+    ----------
+    api_handler : ApiHandler
+        handler used to make the API calls, it shouldn't cache predictions for longer than
+        the interval
+    agency_tag : str
+        NextBus API tag of the agency of the stops
+    stops : list[tuple[str, str]]
+        (route tag, stop tag) pairs of the stops being watched
+    interval : float, optional
+        seconds between two refreshes, by default DEFAULT_INTERVAL
+    output : io.TextIOBase, optional
+        stream the dashboard is drawn on, by default sys.stdout. Changed lines are redrawn in
+        place with ANSI escape codes on a terminal, elsewhere every changed screen is
+        written out in full
+    clock : callable, optional
+        function returning the current time in seconds since the epoch, by default time.time
+    sleep : callable, optional
+        function waiting for a number of seconds, by default time.sleep
+    """
+
+    DEFAULT_INTERVAL = 30 # seconds between two refreshes
+    RETRY_DELAY = 10 # seconds the API asks to wait before retrying after an error
+    MAX_ETAS = 4 # predictions shown per direction
+
+    def __init__(
+        self, api_handler, agency_tag, stops, interval=None, output=None, clock=time.time,
+        sleep=time.sleep):
+        self.api_handler = api_handler
+        self.agency_tag = agency_tag
+        self.stops = list(stops)
+        self.interval = interval or self.DEFAULT_INTERVAL
+        self.output = output if output is not None else sys.stdout
+        self.clock = clock
+        self.sleep = sleep
+        self.in_place = self.output.isatty() # whether lines can be redrawn in place
+        self.results = {} # (route tag, stop tag) -> latest Predictions or Error of the stop,
+        # "error" -> Error of the whole refresh
+        self.fetched_at = None # time of the latest refresh
+        self.next_refresh = 0 # time the next refresh is due
+        self.lines = [] # lines currently on screen
+        self.refreshes = 0 # number of refreshes i.e. of batched API calls
+
+    def run(self, duration=None):
+        """
+        Method to refresh and draw the dashboard until it's interrupted
+
+        Parameters
+        ----------
+        duration : float, optional
+            seconds after which to stop, by default it runs until interrupted
+        """
+        end = None if duration is None else self.clock() + duration
+        while end is None or self.clock() < end:
+            now = self.clock()
+            if now >= self.next_refresh:
+                self.refresh(now)
+            self.draw(self.clock())
+            # wake up for the next second, when the countdowns change, or the next refresh
+            now = self.clock()
+            self.sleep(max(0, min(1 - now % 1, self.next_refresh - now)))
+
+    def refresh(self, now):
+        """
+        Method to fetch the predictions of every stop with one batched API call
+
+        Parameters
+        ----------
+        now : float
+            current time in seconds since the epoch
+        """
+        results = call_safely(self.api_handler.get_predictions_multi, (self.agency_tag, self.stops))
+        self.refreshes += 1
+        if isinstance(results, Error):
+            # keep showing the previous predictions until the API recovers
+            self.results["error"] = results
+            delay = max(self.interval, self.RETRY_DELAY) if results.should_retry else self.interval
+        else:
+            # the stops whose query should be retried keep their previous predictions
+            self.results = {
+                key: (
+                    self.results.get(key, result)
+                    if isinstance(result, Error) and result.should_retry
+                    else result
+                )
+                for key, result in results.items()
+            }
+            self.fetched_at = now
+            delay = self.interval
+            if any(isinstance(value, Error) and value.should_retry for value in results.values()):
+                delay = max(self.interval, self.RETRY_DELAY)
+        self.next_refresh = now + delay
+
+    def render(self, now):
+        """
+        Method to build the lines of the dashboard, with the ETAs counted down to now
+
+        Parameters
+        ----------
+        now : float
+            current time in seconds since the epoch
+
+        Returns
+        -------
+        list[str]
+            lines of the dashboard
+        """
+        lines = [
+            f"Watching {len(self.stops)} stops of {self.agency_tag}, "
+            f"refreshed every {self.interval:g} seconds (Ctrl+C to exit)",
+            "",
+        ]
+        for route_tag, stop_tag in self.stops:
+            predictions = self.results.get((route_tag, stop_tag))
+            if predictions is None:
+                lines.append(f"{route_tag} - Stop No: {stop_tag}")
+                lines.append("\tNo Predictions Yet" if self.fetched_at is None else "\tNo Data")
+                continue
+            if isinstance(predictions, Error):
+                lines.append(f"{route_tag} - Stop No: {stop_tag}")
+                lines.append(f"\tError: {predictions.message}")
+                continue
+            lines.append(f"{predictions.route_title} - {predictions.stop_title}")
+            if predictions.dir_title:
+                # only provided by the API when there are no predictions for the stop
+                lines.append("\tNo Predictions Available")
+            for direction in predictions.directions:
+                lines.append(f"\t{direction.title}: {self.get_etas(direction, now)}")
+        lines.append("")
+        if "error" in self.results:
+            lines.append(f"Error: {self.results['error'].message}")
+        if self.fetched_at is not None:
+            as_of = datetime.fromtimestamp(self.fetched_at).strftime("%H:%M:%S")
+            lines.append(
+                f"Information as of {as_of}, "
+                f"next refresh in {max(0, int(self.next_refresh - now))} seconds"
+            )
+        return lines
+
+    def get_etas(self, direction, now):
+        """
+        Method to count the predictions of a direction down to now
+
+        Parameters
+        ----------
+        direction : Directions
+            predictions of a direction serviced by a stop
+        now : float
+            current time in seconds since the epoch
+
+        Returns
+        -------
+        str
+            the minutes until each upcoming bus, earliest first
+        """
+        etas = []
+        for prediction in direction.predictions:
+            if prediction.epoch_time is None:
+                minutes = prediction.minutes
+            else:
+                seconds = prediction.epoch_time / 1000 - now
+                if seconds < 0:
+                    continue # the bus has already come
+                minutes = int(seconds // 60)
+            etas.append("due" if minutes == 0 else f"{minutes} min")
+            if len(etas) == self.MAX_ETAS:
+                break
+        return ", ".join(etas) if etas else "no upcoming buses"
+
+    def draw(self, now):
+        """
+        Method to draw the dashboard, only writing the lines that changed since it was last
+        drawn
+
+        Parameters
+        ----------
+        now : float
+            current time in seconds since the epoch
+        """
+        lines = self.render(now)
+        if lines == self.lines:
+            return
+        if not self.in_place:
+            self.output.write("\n".join(lines) + "\n\n")
+        else:
+            if not self.lines:
+                chunks = ["\x1b[2J"] # clear the screen the first time
+            else:
+                chunks = []
+            for row, line in enumerate(lines):
+                if row >= len(self.lines) or self.lines[row] != line:
+                    # move to the start of the row, clear it and write the new line
+                    chunks.append(f"\x1b[{row + 1};1H\x1b[2K{line}")
+            for row in range(len(lines), len(self.lines)):
+                chunks.append(f"\x1b[{row + 1};1H\x1b[2K") # clear rows no longer used
+            chunks.append(f"\x1b[{len(lines) + 1};1H")
+            self.output.write("".join(chunks))
+        self.output.flush()
+        self.lines = lines
+
+
+def main(arguments=None):
+    """
+    Function to run the interactive CLI, or the dashboard if --watch is given
+
+    Parameters
+    ----------
+    arguments : list[str], optional
+        command line arguments, by default sys.argv[1:]
+    """
+    argument_parser = argparse.ArgumentParser(
+        description="Get bus predictions from the NextBus API")
+    argument_parser.add_argument(
+        "--watch", metavar="AGENCY",
+        help="keep the predictions of the given stops of an agency on screen")
+    argument_parser.add_argument(
+        "stops", nargs="*", type=parse_stop, metavar="ROUTE:STOP",
+        help="stops watched, as route tag and stop tag separated by a colon")
+    argument_parser.add_argument(
+        "--interval", type=float, default=PredictionsDashboard.DEFAULT_INTERVAL,
+        help="seconds between two refreshes of the watched stops")
+    arguments = argument_parser.parse_args(arguments)
+
+    if arguments.watch is None:
+        if arguments.stops:
+            argument_parser.error("stops can only be given with --watch")
+        NextBusPredictor()
+        return
+    if not arguments.stops:
+        argument_parser.error("--watch needs at least one ROUTE:STOP")
+    # no cache, every refresh must reach the API
+    with ApiHandler() as api_handler:
+        dashboard = PredictionsDashboard(
+            api_handler, arguments.watch, arguments.stops, arguments.interval)
+        try:
+            dashboard.run()
+        except KeyboardInterrupt:
+            print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+    Module contains the parser backends that turn the bytes of an XML feed from the
+    API into calls to the XML handlers
+"""
+
+from xml.parsers import expat
+from xml.sax import make_parser
+from xml.sax.handler import feature_namespaces
+
+
+class SaxBackend:
+    """
+    Class of the parser backend built on xml.sax, which calls startElement, endElement
+    and characters on the handler with attributes wrapped in an AttributesImpl
+    """
+
+    name = "sax"
+
+    def create_parser(self, handler):
+        """
+        Method to create an incremental parser feeding a single document to a handler
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+
+        Returns
+        -------
+        xml.sax.xmlreader.IncrementalParser
+            parser whose feed method takes the bytes of the document as they arrive, and whose
+            close method must be called once the document is complete
+        """
+        parser = make_parser()
+        parser.setFeature(feature_namespaces, 0)
+        parser.setContentHandler(handler)
+        return parser
+
+
+class ExpatBackend:
+    """
+    Class of the parser backend that registers callbacks with pyexpat directly, skipping the
+    xml.sax layer and its AttributesImpl objects.
+
+    Handlers that have start_handlers and end_handlers tables (see DispatchHandler) have
+    their methods looked up in these tables by the callbacks, other handlers have their
+    startElement and endElement methods called with attributes as a plain dict
+    """
+
+    name = "expat"
+
+    def create_parser(self, handler):
+        """
+        Method to create an incremental parser feeding a single document to a handler
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+
+        Returns
+        -------
+        ExpatParser
+            parser whose feed method takes the bytes of the document as they arrive, and whose
+            close method must be called once the document is complete
+        """
+        return ExpatParser(handler)
+
+
+class ExpatParser:
+    """
+    Class of the incremental parsers created by ExpatBackend
+
+    Parameters
+    ----------
+    handler : xml.sax.ContentHandler
+        handler that builds the data classes from the xml feed
+    """
+
+    def __init__(self, handler):
+        self._parser = expat.ParserCreate()
+        # text is reported in as few pieces as possible instead of once per buffer or line
+        self._parser.buffer_text = True
+        start_handlers = getattr(handler, "start_handlers", None)
+        end_handlers = getattr(handler, "end_handlers", None)
+        text_elements = getattr(handler, "text_elements", None)
+        if start_handlers is None or end_handlers is None:
+            self._parser.StartElementHandler = handler.startElement
+            self._parser.EndElementHandler = handler.endElement
+            self._parser.CharacterDataHandler = handler.characters
+            return
+
+        start_handlers = dict(start_handlers)
+        end_handlers = dict(end_handlers)
+        if text_elements is None:
+            self._parser.CharacterDataHandler = handler.characters
+        else:
+            # text is only reported within the elements the handler reads the text of,
+            # rather than for the whitespace between every pair of elements
+            for name in text_elements:
+                start_handlers[name] = self._read_text(start_handlers.get(name), handler)
+                end_handlers[name] = self._stop_reading_text(end_handlers.get(name))
+        get_start_handler = start_handlers.get
+        get_end_handler = end_handlers.get
+
+        def start_element(name, attrs):
+            method = get_start_handler(name)
+            if method is not None:
+                method(attrs)
+
+        def end_element(name):
+            method = get_end_handler(name)
+            if method is not None:
+                method()
+
+        self._parser.StartElementHandler = start_element
+        self._parser.EndElementHandler = end_element
+
+    def _read_text(self, method, handler):
+        """Method to wrap the start method of an element so its text is then reported"""
+
+        def start_element(attrs):
+            if method is not None:
+                method(attrs)
+            self._parser.CharacterDataHandler = handler.characters
+
+        return start_element
+
+    def _stop_reading_text(self, method):
+        """Method to wrap the end method of an element so text is no longer reported"""
+
+        def end_element():
+            self._parser.CharacterDataHandler = None
+            if method is not None:
+                method()
+
+        return end_element
+
+    def feed(self, data):
+        """
+        Method to parse the next bytes of the document
+
+        Parameters
+        ----------
+        data : bytes
+            next bytes of the document
+        """
+        self._parser.Parse(data, False)
+
+    def close(self):
+        """Method to finish parsing the document, once all of its bytes have been fed"""
+        self._parser.Parse(b"", True)
+
+
+class LxmlBackend:
+    """
+    Class of the parser backend built on lxml's pull parser, the incremental version of
+    lxml.etree.iterparse. Elements are cleared as soon as they've been handled so the tree
+    doesn't grow with the document. lxml is an optional dependency, it must be installed
+    separately
+
+    Handlers are called the same way as with ExpatBackend, except that attributes are
+    lxml attribute mappings rather than dicts
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree  # pylint: disable=import-outside-toplevel
+
+        self._etree = etree
+
+    def create_parser(self, handler):
+        """
+        Method to create an incremental parser feeding a single document to a handler
+
+        Parameters
+        ----------
+        handler : xml.sax.ContentHandler
+            handler that builds the data classes from the xml feed
+
+        Returns
+        -------
+        LxmlParser
+            parser whose feed method takes the bytes of the document as they arrive, and whose
+            close method must be called once the document is complete
+        """
+        return LxmlParser(self._etree, handler)
+
+
+class LxmlParser:
+    """
+    Class of the incremental parsers created by LxmlBackend
+
+    Parameters
+    ----------
+    etree : module
+        the lxml.etree module
+    handler : xml.sax.ContentHandler
+        handler that builds the data classes from the xml feed
+    """
+
+    def __init__(self, etree, handler):
+        self._parser = etree.XMLPullParser(events=("start", "end"), resolve_entities=False)
+        self._handler = handler
+        self._start_handlers = getattr(handler, "start_handlers", None)
+        self._end_handlers = getattr(handler, "end_handlers", None)
+
+    def feed(self, data):
+        """
+        Method to parse the next bytes of the document
+
+        Parameters
+        ----------
+        data : bytes
+            next bytes of the document
+        """
+        self._parser.feed(data)
+        self._dispatch()
+
+    def close(self):
+        """Method to finish parsing the document, once all of its bytes have been fed"""
+        self._parser.close()
+        self._dispatch()
+
+    def _dispatch(self):
+        """Method to call the handler for every event parsed since the last call"""
+        handler = self._handler
+        start_handlers = self._start_handlers
+        end_handlers = self._end_handlers
+        for event, element in self._parser.read_events():
+            if event == "start":
+                if start_handlers is None:
+                    handler.startElement(element.tag, element.attrib)
+                else:
+                    method = start_handlers.get(element.tag)
+                    if method is not None:
+                        method(element.attrib)
+                continue
+
+            if element.text:
+                # only the text before the first child, which is all of it for the
+                # elements of the API that have text
+                handler.characters(element.text)
+            if end_handlers is None:
+                handler.endElement(element.tag)
+            else:
+                method = end_handlers.get(element.tag)
+                if method is not None:
+                    method()
+            # drop the element and the siblings handled before it
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+
+BACKENDS = {
+    SaxBackend.name: SaxBackend,
+    ExpatBackend.name: ExpatBackend,
+    LxmlBackend.name: LxmlBackend,
+}  # backend classes keyed by name
+DEFAULT_BACKEND = ExpatBackend.name  # backend used unless another one is asked for
+
+
+def get_backend(backend=None):
+    """
+    Funtion to get a parser backend from its name
+
+    Parameters
+    ----------
+    backend : str or backend, optional
+        name of one of BACKENDS, or a backend object which is returned as is,
+        by default DEFAULT_BACKEND
+
+    Returns
+    -------
+    SaxBackend, ExpatBackend or LxmlBackend
+        the parser backend
+    """
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    if isinstance(backend, str):
+        if backend not in BACKENDS:
+            raise ValueError(
+                f"unknown parser backend {backend!r}, expected one of {', '.join(BACKENDS)}"
+            )
+        return BACKENDS[backend]()
+    return backend
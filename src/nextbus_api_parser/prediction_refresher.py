@@ -0,0 +1,389 @@
+"""
+    Module contains the prediction refresher, which keeps the predictions of the stops
+    somebody is subscribed to up to date in the background
+"""
+
+import threading
+import time
+from nextbus_api_parser.api_handler import call_safely
+from nextbus_api_parser.data_classes import Error
+
+
+class PredictionRefresher:
+    """
+    Class that refreshes the predictions of subscribed stops on a background thread and
+    publishes them to the subscribers.
+
+    Every stop is polled once however many subscriptions it has, at the shortest interval
+    asked for by its subscribers, and stops of the same agency are refreshed together
+    with get_predictions_multi. When a stop is due, the other stops of its agency that
+    are due within coalesce times their interval are refreshed with it, so that stops
+    subscribed at different times end up sharing API calls. A stop is no longer polled
+    once its last subscription is closed.
+
+    The API answers a batch with a single Error if any of its stops is invalid, so the
+    stops of a batch that failed are queried again on their own with get_predictions, and
+    the stops that still fail are queried on their own from then on, so that they don't
+    hold back the predictions of the other stops.
+
+    Results are published either to a callback, called on the refresher thread, or to an
+    asyncio queue, as (agency tag, route tag, stop tag), result pairs where result is the
+    stop's Predictions or the Error flagged by the API. An exception raised by a callback
+    is counted in callback_errors and doesn't stop the other subscribers from being
+    published to, nor the refresher from running. The instance should be closed once it's
+    no longer needed, either with close() or by using it as a context manager.
+
+    Parameters
+    ----------
+    api_handler : ApiHandler
+        handler used to make the API calls
+    coalesce : float, optional
+        fraction of its interval by which a stop may be refreshed early to share an API
+        call, by default DEFAULT_COALESCE
+    clock : callable, optional
+        function returning the current time in seconds, by default time.monotonic
+    """
+
+    DEFAULT_INTERVAL = 30  # seconds between two refreshes of a stop, unless asked otherwise
+    DEFAULT_COALESCE = 0.5
+    RETRY_DELAY = 10  # seconds the API asks to wait before retrying after an error
+
+    def __init__(self, api_handler, coalesce=None, clock=time.monotonic):
+        self.api_handler = api_handler
+        self.coalesce = self.DEFAULT_COALESCE if coalesce is None else coalesce
+        self.clock = clock
+        self.batches = 0  # number of get_predictions_multi calls made
+        self.singles = 0  # number of get_predictions calls made for stops queried on their own
+        self.refreshes = 0  # number of stop refreshes, across all batches
+        self.callback_errors = 0  # number of exceptions raised by the callbacks
+        self.refresh_errors = 0  # number of refreshes of the background thread that failed
+        self.last_exception = None  # latest exception raised by a callback or a refresh
+        self._stops = {}  # (agency tag, route tag, stop tag) -> _StopState
+        self._alone = set()  # stops queried on their own since they failed in a batch
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._stops)
+
+    def start(self):
+        """Method to start refreshing the subscribed stops on a background thread"""
+        with self._condition:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(
+                    target=self._run, name="PredictionRefresher", daemon=True
+                )
+                self._thread.start()
+
+    def close(self):
+        """Method to stop the background thread, waiting for the refresh in progress"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def subscribe(
+        self, agency_tag, route_tag, stop_tag, interval=None, callback=None, queue=None, loop=None
+    ):
+        """
+        Method to subscribe to the predictions of a stop. The latest predictions of the stop
+        are published to the new subscription right away if it's already being refreshed
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the agency being queried
+        route_tag : str
+            NextBus API tag of the route being queried
+        stop_tag : str
+            NextBus API tag of the stop being queried
+        interval : float, optional
+            longest time in seconds between two refreshes, by default DEFAULT_INTERVAL
+        callback : callable, optional
+            function called with the stop and each result
+        queue : asyncio.Queue, optional
+            queue each (stop, result) pair is put in
+        loop : asyncio.AbstractEventLoop, optional
+            event loop the queue belongs to, by default the running event loop
+
+        Returns
+        -------
+        Subscription
+            the subscription, which must be closed once it's no longer needed
+        """
+        if queue is not None and loop is None:
+            import asyncio  # pylint: disable=import-outside-toplevel
+
+            loop = asyncio.get_running_loop()
+        key = (agency_tag, route_tag, stop_tag)
+        subscription = Subscription(
+            self, key, interval or self.DEFAULT_INTERVAL, callback, queue, loop
+        )
+        with self._condition:
+            state = self._stops.get(key)
+            if state is None:
+                state = self._stops[key] = _StopState(self.clock())
+            state.subscriptions.append(subscription)
+            state.update_interval()
+            latest = state.latest
+            self._condition.notify_all()
+        if latest is not None:
+            subscription.publish(latest)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Method to close a subscription, the stop is no longer polled if it was the last one
+
+        Parameters
+        ----------
+        subscription : Subscription
+            subscription returned by subscribe
+        """
+        with self._condition:
+            state = self._stops.get(subscription.key)
+            if state is None or subscription not in state.subscriptions:
+                return
+            state.subscriptions.remove(subscription)
+            if state.subscriptions:
+                state.update_interval()
+            else:
+                del self._stops[subscription.key]
+                self._alone.discard(subscription.key)
+
+    def refresh_due(self):
+        """
+        Method to refresh the stops that are due, and publish their results. It's called by
+        the background thread, but can also be called directly instead of starting it
+
+        Returns
+        -------
+        int
+            number of stops refreshed
+        """
+        with self._condition:
+            batches = self._take_due(self.clock())
+        refreshed = 0
+        for agency_tag, keys in batches.items():
+            results = self._fetch(agency_tag, keys)
+            refreshed += len(keys)
+            self._publish(keys, results)
+        self.refreshes += refreshed
+        return refreshed
+
+    def _fetch(self, agency_tag, keys):
+        """
+        Method to get the predictions of stops of an agency, in a batch except for the
+        stops that are queried on their own
+
+        Returns
+        -------
+        dict[tuple[str, str], Predictions | Error]
+            result of each stop, keyed by (route tag, stop tag)
+        """
+        batched = [key[1:] for key in keys if key not in self._alone]
+        alone = [key[1:] for key in keys if key in self._alone]
+        results = {}
+        if batched:
+            results = call_safely(self.api_handler.get_predictions_multi, (agency_tag, batched))
+            self.batches += 1
+            if isinstance(results, Error):
+                # the call raised, which says nothing about the stops
+                return dict.fromkeys(batched, results)
+            if len(batched) > 1:
+                # find out which of the stops of the batches that failed are invalid
+                alone.extend(stop for stop in batched if _is_invalid(results.get(stop)))
+        for route_tag, stop_tag in alone:
+            result = call_safely(
+                self.api_handler.get_predictions, (agency_tag, route_tag, stop_tag)
+            )
+            self.singles += 1
+            results[(route_tag, stop_tag)] = result
+            key = (agency_tag, route_tag, stop_tag)
+            with self._condition:
+                if _is_invalid(result) and key in self._stops:
+                    self._alone.add(key)
+                else:
+                    self._alone.discard(key)
+        return results
+
+    def _take_due(self, now):
+        """
+        Method to list the stops to refresh now, grouped by agency, and schedule their next
+        refresh. The lock must be held by the caller
+
+        Returns
+        -------
+        dict[str, list[tuple[str, str, str]]]
+            stops to refresh, keyed by agency tag
+        """
+        due_agencies = {key[0] for key, state in self._stops.items() if state.next_refresh <= now}
+        batches = {}
+        for key, state in self._stops.items():
+            if key[0] not in due_agencies:
+                continue
+            if state.next_refresh - now <= state.interval * self.coalesce:
+                batches.setdefault(key[0], []).append(key)
+                state.next_refresh = now + state.interval
+        return batches
+
+    def _publish(self, keys, results):
+        """Method to store and publish the results of a batch to the subscribers"""
+        now = self.clock()
+        for key in keys:
+            result = results.get(key[1:])
+            if result is None:
+                # the API left the stop out of its response
+                continue
+            with self._condition:
+                state = self._stops.get(key)
+                if state is None:
+                    # the last subscription was closed during the refresh
+                    continue
+                state.latest = result
+                if isinstance(result, Error) and result.should_retry:
+                    state.next_refresh = now + max(state.interval, self.RETRY_DELAY)
+                subscriptions = list(state.subscriptions)
+            for subscription in subscriptions:
+                subscription.publish(result)
+
+    def _get_delay(self):
+        """
+        Method to get the time until the next stop is due, the lock must be held by the caller
+
+        Returns
+        -------
+        float
+            seconds until the next refresh, or None if no stop is subscribed to
+        """
+        if not self._stops:
+            return None
+        return min(state.next_refresh for state in self._stops.values()) - self.clock()
+
+    def _run(self):
+        """Method run by the background thread, which refreshes stops as they're due"""
+        while True:
+            with self._condition:
+                while not self._closed:
+                    delay = self._get_delay()
+                    if delay is not None and delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if self._closed:
+                    return
+            try:
+                self.refresh_due()
+            except Exception as exception:  # pylint: disable=broad-except
+                # the other stops must keep being refreshed
+                with self._condition:
+                    self.refresh_errors += 1
+                    self.last_exception = exception
+                    self._condition.wait(self.RETRY_DELAY)
+
+    def _record_callback_error(self, exception):
+        """Method to count an exception raised by the callback of a subscription"""
+        with self._condition:
+            self.callback_errors += 1
+            self.last_exception = exception
+
+
+class Subscription:
+    """
+    Class of the subscriptions to the predictions of a stop, returned by
+    PredictionRefresher.subscribe
+
+    Parameters
+    ----------
+    refresher : PredictionRefresher
+        refresher the subscription belongs to
+    key : tuple[str, str, str]
+        (agency tag, route tag, stop tag) of the stop
+    interval : float
+        longest time in seconds between two refreshes
+    callback : callable
+        function called with the stop and each result, if any
+    queue : asyncio.Queue
+        queue each (stop, result) pair is put in, if any
+    loop : asyncio.AbstractEventLoop
+        event loop the queue belongs to
+    """
+
+    __slots__ = ("refresher", "key", "interval", "callback", "queue", "loop")
+
+    def __init__(self, refresher, key, interval, callback=None, queue=None, loop=None):
+        self.refresher = refresher
+        self.key = key
+        self.interval = interval
+        self.callback = callback
+        self.queue = queue
+        self.loop = loop
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Method to close the subscription"""
+        self.refresher.unsubscribe(self)
+
+    def publish(self, result):
+        """
+        Method to publish a result to the subscriber
+
+        Parameters
+        ----------
+        result : Predictions | Error
+            latest predictions of the stop, or the Error flagged by the API
+        """
+        try:
+            if self.callback is not None:
+                self.callback(self.key, result)
+            if self.queue is not None:
+                # asyncio queues aren't thread safe, the result is put by the event loop
+                self.loop.call_soon_threadsafe(self.queue.put_nowait, (self.key, result))
+        except Exception as exception:  # pylint: disable=broad-except
+            # e.g. the event loop was closed, the other subscribers must still be published to
+            self.refresher._record_callback_error(exception)  # pylint: disable=protected-access
+
+
+class _StopState:
+    """Class holding the refresh state of a subscribed stop"""
+
+    __slots__ = ("subscriptions", "interval", "next_refresh", "latest")
+
+    def __init__(self, now):
+        self.subscriptions = []
+        self.interval = None  # shortest interval of the subscriptions
+        self.next_refresh = now  # a new stop is refreshed right away
+        self.latest = None  # latest result published for the stop
+
+    def update_interval(self):
+        """Method to follow the shortest interval asked for by the subscriptions"""
+        interval = min(subscription.interval for subscription in self.subscriptions)
+        if self.interval is not None and interval < self.interval:
+            # don't wait for the refresh scheduled with the longer interval
+            self.next_refresh -= self.interval - interval
+        self.interval = interval
+
+
+def _is_invalid(result):
+    """
+    Funtion to check if the result of a stop is an Error that won't go away by retrying
+
+    Returns
+    -------
+    bool
+        True if the result is an Error without should_retry set
+    """
+    return isinstance(result, Error) and not result.should_retry
@@ -0,0 +1,391 @@
+"""
+    Module contains the rate limiter and retry policy used by the API handler to stay
+    within the bandwidth limits of the API and to retry the calls it asks to retry
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+from nextbus_api_parser.cache import get_command
+from nextbus_api_parser.data_classes import Error
+
+PRIORITY_INTERACTIVE = 0  # queries somebody is waiting on, e.g. predictions
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2  # queries for data that rarely changes, e.g. route configurations
+
+
+class TokenBucket:
+    """
+    Class of a token bucket, which holds up to capacity tokens and refills at rate tokens
+    per second. Taking more tokens than the bucket holds leaves it in debt, which is
+    paid back by the refill before anything else can be taken. It isn't thread safe.
+
+    Parameters
+    ----------
+    rate : float
+        tokens added per second
+    capacity : float
+        most tokens held at once, the bucket starts full
+    clock : callable, optional
+        function returning the current time in seconds, by default time.monotonic
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "clock", "updated")
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def refill(self):
+        """Method to add the tokens accumulated since the last refill"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def get_wait(self, amount):
+        """
+        Method to get the time until the bucket holds a number of tokens
+
+        Parameters
+        ----------
+        amount : float
+            number of tokens needed, 0 to wait for the bucket to be out of debt
+
+        Returns
+        -------
+        float
+            seconds to wait, 0 if the tokens are already there
+        """
+        self.refill()
+        if self.tokens >= amount:
+            return 0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        """
+        Method to take tokens from the bucket, whether or not it holds them
+
+        Parameters
+        ----------
+        amount : float
+            number of tokens taken
+        """
+        self.refill()
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Class that limits the number of API calls and bytes downloaded per second.
+
+    The API throttles clients that download too much, so the limiter makes every call wait
+    for a request token and for the bytes downloaded by the previous calls to be paid back,
+    then charges the bytes of the response once it has been downloaded. Agencies listed in
+    agency_limits get their own buckets, every other agency shares the default ones.
+
+    When calls have to wait, they are let through in order of priority then arrival:
+    get_priority ranks queries by API command so that predictions go ahead of bulk
+    routeConfig or routeList calls. An instance can be shared between threads.
+
+    Parameters
+    ----------
+    requests_per_second : float, optional
+        API calls allowed per second, by default they aren't limited
+    bytes_per_second : float, optional
+        bytes allowed per second (as sent over the network), None meaning unlimited, by
+        default DEFAULT_BYTES_PER_SECOND
+    agency_limits : dict[str, tuple[float, float]], optional
+        (requests per second, bytes per second) of the agencies with their own limits, None
+        meaning unlimited
+    burst : float, optional
+        seconds worth of requests and bytes that can be used at once, by default DEFAULT_BURST
+    priorities : dict[str, int], optional
+        priority of each API command, lowest first, merged over DEFAULT_PRIORITIES
+    clock : callable, optional
+        function returning the current time in seconds, by default time.monotonic
+    """
+
+    DEFAULT_BYTES_PER_SECOND = 2 * 1000 * 1000 / 20  # the API allows 2MB every 20 seconds
+    DEFAULT_BURST = 20
+    DEFAULT_PRIORITIES = {
+        "predictions": PRIORITY_INTERACTIVE,
+        "predictionsForMultiStops": PRIORITY_INTERACTIVE,
+        "vehicleLocations": PRIORITY_DEFAULT,
+        "agencyList": PRIORITY_BULK,
+        "routeList": PRIORITY_BULK,
+        "routeConfig": PRIORITY_BULK,
+        "schedule": PRIORITY_BULK,
+    }  # priority of each API command, lower priorities are let through first
+
+    def __init__(
+        self,
+        requests_per_second=None,
+        bytes_per_second=DEFAULT_BYTES_PER_SECOND,
+        agency_limits=None,
+        burst=None,
+        priorities=None,
+        clock=time.monotonic,
+    ):
+        self.burst = burst or self.DEFAULT_BURST
+        self.priorities = dict(self.DEFAULT_PRIORITIES)
+        self.priorities.update(priorities or {})
+        self.clock = clock
+        self.limits = {None: (requests_per_second, bytes_per_second)}
+        self.limits.update(agency_limits or {})
+        self.requests = 0  # number of API calls let through
+        self.bytes = 0  # number of bytes charged
+        self.waits = 0  # number of API calls that had to wait
+        self.waited = 0.0  # total seconds waited by the API calls
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()  # breaks ties between waiters of equal priority
+        self._groups = {}  # agency tag (None for the shared buckets) -> _BucketGroup
+
+    def get_priority(self, query):
+        """
+        Method to get the priority of a query
+
+        Parameters
+        ----------
+        query : str
+            API query string
+
+        Returns
+        -------
+        int
+            priority of the query's API command, lower priorities are let through first
+        """
+        return self.priorities.get(get_command(query), PRIORITY_DEFAULT)
+
+    def acquire(self, query, priority=None):
+        """
+        Method to wait until an API call is within the limits, and count it
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        priority : int, optional
+            priority of the call, by default the priority of the query's API command
+
+        Returns
+        -------
+        float
+            seconds waited
+        """
+        if priority is None:
+            priority = self.get_priority(query)
+        waiter = (priority, next(self._sequence))
+        start = None  # time the call started waiting, if it had to
+        with self._condition:
+            group = self._get_group(query)
+            heapq.heappush(group.waiters, waiter)
+            try:
+                while True:
+                    wait = None  # waiters behind the first one wait to be notified
+                    if group.waiters[0] == waiter:
+                        wait = group.get_wait()
+                        if wait <= 0:
+                            break
+                    if start is None:
+                        start = self.clock()
+                    self._condition.wait(wait)
+            except BaseException:
+                group.waiters.remove(waiter)
+                heapq.heapify(group.waiters)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(group.waiters)
+            group.take_request()
+            self._condition.notify_all()
+            self.requests += 1
+            if start is None:
+                return 0
+            waited = self.clock() - start
+            self.waits += 1
+            self.waited += waited
+        return waited
+
+    def charge(self, query, byte_count):
+        """
+        Method to charge the bytes downloaded by an API call, which the following calls
+        wait for if it goes over the limit
+
+        Parameters
+        ----------
+        query : str
+            API query string
+        byte_count : int
+            size of the response as sent over the network
+        """
+        with self._condition:
+            self._get_group(query).take_bytes(byte_count)
+            self.bytes += byte_count
+
+    def stats(self):
+        """
+        Method to get statistics about the calls let through this limiter
+
+        Returns
+        -------
+        dict[str, float]
+            number of calls, of bytes charged, of calls that had to wait, and seconds waited
+        """
+        with self._condition:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "waits": self.waits,
+                "waited": self.waited,
+            }
+
+    def _get_group(self, query):
+        """Method to get the buckets a query is charged to, the lock must be held by the caller"""
+        agency_tag = parse_qs(urlsplit(query).query).get("a", [None])[0]
+        if agency_tag not in self.limits:
+            agency_tag = None
+        group = self._groups.get(agency_tag)
+        if group is None:
+            requests_per_second, bytes_per_second = self.limits[agency_tag]
+            group = self._groups[agency_tag] = _BucketGroup(
+                self._create_bucket(requests_per_second, 1),
+                self._create_bucket(bytes_per_second, 0),
+            )
+        return group
+
+    def _create_bucket(self, rate, min_capacity):
+        """Method to create the bucket of a limit, or None if it's unlimited"""
+        if rate is None:
+            return None
+        return TokenBucket(rate, max(rate * self.burst, min_capacity), self.clock)
+
+
+class _BucketGroup:
+    """Class holding the request and byte buckets of an agency, and the calls waiting on them"""
+
+    __slots__ = ("request_bucket", "byte_bucket", "waiters")
+
+    def __init__(self, request_bucket, byte_bucket):
+        self.request_bucket = request_bucket  # None if the requests are unlimited
+        self.byte_bucket = byte_bucket  # None if the bytes are unlimited
+        self.waiters = []  # heap of the (priority, sequence) of the waiting calls
+
+    def get_wait(self):
+        """Method to get the time until the next call is within the limits"""
+        wait = 0
+        if self.request_bucket is not None:
+            wait = self.request_bucket.get_wait(1)
+        if self.byte_bucket is not None:
+            wait = max(wait, self.byte_bucket.get_wait(0))
+        return wait
+
+    def take_request(self):
+        """Method to take the token of a call"""
+        if self.request_bucket is not None:
+            self.request_bucket.take(1)
+
+    def take_bytes(self, byte_count):
+        """Method to take the bytes downloaded by a call"""
+        if self.byte_bucket is not None:
+            self.byte_bucket.take(byte_count)
+
+
+class RetryPolicy:
+    """
+    Class that decides when an API call is made again after the API flagged an Error with
+    should_retry set.
+
+    The API asks clients to wait 10 seconds before retrying, so every retry waits at least
+    base_delay (never less than MIN_DELAY), doubled after each attempt up to max_delay. A
+    random jitter of up to jitter times the delay is added on top, so clients that were
+    throttled together don't all retry at the same time.
+
+    Parameters
+    ----------
+    max_retries : int, optional
+        most retries of a single call, by default DEFAULT_MAX_RETRIES
+    base_delay : float, optional
+        seconds before the first retry, by default MIN_DELAY
+    max_delay : float, optional
+        longest delay before a retry, before jitter, by default DEFAULT_MAX_DELAY
+    jitter : float, optional
+        largest random fraction of the delay added to it, by default DEFAULT_JITTER
+    sleep : callable, optional
+        function waiting a number of seconds, by default time.sleep
+    random_fraction : callable, optional
+        function returning a random float in [0, 1), by default random.random
+    """
+
+    MIN_DELAY = 10  # seconds the API asks to wait before retrying
+    DEFAULT_MAX_RETRIES = 3
+    DEFAULT_MAX_DELAY = 60
+    DEFAULT_JITTER = 0.5
+
+    def __init__(
+        self,
+        max_retries=None,
+        base_delay=None,
+        max_delay=None,
+        jitter=None,
+        sleep=time.sleep,
+        random_fraction=random.random,
+    ):
+        self.max_retries = self.DEFAULT_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = max(base_delay or self.MIN_DELAY, self.MIN_DELAY)
+        self.max_delay = max(max_delay or self.DEFAULT_MAX_DELAY, self.base_delay)
+        self.jitter = self.DEFAULT_JITTER if jitter is None else jitter
+        self.sleep = sleep
+        self.random_fraction = random_fraction
+        self.retries = 0  # number of calls made again
+        self.exhausted = 0  # number of calls still failing once out of retries
+
+    def get_delay(self, retry_count):
+        """
+        Method to get the time to wait before a retry
+
+        Parameters
+        ----------
+        retry_count : int
+            number of retries already made for the call
+
+        Returns
+        -------
+        float
+            seconds to wait
+        """
+        delay = min(self.base_delay * 2**retry_count, self.max_delay)
+        return delay * (1 + self.jitter * self.random_fraction())
+
+    def call(self, function, *args):
+        """
+        Method to call a function returning a result or an Error, calling it again after a
+        delay for as long as it returns an Error with should_retry set
+
+        Parameters
+        ----------
+        function : callable
+            function to call
+        *args : any
+            positional arguments of the function
+
+        Returns
+        -------
+        any
+            the result of the last call
+        """
+        retry_count = 0
+        while True:
+            result = function(*args)
+            if not isinstance(result, Error) or not result.should_retry:
+                return result
+            if retry_count >= self.max_retries:
+                self.exhausted += 1
+                return result
+            self.sleep(self.get_delay(retry_count))
+            retry_count += 1
+            self.retries += 1
@@ -0,0 +1,222 @@
+"""
+    Module contains the on-disk store used by the API handler to keep parsed
+    route configurations between runs
+"""
+
+import os
+import pickle
+import tempfile
+import time
+from urllib.parse import quote
+
+
+class StoredRoute:
+    """
+    Data class that stores a route configuration loaded from a RouteStore
+
+    Parameters
+    ----------
+    route : Route
+        detailed description of the route
+    etag : str
+        ETag header of the response the route was parsed from (blank if there wasn't one)
+    last_modified : str
+        Last-Modified header of the response the route was parsed from
+        (blank if there wasn't one)
+    stored_at : float
+        time the route was last downloaded or revalidated, in seconds since the epoch
+    size : int, optional
+        size of the xml feed the route was parsed from, by default 0
+    """
+
+    def __init__(self, route, etag, last_modified, stored_at, size=0):
+        self.route = route
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at
+        self.size = size
+
+    def get_validators(self):
+        """
+        Method to get the headers that ask the API to only send the route if it has changed
+
+        Returns
+        -------
+        dict[str, str]
+            conditional request headers, empty if the API didn't provide validators
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class RouteStore:
+    """
+    Class that keeps parsed route configurations on disk, one file per agency and route.
+
+    Routes are serialized with pickle, which loads far faster than the xml feed can be
+    parsed again. Routes younger than max_age are used as is, older ones are revalidated
+    with the API using the ETag/Last-Modified headers it sent, and only downloaded again if
+    they have changed. Since unpickling can run arbitrary code, the directory must only be
+    writable by trusted users.
+
+    Parameters
+    ----------
+    directory : str
+        directory the routes are kept in, it's created if it doesn't exist
+    max_age : float, optional
+        seconds a stored route is used without revalidating it, by default DEFAULT_MAX_AGE
+    clock : callable, optional
+        function returning the current time in seconds since the epoch, by default time.time
+    """
+
+    DEFAULT_MAX_AGE = 24 * 60 * 60
+    FORMAT_VERSION = 6  # stored files written with another version are ignored, it must
+    # change whenever the layout of the data classes does
+    FILE_EXTENSION = ".route"
+
+    def __init__(self, directory, max_age=None, clock=time.time):
+        self.directory = directory
+        self.max_age = self.DEFAULT_MAX_AGE if max_age is None else max_age
+        self.clock = clock
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, agency_tag, route_tag):
+        """
+        Method to get the path of the file a route is kept in
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+
+        Returns
+        -------
+        str
+            path of the route's file
+        """
+        # quote leaves dots as they are, so the tags are separated by an escaped dot, which
+        # can't appear in a quoted tag since its '%' would be escaped too
+        file_name = quote(agency_tag, safe="") + "%2E" + quote(route_tag, safe="")
+        return os.path.join(self.directory, file_name + self.FILE_EXTENSION)
+
+    def load(self, agency_tag, route_tag):
+        """
+        Method to load a stored route
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+
+        Returns
+        -------
+        StoredRoute
+            The stored route, or None if it isn't stored or its file can't be read
+        """
+        path = self.get_path(agency_tag, route_tag)
+        try:
+            with open(path, "rb") as file:
+                stored_at = os.fstat(file.fileno()).st_mtime
+                version, etag, last_modified, size, route = pickle.load(file)
+        except (
+            OSError,
+            EOFError,
+            ValueError,
+            TypeError,
+            AttributeError,
+            ImportError,
+            pickle.UnpicklingError,
+        ):
+            return None
+        if version != self.FORMAT_VERSION:
+            return None
+        return StoredRoute(route, etag, last_modified, stored_at, size)
+
+    def is_fresh(self, stored_route):
+        """
+        Method to check if a stored route can be used without revalidating it
+
+        Parameters
+        ----------
+        stored_route : StoredRoute
+            route loaded from this store
+
+        Returns
+        -------
+        bool
+            True if the route is younger than max_age
+        """
+        return self.clock() - stored_route.stored_at < self.max_age
+
+    def save(self, agency_tag, route_tag, route, etag="", last_modified="", size=0):
+        """
+        Method to store a route, replacing any earlier copy
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+        route : Route
+            detailed description of the route
+        etag : str, optional
+            ETag header of the response the route was parsed from, by default ""
+        last_modified : str, optional
+            Last-Modified header of the response the route was parsed from, by default ""
+        size : int, optional
+            size of the xml feed the route was parsed from, by default 0
+        """
+        path = self.get_path(agency_tag, route_tag)
+        # write to a temporary file first so readers never see a partly written route
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                pickle.dump(
+                    (self.FORMAT_VERSION, etag or "", last_modified or "", size, route),
+                    file,
+                    pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        self.touch(agency_tag, route_tag)
+
+    def touch(self, agency_tag, route_tag):
+        """
+        Method to mark a stored route as revalidated now
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+        """
+        now = self.clock()
+        os.utime(self.get_path(agency_tag, route_tag), (now, now))
+
+    def remove(self, agency_tag, route_tag):
+        """
+        Method to delete a stored route, if it's stored
+
+        Parameters
+        ----------
+        agency_tag : str
+            NextBus API tag of the route's agency
+        route_tag : str
+            NextBus API tag of the route
+        """
+        try:
+            os.unlink(self.get_path(agency_tag, route_tag))
+        except FileNotFoundError:
+            pass
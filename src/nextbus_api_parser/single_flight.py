@@ -0,0 +1,162 @@
+"""
+    Module contains the single-flight groups used by the API handlers to share one
+    API call between identical queries that are made at the same time
+"""
+
+import threading
+
+
+class SingleFlight:
+    """
+    Class that lets concurrent calls with the same key share a single execution.
+
+    The first call with a key runs the function, calls made with the same key while it's
+    running wait for it and get the same result (or exception), rather than running the
+    function again. Since the result is shared, it must not be modified by the callers.
+    An instance can be shared between threads.
+    """
+
+    def __init__(self):
+        self.calls = 0  # number of executions of a function
+        self.coalesced = 0  # number of calls that shared the execution of another call
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> _Call of the execution in progress
+
+    def do(self, key, function, *args):
+        """
+        Method to call a function, or wait for the call in progress with the same key
+
+        Parameters
+        ----------
+        key : hashable
+            identifies the calls that can share an execution, e.g. an API query string
+        function : callable
+            function to call
+        *args : any
+            positional arguments of the function
+
+        Returns
+        -------
+        any
+            the result of the function
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is None:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+                is_leader = True
+            else:
+                self.coalesced += 1
+                is_leader = False
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = function(*args)
+        except BaseException as exception:
+            call.exception = exception
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """
+        Method to get statistics about the calls made through this group
+
+        Returns
+        -------
+        dict[str, int]
+            number of executions, of calls that shared an execution, and of keys in flight
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+
+class AsyncSingleFlight:
+    """
+    Class that lets concurrent awaits with the same key share a single coroutine, the
+    asyncio counterpart of SingleFlight. An instance must only be used from one event loop.
+
+    A caller that is cancelled stops waiting without cancelling the shared coroutine,
+    which keeps running for the other callers.
+    """
+
+    def __init__(self):
+        self.calls = 0  # number of coroutines run
+        self.coalesced = 0  # number of awaits that shared the coroutine of another
+        self._in_flight = {}  # key -> task of the coroutine in progress
+
+    async def do(self, key, coroutine_function, *args):
+        """
+        Coroutine to run a coroutine function, or wait for the one in progress with the
+        same key
+
+        Parameters
+        ----------
+        key : hashable
+            identifies the calls that can share a coroutine, e.g. an API query string
+        coroutine_function : callable
+            coroutine function to run
+        *args : any
+            positional arguments of the coroutine function
+
+        Returns
+        -------
+        any
+            the result of the coroutine
+        """
+        # imported here so that the synchronous API doesn't pay for importing asyncio
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        task = self._in_flight.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(coroutine_function(*args))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        """
+        Method to get statistics about the calls made through this group
+
+        Returns
+        -------
+        dict[str, int]
+            number of coroutines run, of awaits that shared a coroutine, and of keys in flight
+        """
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+        }
+
+    def _forget(self, key, task):
+        """Method to drop a finished task, unless it was already replaced by a newer one"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+
+class _Call:
+    """Class holding the outcome of an execution shared by a SingleFlight"""
+
+    __slots__ = ("done", "result", "exception")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
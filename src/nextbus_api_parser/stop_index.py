@@ -0,0 +1,270 @@
+"""
+    Module contains a spatial index of the stops of parsed routes, used to
+    find the stops nearest to a location without scanning every stop
+"""
+
+import heapq
+import math
+from array import array
+
+EARTH_RADIUS = 6371008.8  # mean radius of the earth in meters
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180  # meters per degree of latitude
+
+
+class StopIndex:
+    """
+    Class that indexes the stops of one or more routes by location.
+
+    The coordinates of the stops are kept in contiguous arrays and bucketed into a grid of
+    cells cell_size degrees wide, so a query only measures the distance to the stops in the
+    cells around the queried location. A stop served by several routes is indexed once,
+    identified by its tag. Distances are great-circle (haversine) distances in meters.
+
+    Parameters
+    ----------
+    routes : list[Route], optional
+        detailed descriptions of the routes whose stops are indexed
+    cell_size : float, optional
+        size of the grid cells in degrees, by default DEFAULT_CELL_SIZE
+    """
+
+    DEFAULT_CELL_SIZE = 0.005  # about 550m of latitude
+
+    def __init__(self, routes=(), cell_size=None):
+        self.cell_size = cell_size or self.DEFAULT_CELL_SIZE
+        self.stops = []  # indexed stops, in the order they were added
+        self.lats = array("d")  # latitude of each indexed stop
+        self.lons = array("d")  # longitude of each indexed stop
+        self.route_tags = []  # tags of the routes serving each indexed stop
+        self._positions = {}  # stop tag -> position of the stop in the lists above
+        self._cells = {}  # (row, column) of a grid cell -> positions of the stops in it
+        self._max_abs_lat = 0.0  # used to bound the width of the cells in meters
+        self._bounds = None  # (first row, last row, first column, last column) of the grid
+        for route in routes:
+            self.add_route(route)
+
+    def __len__(self):
+        return len(self.stops)
+
+    def add_route(self, route):
+        """
+        Method to index the stops of a route
+
+        Parameters
+        ----------
+        route : Route
+            detailed description of the route
+        """
+        for stop in route.stops:
+            position = self._positions.get(stop.tag)
+            if position is not None:
+                if route.tag not in self.route_tags[position]:
+                    self.route_tags[position].append(route.tag)
+                continue
+            if stop.lat is None or stop.lon is None:
+                # stops without a location can't be found by location
+                continue
+            position = len(self.stops)
+            self._positions[stop.tag] = position
+            self.stops.append(stop)
+            self.lats.append(stop.lat)
+            self.lons.append(stop.lon)
+            self.route_tags.append([route.tag])
+            row, column = self._get_cell(stop.lat, stop.lon)
+            self._cells.setdefault((row, column), []).append(position)
+            self._max_abs_lat = max(self._max_abs_lat, abs(stop.lat))
+            if self._bounds is None:
+                self._bounds = (row, row, column, column)
+            else:
+                first_row, last_row, first_column, last_column = self._bounds
+                self._bounds = (
+                    min(first_row, row),
+                    max(last_row, row),
+                    min(first_column, column),
+                    max(last_column, column),
+                )
+
+    def nearest(self, lat, lon, count=1):
+        """
+        Method to find the stops nearest to a location
+
+        Parameters
+        ----------
+        lat : float
+            geographical latitude of the location
+        lon : float
+            geographical longitude of the location
+        count : int, optional
+            number of stops to find, by default 1
+
+        Returns
+        -------
+        list[tuple[float, Stop]]
+            up to count (distance in meters, stop) pairs, nearest first
+        """
+        if not self.stops or count <= 0:
+            return []
+        _, _, first_column, last_column = self._bounds
+        if max(lon - first_column * self.cell_size, (last_column + 1) * self.cell_size - lon) > 90:
+            # the rings only bound the distance to stops less than 90 degrees of longitude
+            # away, and can't tell how close stops across the antimeridian are
+            found = heapq.nsmallest(
+                count,
+                (
+                    (haversine(lat, lon, self.lats[position], self.lons[position]), position)
+                    for position in range(len(self.stops))
+                ),
+            )
+            return [(distance, self.stops[position]) for distance, position in found]
+        row, column = self._get_cell(lat, lon)
+        # a stop outside of the first n rings of cells around the location is at least n
+        # cells of latitude or longitude away from it, and no closer than the meridian that
+        # far away, which is at least cos(latitude) * sin(longitude difference) radians away
+        cos_lat = min(1.0, math.cos(math.radians(max(self._max_abs_lat, abs(lat)))))
+        first_ring, last_ring = self._get_ring_range(row, column)
+        best = []  # heap of (-distance, position) of the nearest stops found so far
+        for ring in range(first_ring, last_ring + 1):
+            for cell in self._get_ring_cells(row, column, ring):
+                for position in self._cells.get(cell, ()):
+                    distance = haversine(lat, lon, self.lats[position], self.lons[position])
+                    if len(best) < count:
+                        heapq.heappush(best, (-distance, position))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, position))
+            if len(best) == count and -best[0][0] <= EARTH_RADIUS * cos_lat * math.sin(
+                math.radians(ring * self.cell_size)
+            ):
+                break
+        best.sort(reverse=True)
+        return [(-distance, self.stops[position]) for distance, position in best]
+
+    def within(self, lat, lon, radius):
+        """
+        Method to find the stops within a distance of a location
+
+        Parameters
+        ----------
+        lat : float
+            geographical latitude of the location
+        lon : float
+            geographical longitude of the location
+        radius : float
+            greatest distance in meters
+
+        Returns
+        -------
+        list[tuple[float, Stop]]
+            (distance in meters, stop) pairs, nearest first
+        """
+        if not self.stops:
+            return []
+        lat_span = radius / METERS_PER_DEGREE
+        lon_span = lat_span / max(math.cos(math.radians(min(abs(lat) + lat_span, 90))), 1e-9)
+        first_row, first_column = self._get_cell(lat - lat_span, lon - lon_span)
+        last_row, last_column = self._get_cell(lat + lat_span, lon + lon_span)
+        # only the cells of the grid can hold stops
+        grid_first_row, grid_last_row, grid_first_column, grid_last_column = self._bounds
+        first_row, last_row = max(first_row, grid_first_row), min(last_row, grid_last_row)
+        first_column = max(first_column, grid_first_column)
+        last_column = min(last_column, grid_last_column)
+        if first_row > last_row or first_column > last_column:
+            return []
+        if (last_row - first_row + 1) * (last_column - first_column + 1) > len(self._cells):
+            # fewer cells hold stops than are covered by the radius, go through those instead
+            cells = [
+                positions
+                for (row, column), positions in self._cells.items()
+                if first_row <= row <= last_row and first_column <= column <= last_column
+            ]
+        else:
+            cells = [
+                self._cells.get((row, column), ())
+                for row in range(first_row, last_row + 1)
+                for column in range(first_column, last_column + 1)
+            ]
+        found = []
+        for positions in cells:
+            for position in positions:
+                distance = haversine(lat, lon, self.lats[position], self.lons[position])
+                if distance <= radius:
+                    found.append((distance, position))
+        found.sort()
+        return [(distance, self.stops[position]) for distance, position in found]
+
+    def _get_cell(self, lat, lon):
+        """Method to get the (row, column) of the grid cell containing a location"""
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _get_ring_range(self, row, column):
+        """
+        Method to get the rings of cells around (row, column) that overlap the grid
+
+        Returns
+        -------
+        tuple[int, int]
+            the first and last ring containing cells of the grid
+        """
+        first_row, last_row, first_column, last_column = self._bounds
+        row_gap = max(first_row - row, row - last_row, 0)
+        column_gap = max(first_column - column, column - last_column, 0)
+        last_ring = max(
+            abs(first_row - row),
+            abs(last_row - row),
+            abs(first_column - column),
+            abs(last_column - column),
+        )
+        return max(row_gap, column_gap), last_ring
+
+    def _get_ring_cells(self, row, column, ring):
+        """
+        Method to list the cells of the grid that are exactly ring cells away from
+        (row, column)
+
+        Returns
+        -------
+        list[tuple[int, int]]
+            (row, column) of each cell of the ring that lies within the grid
+        """
+        if ring == 0:
+            return [(row, column)]
+        first_row, last_row, first_column, last_column = self._bounds
+        cells = []
+        # the top and bottom edges of the ring, corners included
+        columns = range(max(column - ring, first_column), min(column + ring, last_column) + 1)
+        for edge_row in (row - ring, row + ring):
+            if first_row <= edge_row <= last_row:
+                cells.extend((edge_row, edge_column) for edge_column in columns)
+        # the left and right edges of the ring, corners excluded
+        rows = range(max(row - ring + 1, first_row), min(row + ring - 1, last_row) + 1)
+        for edge_column in (column - ring, column + ring):
+            if first_column <= edge_column <= last_column:
+                cells.extend((edge_row, edge_column) for edge_row in rows)
+        return cells
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """
+    Funtion to measure the great-circle distance between two locations
+
+    Parameters
+    ----------
+    lat1 : float
+        geographical latitude of the first location
+    lon1 : float
+        geographical longitude of the first location
+    lat2 : float
+        geographical latitude of the second location
+    lon2 : float
+        geographical longitude of the second location
+
+    Returns
+    -------
+    float
+        distance in meters
+    """
+    lat1 = math.radians(lat1)
+    lat2 = math.radians(lat2)
+    half_dlat = (lat2 - lat1) / 2
+    half_dlon = math.radians(lon2 - lon1) / 2
+    a = math.sin(half_dlat) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(half_dlon) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
@@ -0,0 +1,314 @@
+"""
+    Module contains the transport classes used by the API handler to download
+    the XML feed from the API
+"""
+
+import threading
+import time
+import zlib
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+
+USER_AGENT = "nextbus_api_parser"  # User-Agent header sent with every query
+
+
+class TransportResponse:
+    """
+    Data class that stores the outcome of a query made by a transport
+
+    The body of a '200 OK' response is read with iter_body, until then the response holds
+    on to its connection. It should be closed once it's no longer needed, which happens
+    automatically once the body has been read in full.
+
+    Parameters
+    ----------
+    url : str
+        the query
+    status : int
+        HTTP status code of the response
+    headers : http.client.HTTPMessage
+        headers of the response
+    body : io.BufferedIOBase, optional
+        stream the body is read from, by default the response has no body
+    release : callable, optional
+        called with True once the body has been read in full, or with False if it's
+        abandoned, to hand the connection back to the transport
+    """
+
+    def __init__(self, url, status, headers, body=None, release=None):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.bytes_received = 0  # size of the body as sent over the network
+        self.bytes_decoded = 0  # size of the body once decompressed
+        self.connect_seconds = 0.0  # time taken to open a connection, 0 if one was reused
+        self.first_byte_seconds = 0.0  # time from sending the query to reading the headers
+        self.download_seconds = 0.0  # time spent reading and decoding the body
+        self._body = body
+        self._release = release
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def not_modified(self):
+        """
+        Whether the server confirmed that the copy named in a conditional query is current
+
+        Returns
+        -------
+        bool
+            True if the response is a '304 Not Modified'
+        """
+        return self.status == 304
+
+    def iter_body(self, read_size=65536):
+        """
+        Generator of the decoded body of the response, chunk by chunk as it arrives
+
+        Parameters
+        ----------
+        read_size : int, optional
+            most bytes read from the connection at a time, by default 65536
+
+        Yields
+        ------
+        bytes
+            the next decoded chunk of the body
+        """
+        if self._body is None:
+            return
+        decoder = None
+        if self.headers.get("Content-Encoding", "").lower() == "gzip":
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        while True:
+            # the time spent by the consumer on each chunk isn't part of the download
+            start = time.perf_counter()
+            data = self._body.read(read_size)
+            if not data:
+                self.download_seconds += time.perf_counter() - start
+                break
+            self.bytes_received += len(data)
+            if decoder is not None:
+                data = decoder.decompress(data)
+            self.download_seconds += time.perf_counter() - start
+            if data:
+                self.bytes_decoded += len(data)
+                yield data
+        if decoder is not None:
+            data = decoder.flush()
+            if data:
+                self.bytes_decoded += len(data)
+                yield data
+        self._finish(True)
+
+    def close(self):
+        """Method to release the connection of the response, abandoning any unread body"""
+        self._finish(False)
+
+    def _finish(self, complete):
+        """Method to hand the connection back to the transport, once"""
+        release, self._release, self._body = self._release, None, None
+        if release is not None:
+            release(complete)
+
+
+class HttpTransport:
+    """
+    Class that downloads queries over pooled keep-alive HTTP connections.
+
+    Responses are requested gzip compressed and are decoded and passed on chunk by chunk,
+    so a body is never held in memory as a whole. An instance can be shared between threads.
+
+    Parameters
+    ----------
+    connect_timeout : float, optional
+        seconds to wait for a connection to be established, by default DEFAULT_CONNECT_TIMEOUT
+    read_timeout : float, optional
+        seconds to wait for data from an established connection, by default
+        DEFAULT_READ_TIMEOUT
+    max_idle_connections : int, optional
+        most idle connections kept open per host, by default DEFAULT_MAX_IDLE_CONNECTIONS
+    headers : dict[str, str], optional
+        extra headers sent with every query
+    """
+
+    DEFAULT_CONNECT_TIMEOUT = 10
+    DEFAULT_READ_TIMEOUT = 30
+    DEFAULT_MAX_IDLE_CONNECTIONS = 8
+    READ_SIZE = 65536  # most bytes read from a connection at a time
+
+    def __init__(
+        self,
+        connect_timeout=None,
+        read_timeout=None,
+        max_idle_connections=None,
+        headers=None,
+    ):
+        self.connect_timeout = connect_timeout or self.DEFAULT_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or self.DEFAULT_READ_TIMEOUT
+        self.max_idle_connections = (
+            max_idle_connections or self.DEFAULT_MAX_IDLE_CONNECTIONS
+        )
+        self.headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip"}
+        self.headers.update(headers or {})
+        self._lock = threading.Lock()
+        # idle keep-alive connections, keyed by (scheme, host, port)
+        self._idle_connections = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Method to close every idle keep-alive connection"""
+        with self._lock:
+            connections, self._idle_connections = self._idle_connections, {}
+        for pool in connections.values():
+            for connection in pool:
+                connection.close()
+
+    def fetch(self, url, feed, headers=None):
+        """
+        Method to download a query, passing the decoded body to feed as it arrives
+
+        Parameters
+        ----------
+        url : str
+            the query
+        feed : callable
+            called with each decoded chunk of the body, e.g. the feed method of an
+            incremental xml parser
+        headers : dict[str, str], optional
+            extra headers sent with this query e.g. conditional request headers
+
+        Returns
+        -------
+        TransportResponse
+            status and headers of the response. A '304 Not Modified' response has no body
+            and feed isn't called
+
+        Raises
+        ------
+        urllib.error.HTTPError
+            if the server responded with any other status than 200 or 304
+        """
+        with self.open(url, headers) as response:
+            for data in response.iter_body(self.READ_SIZE):
+                feed(data)
+        return response
+
+    def open(self, url, headers=None):
+        """
+        Method to send a query and wait for the status and headers of the response
+
+        Parameters
+        ----------
+        url : str
+            the query
+        headers : dict[str, str], optional
+            extra headers sent with this query e.g. conditional request headers
+
+        Returns
+        -------
+        TransportResponse
+            the response, whose body is read with iter_body. A '304 Not Modified'
+            response has no body
+
+        Raises
+        ------
+        urllib.error.HTTPError
+            if the server responded with any other status than 200 or 304
+        """
+        parts = urlsplit(url)
+        default_port = 443 if parts.scheme == "https" else 80
+        key = (parts.scheme, parts.hostname, parts.port or default_port)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+
+        start = time.perf_counter()
+        connection, reused = self._get_connection(key)
+        connected = time.perf_counter()
+        connect_seconds = 0.0 if reused else connected - start
+        try:
+            try:
+                connection.request("GET", path, headers=request_headers)
+                response = connection.getresponse()
+            except (HTTPException, ConnectionError):
+                if not reused:
+                    raise
+                # the server closed the idle connection in the meantime, try a new one
+                connection.close()
+                start = time.perf_counter()
+                connection, reused = self._get_connection(key, idle=False)
+                connected = time.perf_counter()
+                connect_seconds = connected - start
+                connection.request("GET", path, headers=request_headers)
+                response = connection.getresponse()
+            first_byte_seconds = time.perf_counter() - connected
+
+            if response.status != 200:
+                response.read()
+                if response.status != 304:
+                    raise HTTPError(
+                        url, response.status, response.reason, response.headers, None
+                    )
+        except BaseException:
+            # the state of the connection is unknown, it can't be reused
+            connection.close()
+            raise
+
+        def release(complete):
+            if complete and not response.will_close:
+                self._release_connection(key, connection)
+            else:
+                # a connection with an unread body can't be reused
+                connection.close()
+
+        if response.status == 200:
+            transport_response = TransportResponse(
+                url, response.status, response.headers, response, release
+            )
+        else:
+            release(True)
+            transport_response = TransportResponse(url, response.status, response.headers)
+        transport_response.connect_seconds = connect_seconds
+        transport_response.first_byte_seconds = first_byte_seconds
+        return transport_response
+
+    def _get_connection(self, key, idle=True):
+        """
+        Method to take an idle connection to (scheme, host, port), or open a new one
+
+        Returns
+        -------
+        tuple[http.client.HTTPConnection, bool]
+            the connection and whether it was reused
+        """
+        if idle:
+            with self._lock:
+                pool = self._idle_connections.get(key)
+                if pool:
+                    return pool.pop(), True
+        scheme, host, port = key
+        connection_class = HTTPSConnection if scheme == "https" else HTTPConnection
+        connection = connection_class(host, port, timeout=self.connect_timeout)
+        connection.connect()
+        connection.sock.settimeout(self.read_timeout)
+        return connection, False
+
+    def _release_connection(self, key, connection):
+        """Method to keep a connection open for reuse, unless enough are already idle"""
+        with self._lock:
+            pool = self._idle_connections.setdefault(key, [])
+            if len(pool) < self.max_idle_connections:
+                pool.append(connection)
+                return
+        connection.close()
@@ -0,0 +1,110 @@
+"""
+    Module contains the vehicle tracker, which keeps an up-to-date table of
+    vehicle locations by polling the API for the vehicles that changed
+"""
+
+import threading
+import time
+from nextbus_api_parser.data_classes import Error
+
+
+class VehicleTracker:
+    """
+    Class that keeps the latest location of every vehicle of an agency (or of one of its
+    routes), keyed by vehicle id.
+
+    Each poll sends back the lastTime of the previous response, so the API only sends the
+    vehicles that reported since then, which are merged into the table. Vehicles that
+    haven't reported for longer than max_age are dropped from the table. An instance can be
+    shared between threads.
+
+    Parameters
+    ----------
+    api_handler : ApiHandler
+        handler used to make the API calls
+    agency_tag : str
+        NextBus API tag of the agency being tracked
+    route_tag : str, optional
+        NextBus API tag of the route being tracked, by default every route of the agency
+    max_age : float, optional
+        seconds after its last report that a vehicle is dropped, by default DEFAULT_MAX_AGE
+    clock : callable, optional
+        function returning the current time in seconds since the epoch, by default time.time
+    """
+
+    DEFAULT_MAX_AGE = 5 * 60
+
+    def __init__(self, api_handler, agency_tag, route_tag=None, max_age=None, clock=time.time):
+        self.api_handler = api_handler
+        self.agency_tag = agency_tag
+        self.route_tag = route_tag
+        self.max_age = max_age or self.DEFAULT_MAX_AGE
+        self.clock = clock
+        self.vehicles = {}  # vehicle id -> latest reported Vehicle
+        self.reported_at = {}  # vehicle id -> time of its latest report, in seconds
+        self.last_time = None  # lastTime of the latest response, sent back as the next since
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.vehicles)
+
+    def poll(self):
+        """
+        Method to make an API call for the vehicles that reported since the previous poll
+        and merge them into the table
+
+        Returns
+        -------
+        list[Vehicle]
+            The vehicles that reported since the previous poll, or the Error flagged by the API
+        """
+        vehicle_locations = self.api_handler.get_vehicle_locations(
+            self.agency_tag, self.route_tag, self.last_time
+        )
+        if isinstance(vehicle_locations, Error):
+            return vehicle_locations
+        now = self.clock()
+        with self._lock:
+            for vehicle in vehicle_locations.vehicles:
+                self.vehicles[vehicle.id] = vehicle
+                self.reported_at[vehicle.id] = now - (vehicle.secs_since_report or 0)
+            if vehicle_locations.last_time is not None:
+                self.last_time = vehicle_locations.last_time
+            self._expire(now)
+        return vehicle_locations.vehicles
+
+    def expire(self):
+        """
+        Method to drop the vehicles that haven't reported for longer than max_age
+
+        Returns
+        -------
+        list[str]
+            ids of the dropped vehicles
+        """
+        with self._lock:
+            return self._expire(self.clock())
+
+    def get_vehicles(self):
+        """
+        Method to get a snapshot of the table
+
+        Returns
+        -------
+        list[Vehicle]
+            latest reported location of each tracked vehicle
+        """
+        with self._lock:
+            return list(self.vehicles.values())
+
+    def _expire(self, now):
+        """Method to drop stale vehicles, the lock must be held by the caller"""
+        stale = [
+            vehicle_id
+            for vehicle_id, reported_at in self.reported_at.items()
+            if now - reported_at > self.max_age
+        ]
+        for vehicle_id in stale:
+            del self.vehicles[vehicle_id]
+            del self.reported_at[vehicle_id]
+        return stale
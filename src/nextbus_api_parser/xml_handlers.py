@@ -3,71 +3,74 @@
     feed from the API into appropriate data classes
 """
 
+from array import array
 from xml.sax import ContentHandler
-from nextbus_api_parser.data_classes import Agency, Error, Predictions, Route
+from nextbus_api_parser.data_classes import (
+    Agency,
+    Direction,
+    Error,
+    Path,
+    Point,
+    Predictions,
+    Route,
+    Schedule,
+    Stop,
+    VehicleLocations,
+)
+
+ROUTE_PARTS = ("stops", "directions", "paths")  # parts of a route, in the order of the feed
+
+
+class DispatchHandler(ContentHandler):
+    """
+    Base class of the XML handlers, which dispatches every tag in the xml tree to the
+    method registered for it in a dict rather than through a chain of comparisons
+
+    start_handlers maps the title of an XML element to the method called with its
+    attributes when the element starts, end_handlers to the method called without
+    arguments when it ends, and text_elements lists the elements whose text is passed to
+    characters. Parser backends may read these to call the methods directly and to skip
+    the text of every other element (see parser_backends)
+    """
 
-
-class AgencyListHandler(ContentHandler):
-    """Class to parse XML data for a list of Agencies from the API"""
     def __init__(self):
-        self.agencies = []
         self.error = None
+        # set once the handler has read everything it needs, the rest of the feed can then
+        # be skipped rather than parsed
+        self.complete = False
+        self.start_handlers = {"Error": self.start_error}
+        self.end_handlers = {"Error": self.end_error}
+        self.text_elements = {"Error"}
+        self._error_text = None  # pieces of the error message, while it's being read
         ContentHandler.__init__(self)
 
     def startElement(self, name, attrs):
         """
-        Method to process 'agency' tags in the xml tree
+        Method to process appropriate tags in the xml tree
 
         Parameters
         ----------
         name : str
             title of XML element
         attrs : dict
-            XML attributes describing the Agency
+            XML attributes of the element
         """
-        if name == "agency":
-            self.agencies.append(Agency(attrs))
-
-        elif name == "Error":
-            # an error element only exists if there's an error, initialize the error object if so
-            self.error = Error(attrs)
-
-    def characters(self, content):
-        """
-        Method to collect the error message, if the xml tree has been flagged as containing an error
-
-        Parameters
-        ----------
-        content : any
-            content of XML element
-        """
-        if self.error is not None:
-            self.error.set_message(content)
-
-class RouteListHandler(ContentHandler):
-    """Class to parse XML data for a list of an Agency's Routes from the API"""
-    def __init__(self):
-        self.routes = []
-        self.error = None
-        ContentHandler.__init__(self)
+        method = self.start_handlers.get(name)
+        if method is not None:
+            method(attrs)
 
-    def startElement(self, name, attrs):
+    def endElement(self, name):
         """
-        Method to process 'route' tags in the xml tree
+        Method to process the end of appropriate tags in the xml tree
 
         Parameters
         ----------
         name : str
             title of XML element
-        attrs : dict
-            XML attributes describing the Route
         """
-        if name == "route":
-            self.routes.append(Route(attrs))
-
-        elif name == "Error":
-            # an error element only exists if there's an error, initialize the error object if so
-            self.error = Error(attrs)
+        method = self.end_handlers.get(name)
+        if method is not None:
+            method()
 
     def characters(self, content):
         """
@@ -78,107 +81,362 @@ class RouteListHandler(ContentHandler):
         content : any
             content of XML element
         """
-        if self.error is not None:
-            self.error.set_message(content)
+        if self._error_text is not None:
+            self._error_text.append(content)
+
+    def start_error(self, attrs):
+        """Method to process an 'Error' tag"""
+        # an error element only exists if there's an error, initialize the error object if so
+        self.error = Error(attrs)
+        self._error_text = []
+
+    def end_error(self):
+        """Method to set the error message once the whole 'Error' tag has been read"""
+        # parsers may split the message into several pieces, and the whitespace
+        # around it is only there to indent the feed
+        self.error.set_message("".join(self._error_text).strip() or None)
+        self._error_text = None
 
-class RouteDetailsHandler(ContentHandler):
-    """Class to parse XML data for a detailed description of a Route from the API"""
 
+class AgencyListHandler(DispatchHandler):
+    """Class to parse XML data for a list of Agencies from the API"""
     def __init__(self):
-        # this boolean indicates whether the tree has reached the part where it's listing Directions
-        # and the stops associated with them
-        self.is_in_direction_tag = False
-        self.error = None
-        self.route = None
-        self.direction_tag = False
-        ContentHandler.__init__(self)
+        DispatchHandler.__init__(self)
+        self.agencies = []
+        self.start_handlers["agency"] = self.start_agency
 
-    def startElement(self, name, attrs):
-        """
-        Method to process appropriate tags in the xml tree
+    def start_agency(self, attrs):
+        """Method to process an 'agency' tag"""
+        self.agencies.append(Agency(attrs))
 
-        Parameters
-        ----------
-        name : str
-            title of XML element
-        attrs : dict
-            XML attributes describing the Route
-        """
-        if name == "route":
-            self.route = Route(attrs, True)
 
-        elif name == "stop":
-            if ~self.is_in_direction_tag:
-                self.route.add_stop(attrs)
-            else:
-                self.route.add_stop(attrs, True)
+class RouteListHandler(DispatchHandler):
+    """Class to parse XML data for a list of an Agency's Routes from the API"""
+    def __init__(self):
+        DispatchHandler.__init__(self)
+        self.routes = []
+        self.start_handlers["route"] = self.start_route
 
-        elif name == "direction":
-            self.route.add_direction(attrs)
-            self.direction_tag = True
+    def start_route(self, attrs):
+        """Method to process a 'route' tag"""
+        self.routes.append(Route(attrs))
 
-        elif name == "path":
-            self.route.add_path(attrs)
 
-        elif name == "point":
-            self.route.add_point(attrs)
+class RouteDetailsHandler(DispatchHandler):
+    """
+    Class to parse XML data for a detailed description of a Route from the API
 
-        elif name == "Error":
-            # an error element only exists if there's an error, initialize the error object if so
-            self.error = Error(attrs)
+    The stops of the route are listed once with their details, then again under each
+    direction by tag only. parent tracks which of these lists is being read
 
-    def characters(self, content):
-        """
-        Method to collect the error message, if the xml tree has been flagged as containing an error
+    Parameters
+    ----------
+    parts : iterable[str], optional
+        parts of the route to read among ROUTE_PARTS, by default all of them. The elements of
+        the other parts are skipped, leaving the matching Route lists empty, and the handler
+        is complete once the last part it reads is behind it
+    """
 
-        Parameters
-        ----------
-        content : any
-            content of XML element
-        """
-        if self.error is not None:
-            self.error.set_message(content)
+    def __init__(self, parts=None):
+        DispatchHandler.__init__(self)
+        self.parts = get_route_parts(parts)
+        self.route = None
+        # title of the element the tags being read are nested in: 'route', 'direction' or 'path'
+        self.parent = None
+        self.start_handlers["route"] = self.start_route
+        if "stops" in self.parts and "directions" in self.parts:
+            self.start_handlers["stop"] = self.start_stop
+        elif "stops" in self.parts:
+            self.start_handlers["stop"] = self.start_route_stop
+        elif "directions" in self.parts:
+            self.start_handlers["stop"] = self.start_direction_stop
+        if "directions" in self.parts:
+            self.start_handlers["direction"] = self.start_direction
+        else:
+            self.start_handlers["direction"] = self.start_skipped_direction
+        if "paths" in self.parts:
+            self.start_handlers.update(path=self.start_path, point=self.start_point)
+        else:
+            self.start_handlers["path"] = self.start_skipped_path
+        self.end_handlers.update(
+            direction=self.end_child,
+            path=self.end_child,
+        )
+
+    def start_route(self, attrs):
+        """Method to process the 'route' tag"""
+        self.route = Route(attrs, True)
+        self.parent = "route"
+        if not self.parts:
+            self.complete = True
+
+    def start_stop(self, attrs):
+        """Method to process a 'stop' tag"""
+        if self.parent == "direction":
+            self.route.add_stop(attrs, True)
+        else:
+            self.route.add_stop(attrs)
+
+    def start_route_stop(self, attrs):
+        """Method to process a 'stop' tag, when the stops of the directions are skipped"""
+        if self.parent != "direction":
+            self.route.add_stop(attrs)
+
+    def start_direction_stop(self, attrs):
+        """Method to process a 'stop' tag, when the stops of the route are skipped"""
+        if self.parent == "direction":
+            self.route.add_stop(attrs, True)
+
+    def start_direction(self, attrs):
+        """Method to process a 'direction' tag"""
+        self.route.add_direction(attrs)
+        self.parent = "direction"
+
+    def start_skipped_direction(self, attrs):
+        """Method to process a 'direction' tag, when the directions are skipped"""
+        self.parent = "direction"
+        if "paths" not in self.parts:
+            # the directions come after the stops
+            self.complete = True
+
+    def start_path(self, attrs):
+        """Method to process a 'path' tag"""
+        self.route.add_path(attrs)
+        self.parent = "path"
+
+    def start_skipped_path(self, attrs):
+        """Method to process a 'path' tag, when the paths are skipped"""
+        # the paths come last
+        self.parent = "path"
+        self.complete = True
+
+    def start_point(self, attrs):
+        """Method to process a 'point' tag"""
+        self.route.add_point(attrs)
+
+    def end_child(self):
+        """Method to process the end of a 'direction' or 'path' tag"""
+        self.parent = "route"
+
+
+class StreamingRouteDetailsHandler(DispatchHandler):
+    """
+    Class to parse XML data for a detailed description of a Route from the API into a
+    stream of records, rather than into a single Route
+
+    The records are appended to records as soon as they are complete, in document order:
+    the Route itself (without its stops, directions or paths), then each of its Stops,
+    each of its Directions with the tags of their stops, and each of its Paths followed by
+    the Points of that path. Whoever consumes the records should empty the list as it goes.
+    The stops are also kept in stop_by_tag, so that the stops of the directions can be
+    looked up
+    """
 
-class PredictionsHandler(ContentHandler):
-    """Class to parse XML data for a list of a Stop's Predictions from the API"""
     def __init__(self):
-        self.error = None
+        DispatchHandler.__init__(self)
+        self.records = []
+        self.stop_by_tag = {}  # the stops emitted so far, keyed by tag
+        self.direction = None  # the direction whose stops are being listed, if any
+        self.start_handlers.update(
+            route=self.start_route,
+            stop=self.start_stop,
+            direction=self.start_direction,
+            path=self.start_path,
+            point=self.start_point,
+        )
+        self.end_handlers["direction"] = self.end_direction
+
+    def start_route(self, attrs):
+        """Method to process the 'route' tag"""
+        self.records.append(Route(attrs, True))
+
+    def start_stop(self, attrs):
+        """Method to process a 'stop' tag"""
+        if self.direction is None:
+            stop = Stop(attrs)
+            self.stop_by_tag[stop.tag] = stop
+            self.records.append(stop)
+        else:
+            self.direction.add_stop(attrs)
+
+    def start_direction(self, attrs):
+        """Method to process a 'direction' tag"""
+        self.direction = Direction(attrs, self.stop_by_tag)
+
+    def start_path(self, attrs):
+        """Method to process a 'path' tag"""
+        self.records.append(Path(attrs))
+
+    def start_point(self, attrs):
+        """Method to process a 'point' tag"""
+        self.records.append(Point(attrs))
+
+    def end_direction(self):
+        """Method to emit a direction once all of its stops have been listed"""
+        self.records.append(self.direction)
+        self.direction = None
+
+
+class PredictionsHandler(DispatchHandler):
+    """
+    Class to parse XML data for a list of a Stop's Predictions from the API
+
+    A predictionsForMultiStops feed contains one 'predictions' tag per stop, these are all
+    collected in predictions_list while predictions holds the most recent one
+    """
+    def __init__(self):
+        DispatchHandler.__init__(self)
         self.predictions = None
-        ContentHandler.__init__(self)
+        self.predictions_list = []
+        self.start_handlers.update(
+            predictions=self.start_predictions,
+            direction=self.start_direction,
+            prediction=self.start_prediction,
+        )
 
-    def startElement(self, name, attrs):
-        """
-        Method to process appropriate tags in the xml tree
+    def start_predictions(self, attrs):
+        """Method to process a 'predictions' tag"""
+        self.predictions = Predictions(attrs)
+        self.predictions_list.append(self.predictions)
 
-        Parameters
-        ----------
-        name : str
-            title of XML element
-        attrs : dict
-            XML attributes describing the Agency
-        """
-        if name == "predictions":
-            self.predictions = Predictions(attrs)
+    def start_direction(self, attrs):
+        """Method to process a 'direction' tag"""
+        self.predictions.add_direction(attrs)
 
-        elif name == "direction":
-            self.predictions.add_direction(attrs)
+    def start_prediction(self, attrs):
+        """Method to process a 'prediction' tag"""
+        self.predictions.add_predictions(attrs)
 
-        elif name == "prediction":
-            self.predictions.add_predictions(attrs)
 
-        elif name == "Error":
-            # an error element only exists if there's an error, initialize the error object if so
-            self.error = Error(attrs)
+class VehicleLocationsHandler(DispatchHandler):
+    """Class to parse XML data for the locations of an Agency's vehicles from the API"""
+    def __init__(self):
+        DispatchHandler.__init__(self)
+        self.vehicle_locations = VehicleLocations()
+        self.start_handlers.update(
+            vehicle=self.start_vehicle,
+            lastTime=self.start_last_time,
+        )
+
+    def start_vehicle(self, attrs):
+        """Method to process a 'vehicle' tag"""
+        self.vehicle_locations.add_vehicle(attrs)
+
+    def start_last_time(self, attrs):
+        """Method to process the 'lastTime' tag"""
+        self.vehicle_locations.set_last_time(attrs)
+
+
+class ScheduleHandler(DispatchHandler):
+    """
+    Class to parse XML data for the schedule of a Route from the API
+
+    Each table of the schedule starts with a header listing its stops by tag and title,
+    followed by a row per trip whose cells hold the time the trip reaches each stop. The
+    times are appended to the packed arrays of the Schedule as the cells are read, without
+    building an object per row or cell, and cells only have a start handler since there
+    are many more of them than of any other element. Cells of stops a trip doesn't serve
+    are skipped
+    """
+
+    def __init__(self):
+        DispatchHandler.__init__(self)
+        self.schedule = Schedule()
+        self.start_handlers.update(
+            route=self.start_route,
+            header=self.start_header,
+            stop=self.start_stop,
+        )
+        self.end_handlers.update(route=self.end_route, header=self.end_header)
+        self.text_elements.add("header")  # the titles of the stops, not the times of trips
+        self._service_class = None  # service class of the table being read
+        self._direction = None  # direction of the table being read
+        self._stop_times = None  # times of the stops of that table, keyed by tag
+        self._in_header = False
+        self._stop_tag = None  # tag of the last header stop, whose title is being read
 
     def characters(self, content):
         """
-        Method to collect the error message, if the xml tree has been flagged as containing an error
+        Method to collect the titles of the stops listed in a header, as well as error
+        messages. The whitespace after a title is stripped once the header has been read
 
         Parameters
         ----------
         content : any
             content of XML element
         """
-        if self.error is not None:
-            self.error.set_message(content)
-            
\ No newline at end of file
+        if self._stop_tag is not None:
+            self.schedule.stop_titles[self._stop_tag] += content
+        else:
+            DispatchHandler.characters(self, content)
+
+    def start_route(self, attrs):
+        """Method to process a 'route' tag, which starts a table of the schedule"""
+        self._service_class = attrs.get("serviceClass", "")
+        self._direction = attrs.get("direction", "")
+        self._stop_times = self.schedule.add_table(attrs)
+
+    def end_route(self):
+        """Method to sort the times once a table has been read"""
+        self.schedule.sort(self._service_class, self._direction)
+
+    def start_header(self, attrs):
+        """Method to process a 'header' tag, which lists the stops of a table"""
+        self._in_header = True
+
+    def end_header(self):
+        """Method to tidy up the titles of the stops once a header has been read"""
+        self._in_header = False
+        self._stop_tag = None
+        stop_titles = self.schedule.stop_titles
+        for stop_tag, title in stop_titles.items():
+            stop_titles[stop_tag] = title.strip()
+
+    def start_stop(self, attrs):
+        """Method to process a 'stop' tag, either in a header or a cell of a trip"""
+        stop_tag = attrs.get("tag")
+        if self._in_header:
+            self._stop_tag = stop_tag
+            self.schedule.stop_titles[stop_tag] = ""
+            return
+        try:
+            epoch_time = int(attrs["epochTime"])  # milliseconds after midnight
+        except (KeyError, ValueError):
+            return
+        if epoch_time < 0:
+            # -1 stands for a stop the trip doesn't serve
+            return
+        stop_times = self._stop_times.get(stop_tag)
+        if stop_times is None:
+            stop_times = self._stop_times[stop_tag] = array("H")
+        stop_times.append(epoch_time // 60000)
+
+
+def get_route_parts(parts=None):
+    """
+    Funtion to check the parts of a route asked for, and list them in the order of the feed
+
+    Parameters
+    ----------
+    parts : iterable[str], optional
+        parts of the route among ROUTE_PARTS, by default all of them
+
+    Returns
+    -------
+    tuple[str]
+        the parts, in the order of ROUTE_PARTS
+
+    Raises
+    ------
+    ValueError
+        if a part isn't one of ROUTE_PARTS
+    """
+    if parts is None:
+        return ROUTE_PARTS
+    parts = set(parts)
+    unknown_parts = parts - set(ROUTE_PARTS)
+    if unknown_parts:
+        raise ValueError(
+            f"unknown route parts {sorted(unknown_parts)}, expected some of {ROUTE_PARTS}"
+        )
+    return tuple(part for part in ROUTE_PARTS if part in parts)
@@ -0,0 +1,41 @@
+"""
+    Fixtures shared by the tests, which run against the stub server of the benchmarks
+    rather than the network
+"""
+
+import pytest
+
+from nextbus_api_parser.transport import HttpTransport
+
+import stub_server
+
+
+class CountingTransport(HttpTransport):
+    """Class of a transport recording the queries it downloads, and their status"""
+
+    def __init__(self):
+        HttpTransport.__init__(self)
+        self.queries = []
+        self.statuses = []
+
+    def fetch(self, url, feed, headers=None):
+        self.queries.append(url)
+        response = HttpTransport.fetch(self, url, feed, headers)
+        self.statuses.append(response.status)
+        return response
+
+
+@pytest.fixture(scope="session")
+def domain():
+    """Fixture starting the stub server once, yielding the domain to pass to the handlers"""
+    server, domain = stub_server.start()
+    yield domain
+    server.shutdown()
+
+
+@pytest.fixture
+def transport():
+    """Fixture of a transport recording the queries made by a handler"""
+    transport = CountingTransport()
+    yield transport
+    transport.close()
@@ -0,0 +1,95 @@
+"""
+    Tests of the batched multi-stop predictions of the API handlers
+"""
+
+import asyncio
+from urllib.parse import parse_qs, urlsplit
+
+from nextbus_api_parser.api_handler import ApiHandler, BaseApiHandler
+from nextbus_api_parser.async_api_handler import AsyncApiHandler
+from nextbus_api_parser.data_classes import Error, Predictions
+
+from stub_server import INVALID_TAG
+
+AGENCY_TAG = "sf-muni"
+
+
+def get_stops(count):
+    """Funtion to build the (route tag, stop tag) pairs of count stops"""
+    return [(f"R{index % 7}", f"S{index}") for index in range(count)]
+
+
+def test_multi_stop_chunks_cover_every_stop_in_order():
+    stops = get_stops(1000)
+    chunks = BaseApiHandler().get_multi_stop_chunks(AGENCY_TAG, stops)
+    assert len(chunks) > 1
+    assert [stop for _, chunk in chunks for stop in chunk] == stops
+    for query, chunk in chunks:
+        assert parse_qs(urlsplit(query).query)["stops"] == [f"{r}|{s}" for r, s in chunk]
+
+
+def test_multi_stop_chunks_respect_query_length():
+    api_handler = BaseApiHandler()
+    stops = [(f"route-{index}", "stop-" + "x" * 40) for index in range(200)]
+    chunks = api_handler.get_multi_stop_chunks(AGENCY_TAG, stops)
+    assert all(len(query) <= api_handler.MAX_QUERY_LENGTH for query, _ in chunks)
+    for (query, _), (_, next_chunk) in zip(chunks, chunks[1:]):
+        # every query is full: the next stop wouldn't have fit in it
+        next_param = api_handler.MULTI_STOP_PARAM.format(*next_chunk[0])
+        assert len(query) + len(next_param) > api_handler.MAX_QUERY_LENGTH
+
+
+def test_multi_stop_chunks_respect_stops_per_query():
+    api_handler = BaseApiHandler()
+    api_handler.MAX_QUERY_LENGTH = 10 ** 6
+    stops = get_stops(2 * api_handler.MAX_STOPS_PER_QUERY + 1)
+    chunks = api_handler.get_multi_stop_chunks(AGENCY_TAG, stops)
+    assert [len(chunk) for _, chunk in chunks] == [
+        api_handler.MAX_STOPS_PER_QUERY,
+        api_handler.MAX_STOPS_PER_QUERY,
+        1,
+    ]
+
+
+def test_multi_stop_queries_match_chunks():
+    api_handler = BaseApiHandler()
+    stops = get_stops(500)
+    assert api_handler.get_multi_stop_queries(AGENCY_TAG, stops) == [
+        query for query, _ in api_handler.get_multi_stop_chunks(AGENCY_TAG, stops)
+    ]
+    assert api_handler.get_multi_stop_chunks(AGENCY_TAG, []) == []
+
+
+def test_predictions_multi_returns_every_stop(domain):
+    stops = get_stops(400)
+    with ApiHandler(domain) as api_handler:
+        results = api_handler.get_predictions_multi(AGENCY_TAG, stops)
+    assert set(results) == set(stops)
+    assert all(isinstance(result, Predictions) for result in results.values())
+
+
+def test_predictions_multi_keeps_chunks_without_errors(domain):
+    stops = get_stops(400)
+    stops[200] = ("R0", INVALID_TAG)
+    with ApiHandler(domain) as api_handler:
+        chunks = api_handler.get_multi_stop_chunks(AGENCY_TAG, stops)
+        results = api_handler.get_predictions_multi(AGENCY_TAG, stops)
+    failed_chunk = next(chunk for _, chunk in chunks if ("R0", INVALID_TAG) in chunk)
+    assert set(results) == set(stops)
+    for stop, result in results.items():
+        assert isinstance(result, Error) == (stop in failed_chunk)
+
+
+def test_async_predictions_multi_keeps_chunks_without_errors(domain):
+    stops = get_stops(400)
+    stops[0] = ("R0", INVALID_TAG)
+
+    async def get_results():
+        async with AsyncApiHandler(domain) as api_handler:
+            return await api_handler.get_predictions_multi(AGENCY_TAG, stops)
+
+    results = asyncio.run(get_results())
+    first_chunk = BaseApiHandler(domain).get_multi_stop_chunks(AGENCY_TAG, stops)[0][1]
+    assert set(results) == set(stops)
+    for stop, result in results.items():
+        assert isinstance(result, Error) == (stop in first_chunk)
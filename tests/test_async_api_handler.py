@@ -0,0 +1,48 @@
+"""
+    Tests of the pooled keep-alive connections of the asynchronous API handler
+"""
+
+import asyncio
+import gc
+
+import pytest
+
+from nextbus_api_parser.async_api_handler import AsyncApiHandler
+from nextbus_api_parser.data_classes import Predictions
+
+
+async def get_predictions(api_handler, count):
+    """Coroutine making count concurrent predictions queries and closing the handler"""
+    async with api_handler:
+        return await asyncio.gather(
+            *(api_handler.get_predictions("sf-muni", "N", str(index)) for index in range(count))
+        )
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_handler_can_be_used_from_several_event_loops(domain):
+    api_handler = AsyncApiHandler(domain, max_connections=4)
+    for _ in range(3):
+        results = asyncio.run(get_predictions(api_handler, 12))
+        assert all(isinstance(result, Predictions) for result in results)
+    # an unclosed transport would be reported as an unraisable ResourceWarning
+    gc.collect()
+
+
+def test_close_waits_for_the_connections_to_close(domain):
+    api_handler = AsyncApiHandler(domain, max_connections=4)
+
+    async def check():
+        await asyncio.gather(
+            *(api_handler.get_predictions("sf-muni", "N", str(index)) for index in range(8))
+        )
+        writers = [writer for pool in api_handler._idle_connections.values() for _, writer in pool]
+        assert writers
+        await api_handler.close()
+        assert not api_handler._idle_connections
+        assert all(writer.transport.is_closing() for writer in writers)
+        # the transports drop their protocol once the connection is lost, which is what
+        # wait_closed waits for
+        assert all(writer.transport.get_protocol() is None for writer in writers)
+
+    asyncio.run(check())
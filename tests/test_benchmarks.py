@@ -0,0 +1,97 @@
+"""
+    Tests of the benchmark suite: its synthetic feeds, its cases and the comparison of
+    saved results
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from nextbus_api_parser.parser_backends import get_backend
+
+import bench_suite
+import compare
+from stub_server import SYNTHETIC_PREFIX
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(compare.__file__))
+SCALE = 0.01  # factor applied to the size of the synthetic feeds
+
+
+def test_handler_cases_parse_their_feeds():
+    cases = bench_suite.get_handler_cases(SCALE)
+    assert any(".fixture" in name for name in cases)
+    for name, (handler_class, build_feed) in cases.items():
+        handler = bench_suite.parse_feed(get_backend(), handler_class, build_feed())
+        assert handler.error is None, name
+
+
+def test_synthetic_feeds_scale():
+    cases = bench_suite.get_handler_cases(SCALE)
+    handler_class, build_feed = cases["handler.RouteDetailsHandler.stops-100"]
+    route = bench_suite.parse_feed(get_backend(), handler_class, build_feed()).route
+    assert len(route.stops) == 100 and route.directions and route.paths
+    handler_class, build_feed = cases["handler.RouteDetailsHandler.points-1000"]
+    route = bench_suite.parse_feed(get_backend(), handler_class, build_feed()).route
+    assert sum(len(path) for path in route.paths) == 1000
+
+
+def test_api_cases_run_against_the_stub_server(domain):
+    cases = bench_suite.get_api_cases(SCALE)
+    assert f"api.get_route_details.{SYNTHETIC_PREFIX}100" in cases
+    result = bench_suite.run_case("api.get_predictions", SCALE, 1, "expat", domain)
+    assert result["benchmark"] == "api.get_predictions"
+    for metric in compare.DEFAULT_METRICS:
+        assert result[metric] > 0
+    json.dumps(result)  # results are saved as JSON
+
+
+def save_results(path, results, commit):
+    """Funtion to save results the way bench_suite.py does"""
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump({"metadata": {"commit": commit}, "results": results}, results_file)
+
+
+def test_compare_flags_regressions_above_the_threshold(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    current = tmp_path / "current.json"
+    save_results(
+        baseline,
+        [
+            {"benchmark": "a", "seconds": 1.0, "alloc_peak_bytes": 100},
+            {"benchmark": "b", "seconds": 1.0, "alloc_peak_bytes": 0},
+            {"benchmark": "removed", "seconds": 1.0},
+        ],
+        "before",
+    )
+    save_results(
+        current,
+        [
+            {"benchmark": "a", "seconds": 1.05, "alloc_peak_bytes": 150},
+            {"benchmark": "b", "seconds": 0.5, "alloc_peak_bytes": 10},
+            {"benchmark": "added", "seconds": 9.0},
+        ],
+        "after",
+    )
+    metadata, baseline_results = compare.load_results(baseline)
+    assert metadata["commit"] == "before" and set(baseline_results) == {"a", "b", "removed"}
+    comparisons = compare.compare(
+        baseline_results, compare.load_results(current)[1], ["seconds", "alloc_peak_bytes"], 0.1
+    )
+    # a metric that was 0 in the baseline can't be compared
+    assert {(c["benchmark"], c["metric"]): c["regression"] for c in comparisons} == {
+        ("a", "seconds"): False,
+        ("a", "alloc_peak_bytes"): True,
+        ("b", "seconds"): False,
+    }
+
+    def run_compare(*options):
+        return subprocess.run(
+            [sys.executable, os.path.join(BENCHMARKS_DIRECTORY, "compare.py"), *options],
+            capture_output=True,
+            text=True,
+            check=False,
+        ).returncode
+
+    assert run_compare(str(baseline), str(current)) == 1
+    assert run_compare(str(baseline), str(current), "--metrics", "seconds") == 0
@@ -0,0 +1,109 @@
+"""
+    Tests of the cache of parsed API results
+"""
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.cache import ResponseCache, get_command
+
+QUERY = "https://retro.umoiq.com/service/publicXMLFeed?command={}&a=sf-muni&r={}"
+
+
+class Clock:
+    """Class of a clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def get_query(route_tag, command="routeConfig"):
+    """Funtion to build the query of a route"""
+    return QUERY.format(command, route_tag)
+
+
+def test_get_command():
+    assert get_command(get_query("N")) == "routeConfig"
+    assert get_command("https://example.com/feed") == ""
+
+
+def test_results_expire_with_the_ttl_of_their_command():
+    clock = Clock()
+    cache = ResponseCache(ttls={"routeConfig": 60, "predictions": 5}, clock=clock)
+    cache.put(get_query("N"), "route")
+    cache.put(get_query("N", "predictions"), "predictions")
+    clock.now = 4.9
+    assert cache.get(get_query("N", "predictions")) == "predictions"
+    clock.now = 5
+    assert cache.get(get_query("N", "predictions")) is None
+    assert cache.get(get_query("N")) == "route"
+    clock.now = 60
+    assert cache.get(get_query("N")) is None
+    assert len(cache) == 0
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_commands_without_a_ttl_are_not_cached():
+    cache = ResponseCache(ttls={"routeConfig": 0})
+    cache.put(get_query("N"), "route")
+    cache.put(get_query("N", "vehicleLocations"), "vehicles")
+    assert len(cache) == 0
+
+
+def test_least_recently_used_results_are_evicted_by_size():
+    cache = ResponseCache(max_bytes=250)
+    for route_tag in "ABC":
+        cache.put(get_query(route_tag), route_tag, 100)
+    assert cache.get(get_query("A")) is None
+    assert cache.size == 200 and cache.evictions == 1
+    cache.get(get_query("B"))  # C is now the least recently used
+    cache.put(get_query("D"), "D", 100)
+    assert cache.get(get_query("C")) is None
+    assert cache.get(get_query("B")) == "B" and cache.get(get_query("D")) == "D"
+
+
+def test_least_recently_used_results_are_evicted_by_count():
+    cache = ResponseCache(max_entries=2)
+    for route_tag in "ABC":
+        cache.put(get_query(route_tag), route_tag, 1)
+    assert len(cache) == 2 and cache.get(get_query("A")) is None
+    assert cache.size == 2
+
+
+def test_results_larger_than_the_cache_are_not_kept():
+    cache = ResponseCache(max_bytes=100)
+    cache.put(get_query("A"), "A", 50)
+    cache.put(get_query("B"), "B", 101)
+    assert cache.get(get_query("A")) == "A" and cache.get(get_query("B")) is None
+
+
+def test_replacing_a_result_updates_the_size():
+    cache = ResponseCache()
+    cache.put(get_query("A"), "old", 100)
+    cache.put(get_query("A"), "new", 30)
+    assert cache.get(get_query("A")) == "new" and cache.size == 30
+
+
+def test_invalidate():
+    cache = ResponseCache()
+    cache.put(get_query("A"), "A", 10)
+    cache.put(get_query("B"), "B", 10)
+    cache.put(get_query("A", "predictions"), "predictions", 10)
+    cache.invalidate(query=get_query("A"))
+    assert cache.get(get_query("A")) is None and cache.size == 20
+    cache.invalidate(command="predictions")
+    assert len(cache) == 1 and cache.size == 10
+    cache.invalidate()
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_handler_reuses_cached_results(domain, transport):
+    cache = ResponseCache()
+    with ApiHandler(domain, transport=transport, cache=cache) as api_handler:
+        first = api_handler.get_route_details("sf-muni", "synthetic-50")
+        second = api_handler.get_route_details("sf-muni", "synthetic-50")
+    assert first is second
+    assert len(transport.queries) == 1
+    # entries are sized by the feed they were parsed from
+    assert cache.size > 0
@@ -0,0 +1,61 @@
+"""
+    Tests of the nextbus console script
+"""
+
+import io
+import json
+import threading
+
+from nextbus_api_parser import api_handler as api_handler_module
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.cli import get_argument_parser, get_calls, run
+
+from stub_server import INVALID_TAG
+
+
+def run_command(domain, *arguments):
+    """Funtion to run a command against the stub server, returning its status and output"""
+    output = io.StringIO()
+    errors = io.StringIO()
+    status = run(get_argument_parser().parse_args(["--domain", domain, *arguments]), output, errors)
+    return status, output.getvalue(), errors.getvalue()
+
+
+def test_predictions_are_written_as_json_lines(domain):
+    status, output, errors = run_command(domain, "predictions", "sf-muni", "N:1", "N:2")
+    rows = [json.loads(line) for line in output.splitlines()]
+    assert status == 0 and not errors
+    assert {(row["route_tag"], row["stop_tag"]) for row in rows} == {("N", "1"), ("N", "2")}
+
+
+def test_predictions_report_the_stops_of_failed_queries(domain):
+    status, output, errors = run_command(
+        domain, "--format", "csv", "predictions", "sf-muni", "N:1", f"N:{INVALID_TAG}"
+    )
+    assert status == 1
+    assert output.splitlines()[0].startswith("agency_tag,route_tag,stop_tag")
+    assert f"sf-muni:N:{INVALID_TAG}: " in errors
+
+
+def test_predictions_chunks_are_fetched_concurrently(monkeypatch, domain, transport):
+    stops = [f"N:{index}" for index in range(2 * ApiHandler.MAX_STOPS_PER_QUERY + 1)]
+    arguments = get_argument_parser().parse_args(["predictions", "sf-muni", *stops])
+    _, calls = get_calls(arguments, ApiHandler(domain))
+    assert len(calls) == 3
+    assert [stop for call in calls for stop in call[2][1]] == [
+        tuple(stop.split(":")) for stop in stops
+    ]
+    threads = set()
+    fetch = transport.fetch
+
+    def record_thread(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return fetch(*args, **kwargs)
+
+    monkeypatch.setattr(transport, "fetch", record_thread)
+    monkeypatch.setattr(api_handler_module, "HttpTransport", lambda: transport)
+    status, output, errors = run_command(domain, "predictions", "sf-muni", *stops)
+    assert status == 0 and not errors
+    assert len(transport.queries) == 3 and len(threads) > 1
+    stop_tags = {json.loads(line)["stop_tag"] for line in output.splitlines()}
+    assert stop_tags == {stop.split(":")[1] for stop in stops}
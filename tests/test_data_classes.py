@@ -0,0 +1,160 @@
+"""
+    Tests of the data classes built from the feeds of the API
+"""
+
+import math
+import os
+import pickle
+
+import pytest
+
+from nextbus_api_parser.data_classes import (
+    Agency,
+    Direction,
+    Directions,
+    Error,
+    Path,
+    Point,
+    Prediction,
+    Predictions,
+    Route,
+    Stop,
+    Vehicle,
+)
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.xml_handlers import (
+    AgencyListHandler,
+    PredictionsHandler,
+    RouteDetailsHandler,
+    VehicleLocationsHandler,
+)
+
+from stub_server import FIXTURES_DIRECTORY
+
+
+def parse_fixture(command, handler_class):
+    """Funtion to parse a recorded feed, returning the handler"""
+    handler = handler_class()
+    parser = get_backend().create_parser(handler)
+    with open(os.path.join(FIXTURES_DIRECTORY, f"{command}.xml"), "rb") as fixture:
+        parser.feed(fixture.read())
+    parser.close()
+    return handler
+
+
+@pytest.fixture(scope="module")
+def models():
+    """Fixture of one parsed object of each data class, keyed by class"""
+    route = parse_fixture("routeConfig", RouteDetailsHandler).route
+    predictions = parse_fixture("predictions", PredictionsHandler).predictions
+    directions = predictions.directions[0]
+    return {
+        Agency: parse_fixture("agencyList", AgencyListHandler).agencies[0],
+        Route: route,
+        Stop: route.stops[0],
+        Direction: route.directions[0],
+        Path: route.paths[0],
+        Point: route.paths[0].points[0],
+        Predictions: predictions,
+        Directions: directions,
+        Prediction: directions.predictions[0],
+        Vehicle: parse_fixture("vehicleLocations", VehicleLocationsHandler)
+        .vehicle_locations.vehicles[0],
+        Error: Error({"shouldRetry": "true"}),
+    }
+
+
+def test_models_have_no_instance_dict(models):
+    for model in models.values():
+        assert not hasattr(model, "__dict__"), type(model).__name__
+        with pytest.raises(AttributeError):
+            model.misspelled_attribute = None
+
+
+def test_public_attribute_names_are_kept(models):
+    expected = {
+        Agency: ("tag", "title", "region", "short"),
+        Route: ("tag", "title", "short", "color", "opposide_color", "stops", "paths"),
+        Stop: ("tag", "title", "short_title", "stop_id", "lat", "lon"),
+        Direction: ("tag", "title", "name", "stops"),
+        Path: ("points",),
+        Point: ("lat", "lon"),
+        Predictions: ("agency_title", "route_tag", "stop_title", "dir_title", "directions"),
+        Directions: ("title", "predictions"),
+        Prediction: ("seconds", "minutes", "epoch_time", "dir_tag", "trip_tag", "block"),
+        Error: ("message", "should_retry"),
+    }
+    for model_class, names in expected.items():
+        for name in names:
+            getattr(models[model_class], name)
+
+
+def test_parsed_routes_can_be_pickled(models):
+    route = pickle.loads(pickle.dumps(models[Route], pickle.HIGHEST_PROTOCOL))
+    assert [stop.tag for stop in route.stops] == [stop.tag for stop in models[Route].stops]
+    assert route.directions[0].stop_tags == models[Route].directions[0].stop_tags
+    # the directions still share the stops of the route
+    assert route.directions[0].stops[0] is route.stop_by_tag[route.directions[0].stop_tags[0]]
+    assert list(route.paths[0].lats) == list(models[Route].paths[0].lats)
+
+
+def test_fields_are_converted_once_while_parsing(models):
+    stop, route, prediction = models[Stop], models[Route], models[Prediction]
+    assert isinstance(stop.lat, float) and isinstance(stop.lon, float)
+    assert all(isinstance(value, float) for value in (route.lat_min, route.lon_max))
+    assert route.lat_min <= stop.lat <= route.lat_max
+    assert (prediction.seconds, prediction.minutes, prediction.epoch_time) == (
+        189,
+        3,
+        1700000189000,
+    )
+    assert prediction.is_departure is False
+    vehicle = models[Vehicle]
+    assert isinstance(vehicle.secs_since_report, int) and isinstance(vehicle.predictable, bool)
+    # ETAs sort as numbers, e.g. 189 seconds before 1031, rather than as strings
+    etas = sorted(prediction.seconds for prediction in models[Directions].predictions)
+    assert etas[:2] == [189, 1031]
+
+
+def test_flags_and_missing_values():
+    prediction = Prediction({"seconds": "60", "affectedByLayover": "true", "delayed": "false"})
+    assert prediction.seconds == 60 and prediction.minutes is None
+    assert prediction.affected_by_layover is True and prediction.delayed is False
+    assert prediction.is_schedule_based is None and prediction.is_departure is None
+    stop = Stop({"tag": "1", "lat": "37.5", "lon": "not a number"})
+    assert stop.lat == 37.5 and stop.lon is None
+    route = Route({"tag": "N"}, True)
+    assert route.lat_min is None and route.lon_max is None
+    assert Error({}).should_retry is None and Error({"shouldRetry": "true"}).should_retry
+
+
+def test_path_coordinates_are_packed(models):
+    path = models[Path]
+    assert path.lats.typecode == "d" and len(path.lats) == len(path.lons) == len(path) > 1
+    lats, lons = path.get_coordinates()
+    assert lats.format == "d" and list(lats) == list(path.lats)
+    # the views share the buffers of the path rather than copying them
+    assert lats.obj is path.lats and lons.obj is path.lons
+    lats.release()
+    lons.release()
+
+
+def test_path_points_are_built_on_access():
+    path = Path({})
+    path.add_point({"lat": "37.1", "lon": "-122.1"})
+    path.add_point({"lat": "37.2"})  # a missing coordinate is stored as nan
+    path.add_point({"lat": "37.3", "lon": "-122.3"})
+    points = path.points
+    assert len(points) == 3 and isinstance(points[0], Point)
+    assert [(point.lat, point.lon) for point in points[::2]] == [(37.1, -122.1), (37.3, -122.3)]
+    assert points[-1].lat == 37.3 and math.isnan(points[1].lon)
+    assert [point.lat for point in points] == [37.1, 37.2, 37.3]
+
+
+def test_path_coordinates_as_numpy_arrays():
+    numpy = pytest.importorskip("numpy")
+    path = Path({})
+    path.add_point({"lat": "37.1", "lon": "-122.1"})
+    lats, lons = path.to_numpy()
+    assert isinstance(lats, numpy.ndarray) and lats.tolist() == [37.1]
+    assert numpy.shares_memory(lons, numpy.frombuffer(path.lons))
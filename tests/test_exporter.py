@@ -0,0 +1,53 @@
+"""
+    Tests of the export of whole agencies to tables
+"""
+
+import csv
+import hashlib
+import json
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.exporter import AgencyExporter
+
+import stub_server
+
+
+def read_table(exporter, table, agency_tag, route_tag):
+    """Funtion to read the rows of a route in a CSV table"""
+    path = exporter.get_path(table, agency_tag, route_tag)
+    with open(path, newline="", encoding="utf-8") as file:
+        return list(csv.DictReader(file))
+
+
+def test_digest_of_the_feed_is_kept_in_the_manifest(domain, transport, tmp_path):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        exporter = AgencyExporter(api_handler, str(tmp_path))
+        summary = exporter.export("synthetic-2")
+    assert summary["exported"] == ["R0", "R1"] and not summary["errors"]
+    with open(exporter.get_manifest_path("synthetic-2"), encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+    digest = hashlib.sha1(stub_server.get_feed("routeConfig", "R0")).hexdigest()
+    assert manifest["routes"]["R0"]["digest"] == digest
+
+
+def test_unchanged_routes_are_skipped(domain, transport, tmp_path):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        exporter = AgencyExporter(api_handler, str(tmp_path))
+        exporter.export("synthetic-2")
+        summary = exporter.export("synthetic-2")
+    assert summary["unchanged"] == ["R0", "R1"] and not summary["exported"]
+    assert transport.statuses[-2:] == [304, 304]
+
+
+def test_agencies_exported_to_the_same_directory_are_kept_apart(domain, transport, tmp_path):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        exporter = AgencyExporter(api_handler, str(tmp_path))
+        exporter.export("synthetic-3")
+        exporter.export("synthetic-2")
+        summary = exporter.export("synthetic-3")
+    # the export of the other agency neither overwrote nor removed the routes
+    assert summary["unchanged"] == ["R0", "R1", "R2"] and not summary["removed"]
+    for agency_tag in ("synthetic-2", "synthetic-3"):
+        assert exporter.has_route(agency_tag, "R1")
+        rows = read_table(exporter, "routes", agency_tag, "R1")
+        assert [row["agency_tag"] for row in rows] == [agency_tag]
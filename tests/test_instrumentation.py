@@ -0,0 +1,107 @@
+"""
+    Tests of the metrics registry recording the API calls of the API handler
+"""
+
+import json
+
+import pytest
+
+from nextbus_api_parser import api_handler as api_handler_module
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.cache import ResponseCache
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.instrumentation import MetricsRegistry, count_objects
+
+import stub_server
+from stub_server import INVALID_TAG
+
+ROUTE_TAG = "synthetic-40"
+
+
+def test_api_calls_are_recorded_by_command(domain, transport):
+    metrics = MetricsRegistry()
+    recorded = []
+    metrics.add_callback(recorded.append)
+    with ApiHandler(domain, transport=transport, metrics=metrics) as api_handler:
+        route = api_handler.get_route_details("sf-muni", ROUTE_TAG)
+    assert len(recorded) == 1 and recorded[0].command == "routeConfig"
+    assert metrics.get("requests_total", command="routeConfig") == 1
+    for phase in MetricsRegistry.PHASES:
+        assert metrics.get("request_seconds_count", command="routeConfig", phase=phase) == 1
+    assert metrics.get("request_seconds_sum", command="routeConfig", phase="parse") > 0
+    feed = stub_server.get_feed("routeConfig", ROUTE_TAG)
+    assert metrics.get("bytes_decoded_total", command="routeConfig") == len(feed)
+    assert 0 < metrics.get("bytes_received_total", command="routeConfig") < len(feed)
+    elements = {"handler": "RouteDetailsHandler"}
+    assert metrics.get("elements_total", element="stop", **elements) == feed.count(b"<stop ")
+    assert metrics.get("elements_total", element="point", **elements) == feed.count(b"<point ")
+    assert metrics.get("objects_total", command="routeConfig") == count_objects([route])
+    assert metrics.get("errors_total", command="routeConfig", type="Error") == 0
+
+
+def test_cache_hits_are_counted(domain, transport):
+    metrics = MetricsRegistry()
+    cache = ResponseCache()
+    with ApiHandler(domain, transport=transport, cache=cache, metrics=metrics) as api_handler:
+        for _ in range(3):
+            api_handler.get_routes("sf-muni")
+    assert metrics.get("requests_total", command="routeList") == 1
+    assert metrics.get("cache_hits_total", command="routeList") == 2
+
+
+class FailingTransport:
+    """Class of a transport whose connections are always reset"""
+
+    def fetch(self, url, feed, headers=None):
+        raise ConnectionResetError(url)
+
+    def close(self):
+        pass
+
+
+def test_errors_are_counted_by_type(domain, transport):
+    metrics = MetricsRegistry()
+    with ApiHandler(domain, transport=transport, metrics=metrics) as api_handler:
+        assert isinstance(api_handler.get_predictions("sf-muni", "N", INVALID_TAG), Error)
+    with pytest.raises(ConnectionResetError):
+        ApiHandler(transport=FailingTransport(), metrics=metrics).get_agencies()
+    assert metrics.get("errors_total", command="predictions", type="Error") == 1
+    assert metrics.get("errors_total", command="agencyList", type="ConnectionResetError") == 1
+    assert metrics.get("requests_total", command="agencyList") == 1
+
+
+def test_metrics_are_exported(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.increment("requests_total", command="predictions")
+    metrics.increment("request_seconds_sum", 0.5, command="predictions", phase="parse")
+    metrics.increment("request_seconds_count", command="predictions", phase="parse")
+    metrics.increment("errors_total", command="predictions", type='a "quoted"\nerror')
+    metrics.write_prometheus(tmp_path / "metrics.prom")
+    lines = (tmp_path / "metrics.prom").read_text(encoding="utf-8").splitlines()
+    assert "# TYPE nextbus_request_seconds summary" in lines
+    assert lines.count("# TYPE nextbus_request_seconds summary") == 1
+    assert 'nextbus_request_seconds_sum{command="predictions",phase="parse"} 0.5' in lines
+    assert 'nextbus_requests_total{command="predictions"} 1' in lines
+    assert (
+        'nextbus_errors_total{command="predictions",type="a \\"quoted\\"\\nerror"} 1' in lines
+    )
+    metrics.write_json_lines(tmp_path / "metrics.jsonl")
+    with open(tmp_path / "metrics.jsonl", encoding="utf-8") as json_file:
+        samples = [json.loads(line) for line in json_file]
+    assert len(samples) == 4 and not list(tmp_path.glob("*.tmp"))
+    assert {
+        "name": "nextbus_requests_total",
+        "labels": {"command": "predictions"},
+        "value": 1,
+    } in samples
+
+
+def test_nothing_is_measured_without_a_registry(domain, transport, monkeypatch):
+    def fail(*args):
+        raise AssertionError("measured without a registry")
+
+    monkeypatch.setattr(api_handler_module, "RequestMetrics", fail)
+    monkeypatch.setattr(api_handler_module, "count_objects", fail)
+    with ApiHandler(domain, transport=transport) as api_handler:
+        assert len(api_handler.get_route_details("sf-muni", ROUTE_TAG).stops) == 40
+        assert len(list(api_handler.iter_routes("synthetic-5"))) == 5
@@ -0,0 +1,62 @@
+"""
+    Tests of the worker pool of the map_* methods of ApiHandler
+"""
+
+import threading
+import time
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Error, Predictions, Route
+
+from stub_server import INVALID_TAG
+
+
+def test_results_are_in_the_order_of_the_requests(domain, transport):
+    requests = [("sf-muni", f"synthetic-{count}") for count in range(30, 0, -1)]
+    with ApiHandler(domain, transport=transport) as api_handler:
+        routes = api_handler.map_route_details(requests, max_workers=4)
+        # each worker parses with its own handler, a shared one would mix up the routes
+        expected = [api_handler.get_route_details(*request) for request in requests[:3]]
+    assert all(isinstance(route, Route) for route in routes)
+    assert [route.tag for route in routes] == [route_tag for _, route_tag in requests]
+    assert [len(route.stops) for route in routes] == list(range(30, 0, -1))
+    assert [stop.tag for stop in routes[0].stops] == [stop.tag for stop in expected[0].stops]
+
+
+def test_failed_requests_yield_errors_without_stopping_the_others(domain, transport):
+    requests = [("sf-muni", "N", "1"), ("sf-muni", "N", INVALID_TAG), ("sf-muni", "N", "2")]
+    with ApiHandler(domain, transport=transport) as api_handler:
+        predictions = api_handler.map_predictions(requests)
+    assert isinstance(predictions[0], Predictions) and isinstance(predictions[2], Predictions)
+    assert isinstance(predictions[1], Error) and INVALID_TAG in predictions[1].message
+
+
+def test_exceptions_are_returned_as_errors():
+    def divide(numerator, denominator):
+        return numerator / denominator
+
+    results = ApiHandler().map_requests(divide, [(1, 2), (1, 0), (3, 1)])
+    assert results[0] == 0.5 and results[2] == 3
+    assert isinstance(results[1], Error)
+    assert results[1].message.startswith("ZeroDivisionError: ")
+
+
+def test_requests_run_on_at_most_max_workers_threads():
+    lock = threading.Lock()
+    threads = set()
+    running = [0, 0]  # calls running now, and the most that ran at once
+
+    def record(index):
+        with lock:
+            threads.add(threading.get_ident())
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return index
+
+    results = ApiHandler().map_requests(record, [(index,) for index in range(12)], 3)
+    assert results == list(range(12))
+    assert len(threads) == 3 and running[1] == 3
+    assert ApiHandler().map_requests(record, []) == []
@@ -0,0 +1,198 @@
+"""
+    Tests of the interactive predictor and the --watch dashboard of nextbus_predictor
+"""
+
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nextbus_api_parser import nextbus_predictor
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Directions
+from nextbus_api_parser.nextbus_predictor import NextBusPredictor, PredictionsDashboard
+
+from stub_server import INVALID_TAG
+
+
+def test_dashboard_shows_the_error_of_each_failed_stop(domain):
+    with ApiHandler(domain) as api_handler:
+        dashboard = PredictionsDashboard(
+            api_handler, "sf-muni", [("N", "1"), ("N", INVALID_TAG)], output=io.StringIO()
+        )
+        dashboard.refresh(0)
+    lines = dashboard.render(0)
+    assert f"N - Stop No: {INVALID_TAG}" in lines
+    assert dashboard.refreshes == 1 and dashboard.fetched_at == 0
+    assert any(line.startswith("\tError: ") for line in lines)
+
+
+def run_predictor(monkeypatch, domain, transport, inputs):
+    """
+    Funtion to run the interactive predictor against the stub server with given inputs,
+    each given once the prefetches made so far have finished
+    """
+    inputs = iter(inputs)
+    executors = []
+
+    def create_executor(max_workers):
+        executors.append(ThreadPoolExecutor(max_workers))
+        return executors[-1]
+
+    def read_input(prompt):
+        # the prefetches run one at a time, so this runs once they're done
+        executors[0].submit(int).result()
+        return next(inputs)
+
+    monkeypatch.setattr(nextbus_predictor, "ThreadPoolExecutor", create_executor)
+    monkeypatch.setattr("builtins.input", read_input)
+    monkeypatch.setattr(
+        nextbus_predictor,
+        "ApiHandler",
+        lambda cache: ApiHandler(domain, transport=transport, cache=cache),
+    )
+    predictor = NextBusPredictor()
+    predictor.executor.shutdown(wait=True)
+    return predictor
+
+
+def get_commands(transport):
+    """Funtion to list the API commands downloaded by a transport"""
+    return [query.split("command=")[1].split("&")[0] for query in transport.queries]
+
+
+def test_refreshing_predictions_makes_an_api_call(monkeypatch, domain, transport):
+    # select the first agency, route and stop, refresh twice then exit
+    run_predictor(monkeypatch, domain, transport, ["0", "0", "0", "1", "1", "-2"])
+    assert get_commands(transport).count("predictions") == 3
+
+
+def test_going_back_uses_the_cache(monkeypatch, domain, transport):
+    # select the first agency and route, go back to the routes and select it again
+    predictor = run_predictor(monkeypatch, domain, transport, ["0", "0", "-1", "0", "-2"])
+    commands = get_commands(transport)
+    assert commands.count("agencyList") == 1
+    assert commands.count("routeList") == 1
+    assert commands.count("routeConfig") == 1
+    # the predictor keeps no copy of its own, invalidating the cache drops the routes
+    predictor.api_handler.cache.invalidate(command="routeConfig")
+    predictor.selections = [0, 0]
+    predictor.update_level()
+    assert get_commands(transport).count("routeConfig") == 2
+
+
+def test_long_sessions_dont_grow_the_stack(monkeypatch, domain, transport):
+    # more prompts than the recursion limit allows nested calls for
+    inputs = ["not a number"] * 1500 + ["0", "0", "0"] + ["1"] * 1500 + ["-2"]
+    predictor = run_predictor(monkeypatch, domain, transport, inputs)
+    assert not predictor.active
+    assert get_commands(transport).count("predictions") == 1501
+
+
+def test_next_level_is_prefetched(monkeypatch, domain, transport):
+    # select the first agency, which prefetches the details of its first route, then exit
+    run_predictor(monkeypatch, domain, transport, ["0", "-2"])
+    commands = get_commands(transport)
+    assert commands.count("routeList") == 1 and commands.count("routeConfig") == 1
+
+
+def test_prefetch_follows_the_last_selection(monkeypatch, domain, transport):
+    # select the third route of the first agency, go back to the routes then exit
+    predictor = run_predictor(monkeypatch, domain, transport, ["0", "2", "-1", "-2"])
+    assert predictor.get_likely_option(predictor.routes) is predictor.routes[2]
+    route_configs = [query for query in transport.queries if "command=routeConfig" in query]
+    # the first route was prefetched before the selection, the third one was selected
+    assert len(route_configs) == 2
+    assert route_configs[-1].endswith("r=" + predictor.routes[2].tag)
+
+
+EPOCH = 1700000000  # time, in seconds, the synthetic predictions are counted from
+STOPS = [("N", "1"), ("N", "2")]
+
+
+class TerminalOutput(io.StringIO):
+    """Class of an output stream that lines can be redrawn in place on, like a terminal"""
+
+    def isatty(self):
+        return True
+
+
+def test_etas_count_down_between_refreshes(domain):
+    with ApiHandler(domain) as api_handler:
+        dashboard = PredictionsDashboard(api_handler, "sf-muni", STOPS, output=io.StringIO())
+        assert dashboard.render(EPOCH)[2:4] == ["N - Stop No: 1", "\tNo Predictions Yet"]
+        dashboard.refresh(EPOCH)
+    lines = dashboard.render(EPOCH)
+    assert lines[2:5] == ["N-Route - Stop 1", "\tDirection 0: due, 1 min, 3 min",
+                          "\tDirection 1: due, 2 min, 3 min"]
+    # the buses that have come are dropped, without another API call
+    lines = dashboard.render(EPOCH + 100)
+    assert lines[3:5] == ["\tDirection 0: 1 min", "\tDirection 1: due, 2 min"]
+    assert dashboard.render(EPOCH + 300)[3] == "\tDirection 0: no upcoming buses"
+    assert dashboard.refreshes == 1
+
+
+def test_etas_are_capped_per_direction():
+    direction = Directions({"title": "Inbound"})
+    for minutes in range(10):
+        direction.add_predictions({"minutes": str(minutes)})
+    etas = PredictionsDashboard(None, "sf-muni", STOPS, output=io.StringIO()).get_etas(
+        direction, EPOCH
+    )
+    assert etas.split(", ") == ["due", "1 min", "2 min", "3 min"]
+    assert len(etas.split(", ")) == PredictionsDashboard.MAX_ETAS
+
+
+def test_only_changed_lines_are_redrawn(domain):
+    output = TerminalOutput()
+    with ApiHandler(domain) as api_handler:
+        dashboard = PredictionsDashboard(api_handler, "sf-muni", STOPS, output=output)
+        dashboard.refresh(EPOCH)
+    dashboard.draw(EPOCH + 10)
+    first = output.getvalue()
+    assert first.startswith("\x1b[2J") and first.count("\x1b[2K") == len(dashboard.lines)
+    # a second later only the time left until the next refresh changed
+    dashboard.draw(EPOCH + 11)
+    second = output.getvalue()[len(first):]
+    assert second.count("\x1b[2K") == 1
+    assert f"\x1b[{len(dashboard.lines)};1H\x1b[2K" in second
+    dashboard.draw(EPOCH + 11)
+    assert len(output.getvalue()) == len(first) + len(second)
+
+
+def test_screen_is_written_in_full_elsewhere_than_a_terminal(domain):
+    output = io.StringIO()
+    with ApiHandler(domain) as api_handler:
+        dashboard = PredictionsDashboard(api_handler, "sf-muni", STOPS, output=output)
+        dashboard.refresh(EPOCH)
+    dashboard.draw(EPOCH)
+    dashboard.draw(EPOCH)
+    assert "\x1b" not in output.getvalue()
+    assert output.getvalue() == "\n".join(dashboard.lines) + "\n\n"
+
+
+def test_stops_are_refreshed_with_one_call_per_interval(domain, transport):
+    now = [EPOCH]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    with ApiHandler(domain, transport=transport) as api_handler:
+        dashboard = PredictionsDashboard(
+            api_handler, "sf-muni", STOPS * 3, interval=30, output=io.StringIO(),
+            clock=lambda: now[0], sleep=sleep,
+        )
+        dashboard.run(duration=75)
+    assert get_commands(transport) == ["predictionsForMultiStops"] * 3
+    assert dashboard.refreshes == 3 and dashboard.fetched_at == EPOCH + 60
+
+
+def test_main_checks_its_arguments(capsys):
+    for arguments in (["N:1"], ["--watch", "sf-muni"], ["--watch", "sf-muni", "N"]):
+        with pytest.raises(SystemExit) as exit_info:
+            nextbus_predictor.main(arguments)
+        assert exit_info.value.code == 2
+    errors = capsys.readouterr().err
+    assert "stops can only be given with --watch" in errors
+    assert "--watch needs at least one ROUTE:STOP" in errors
+    assert "expected ROUTE:STOP, got 'N'" in errors
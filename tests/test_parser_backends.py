@@ -0,0 +1,111 @@
+"""
+    Tests that every parser backend builds the same models from the same feeds
+"""
+
+import math
+import os
+from array import array
+
+import pytest
+
+from nextbus_api_parser.parser_backends import BACKENDS, LxmlBackend, get_backend
+from nextbus_api_parser.xml_handlers import (
+    AgencyListHandler,
+    PredictionsHandler,
+    RouteDetailsHandler,
+    RouteListHandler,
+    ScheduleHandler,
+    StreamingRouteDetailsHandler,
+    VehicleLocationsHandler,
+)
+
+from stub_server import FIXTURES_DIRECTORY, error_xml
+from synthetic import route_config_xml, schedule_xml
+
+CHUNK_SIZE = 61  # bytes fed at once, small enough to split elements and their text
+
+
+def read_fixture(command):
+    """Funtion to read a recorded feed"""
+    with open(os.path.join(FIXTURES_DIRECTORY, f"{command}.xml"), "rb") as fixture:
+        return fixture.read()
+
+
+FEEDS = {
+    "agencyList": (AgencyListHandler, lambda: read_fixture("agencyList")),
+    "routeList": (RouteListHandler, lambda: read_fixture("routeList")),
+    "routeConfig": (RouteDetailsHandler, lambda: read_fixture("routeConfig")),
+    "routeConfig.synthetic": (RouteDetailsHandler, lambda: route_config_xml("synthetic-50", 50)),
+    "routeConfig.streaming": (StreamingRouteDetailsHandler, lambda: read_fixture("routeConfig")),
+    "predictions": (PredictionsHandler, lambda: read_fixture("predictions")),
+    "predictionsForMultiStops": (
+        PredictionsHandler,
+        lambda: read_fixture("predictionsForMultiStops"),
+    ),
+    "vehicleLocations": (VehicleLocationsHandler, lambda: read_fixture("vehicleLocations")),
+    "schedule": (ScheduleHandler, lambda: schedule_xml("synthetic-6", 6, 20)),
+    "error": (PredictionsHandler, lambda: error_xml("Invalid stop tag 0", True)),
+}  # feed name -> handler class and function returning the feed
+
+RESULTS = (
+    "error",
+    "agencies",
+    "routes",
+    "route",
+    "records",
+    "predictions_list",
+    "vehicle_locations",
+    "schedule",
+)  # attributes of the handlers holding the models they build
+
+
+def describe(value):
+    """
+    Funtion to turn a model into plain lists and dicts that can be compared, reading the
+    __slots__ of the data classes
+    """
+    if value is None or isinstance(value, (str, int, bool)):
+        return value
+    if isinstance(value, float):
+        return "nan" if math.isnan(value) else value
+    if isinstance(value, (list, tuple, array)):
+        return [describe(item) for item in value]
+    if isinstance(value, dict):
+        return {key: describe(item) for key, item in value.items()}
+    slots = [slot for cls in type(value).__mro__ for slot in getattr(cls, "__slots__", ())]
+    if not slots:
+        slots = [name for name in vars(value) if not name.startswith("_")]
+    return {
+        "class": type(value).__name__,
+        **{slot: describe(getattr(value, slot, None)) for slot in slots},
+    }
+
+
+def parse(backend, handler_class, data, chunk_size=None):
+    """Funtion to parse a feed, in chunks of chunk_size bytes if given"""
+    handler = handler_class()
+    parser = get_backend(backend).create_parser(handler)
+    chunk_size = chunk_size or len(data)
+    for start in range(0, len(data), chunk_size):
+        parser.feed(data[start : start + chunk_size])
+    parser.close()
+    return describe({name: value for name, value in vars(handler).items() if name in RESULTS})
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend(request):
+    """Fixture of the name of each parser backend, lxml is skipped if it isn't installed"""
+    if request.param == LxmlBackend.name:
+        pytest.importorskip("lxml")
+    return request.param
+
+
+@pytest.mark.parametrize("feed", sorted(FEEDS))
+def test_backends_build_the_same_models(backend, feed):
+    handler_class, get_feed = FEEDS[feed]
+    data = get_feed()
+    expected = parse("sax", handler_class, data)
+    assert expected != parse("sax", handler_class, b"<body></body>")
+    assert parse(backend, handler_class, data) == expected
+    # text and elements split across chunks are put back together
+    assert parse(backend, handler_class, data, CHUNK_SIZE) == expected
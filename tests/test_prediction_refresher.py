@@ -0,0 +1,131 @@
+"""
+    Tests of the background prediction refresher and its subscriptions
+"""
+
+import threading
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Error, Predictions
+from nextbus_api_parser.prediction_refresher import PredictionRefresher
+
+from stub_server import INVALID_TAG
+
+
+class Clock:
+    """Class of a clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Recorder:
+    """Class of a callback recording the results published to it"""
+
+    def __init__(self):
+        self.results = []
+        self.published = threading.Event()
+
+    def __call__(self, key, result):
+        self.results.append((key, result))
+        self.published.set()
+
+
+def test_stops_of_an_agency_share_a_batch(domain):
+    clock = Clock()
+    recorder = Recorder()
+    with ApiHandler(domain) as api_handler:
+        refresher = PredictionRefresher(api_handler, clock=clock)
+        for stop_tag in ("1", "2", "3"):
+            refresher.subscribe("sf-muni", "N", stop_tag, interval=30, callback=recorder)
+        assert refresher.refresh_due() == 3
+        assert refresher.batches == 1 and refresher.refresh_due() == 0
+        clock.now = 30
+        assert refresher.refresh_due() == 3 and refresher.batches == 2
+    assert len(recorder.results) == 6
+    assert all(isinstance(result, Predictions) for _, result in recorder.results)
+
+
+def test_stops_are_refreshed_at_the_shortest_interval_and_coalesced(domain):
+    clock = Clock()
+    with ApiHandler(domain) as api_handler:
+        refresher = PredictionRefresher(api_handler, clock=clock)
+        refresher.subscribe("sf-muni", "N", "1", interval=60)
+        refresher.refresh_due()
+        clock.now = 35
+        refresher.subscribe("sf-muni", "N", "2", interval=60)
+        fast = refresher.subscribe("sf-muni", "N", "2", interval=10)
+        # stop 1 is due within half its interval, so it joins the batch of stop 2
+        assert refresher.refresh_due() == 2 and refresher.batches == 2
+        clock.now = 45
+        assert refresher.refresh_due() == 1
+        fast.close()
+        clock.now = 50
+        assert refresher.refresh_due() == 0
+    assert len(refresher) == 2
+
+
+def test_an_invalid_stop_only_fails_its_own_subscriptions(domain):
+    clock = Clock()
+    recorder = Recorder()
+    with ApiHandler(domain) as api_handler:
+        refresher = PredictionRefresher(api_handler, clock=clock)
+        for stop_tag in ("1", INVALID_TAG, "2"):
+            refresher.subscribe("sf-muni", "N", stop_tag, callback=recorder)
+        refresher.refresh_due()
+        results = dict(recorder.results)
+        assert isinstance(results[("sf-muni", "N", INVALID_TAG)], Error)
+        assert isinstance(results[("sf-muni", "N", "1")], Predictions)
+        assert isinstance(results[("sf-muni", "N", "2")], Predictions)
+        assert refresher.batches == 1 and refresher.singles == 3
+
+        # from then on the invalid stop is queried on its own, the others in a batch
+        recorder.results.clear()
+        clock.now = refresher.DEFAULT_INTERVAL
+        refresher.refresh_due()
+        results = dict(recorder.results)
+        assert isinstance(results[("sf-muni", "N", "1")], Predictions)
+        assert isinstance(results[("sf-muni", "N", INVALID_TAG)], Error)
+        assert refresher.batches == 2 and refresher.singles == 4
+
+
+def test_callbacks_that_raise_dont_stop_the_refresher(domain):
+    recorder = Recorder()
+
+    def fail(key, result):
+        raise ValueError("subscriber bug")
+
+    with ApiHandler(domain) as api_handler:
+        with PredictionRefresher(api_handler) as refresher:
+            refresher.subscribe("sf-muni", "N", "1", callback=fail)
+            refresher.subscribe("sf-muni", "N", "1", callback=recorder)
+            refresher.start()
+            assert recorder.published.wait(5)
+            refresher.subscribe("sf-muni", "N", "1", callback=fail)
+    assert refresher.callback_errors == 2
+    assert isinstance(refresher.last_exception, ValueError)
+    assert isinstance(recorder.results[0][1], Predictions)
+
+
+def test_refresh_errors_dont_stop_the_background_thread():
+    class EmptyApiHandler:
+        """Class of an API handler answering every batch with no predictions"""
+
+        def get_predictions_multi(self, agency_tag, stops):
+            return {}
+
+    def fail(keys, results):
+        raise ZeroDivisionError()
+
+    refresher = PredictionRefresher(EmptyApiHandler())
+    refresher.RETRY_DELAY = 0.01
+    refresher._publish = fail  # pylint: disable=protected-access
+    with refresher:
+        refresher.subscribe("sf-muni", "N", "1", interval=0.01)
+        refresher.start()
+        while refresher.refresh_errors < 3:
+            refresher._thread.join(0.01)  # pylint: disable=protected-access
+            assert refresher._thread.is_alive()  # pylint: disable=protected-access
+    assert isinstance(refresher.last_exception, ZeroDivisionError)
@@ -0,0 +1,142 @@
+"""
+    Tests of the rate limiter and of the retry policy
+"""
+
+import threading
+import time
+
+import pytest
+
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.rate_limiter import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    RateLimiter,
+    RetryPolicy,
+    TokenBucket,
+)
+
+QUERY = "https://retro.umoiq.com/service/publicXMLFeed?command={}&a={}"
+
+
+class Clock:
+    """Class of a clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_up_to_capacity():
+    clock = Clock()
+    bucket = TokenBucket(2, 10, clock)
+    bucket.take(10)
+    assert bucket.get_wait(1) == pytest.approx(0.5)
+    clock.now = 2
+    assert bucket.get_wait(4) == 0
+    clock.now = 100
+    bucket.refill()
+    assert bucket.tokens == 10
+
+
+def test_token_bucket_debt_is_paid_back_first():
+    clock = Clock()
+    bucket = TokenBucket(100, 100, clock)
+    bucket.take(300)
+    assert bucket.get_wait(0) == pytest.approx(2)
+    clock.now = 2
+    assert bucket.get_wait(0) == 0
+
+
+def test_priorities_follow_the_api_command():
+    limiter = RateLimiter()
+    assert limiter.get_priority(QUERY.format("predictions", "sf-muni")) == PRIORITY_INTERACTIVE
+    assert limiter.get_priority(QUERY.format("routeConfig", "sf-muni")) == PRIORITY_BULK
+
+
+def test_requests_are_spread_at_the_allowed_rate():
+    limiter = RateLimiter(requests_per_second=100, bytes_per_second=None, burst=0.01)
+    start = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire(QUERY.format("predictions", "sf-muni"))
+    # the first request uses the bucket's only token, the others wait 10ms each
+    assert time.perf_counter() - start >= 0.045
+    assert limiter.stats()["requests"] == 6 and limiter.stats()["waits"] == 5
+
+
+def test_bytes_downloaded_are_paid_back_before_the_next_call():
+    limiter = RateLimiter(bytes_per_second=10000, burst=0.001)
+    query = QUERY.format("routeConfig", "sf-muni")
+    assert limiter.acquire(query) == 0
+    limiter.charge(query, 500)
+    assert limiter.acquire(query) >= 0.04
+    assert limiter.stats()["bytes"] == 500
+
+
+def test_agencies_with_their_own_limits_dont_wait_for_the_others():
+    limiter = RateLimiter(
+        requests_per_second=1, bytes_per_second=None, burst=1, agency_limits={"ac": (None, None)}
+    )
+    limiter.acquire(QUERY.format("predictions", "sf-muni"))
+    start = time.perf_counter()
+    for _ in range(20):
+        limiter.acquire(QUERY.format("predictions", "ac"))
+    assert time.perf_counter() - start < 0.5
+
+
+def test_waiting_calls_are_let_through_by_priority():
+    limiter = RateLimiter(requests_per_second=20, bytes_per_second=None, burst=0.05)
+    limiter.acquire(QUERY.format("predictions", "sf-muni"))  # empties the bucket
+    order = []
+
+    def acquire(command):
+        limiter.acquire(QUERY.format(command, "sf-muni"))
+        order.append(command)
+
+    waiters = limiter._get_group(QUERY.format("predictions", "sf-muni")).waiters
+    threads = []
+    for command in ("routeConfig", "predictions"):
+        threads.append(threading.Thread(target=acquire, args=(command,)))
+        threads[-1].start()
+        # wait until the call is queued before the next one arrives
+        while len(waiters) < len(threads):
+            time.sleep(0.001)
+    for thread in threads:
+        thread.join(5)
+    assert order == ["predictions", "routeConfig"]
+
+
+def test_retry_delays_never_go_below_min_delay():
+    delays = []
+    policy = RetryPolicy(
+        max_retries=5,
+        base_delay=1,
+        max_delay=30,
+        jitter=0.5,
+        sleep=delays.append,
+        random_fraction=lambda: 0.0,
+    )
+    error = Error({"shouldRetry": "true"})
+    assert policy.call(lambda: error) is error
+    assert delays == [10, 20, 30, 30, 30]
+    assert all(delay >= RetryPolicy.MIN_DELAY for delay in delays)
+    assert policy.retries == 5 and policy.exhausted == 1
+
+
+def test_retry_delays_are_jittered():
+    policy = RetryPolicy(jitter=0.5, random_fraction=lambda: 0.999)
+    assert policy.get_delay(0) == pytest.approx(10 * 1.4995)
+    assert policy.get_delay(10) == pytest.approx(60 * 1.4995)
+
+
+def test_only_errors_flagged_should_retry_are_retried():
+    delays = []
+    policy = RetryPolicy(sleep=delays.append)
+    results = iter([Error({"shouldRetry": "true"}), Error({"shouldRetry": "true"}), "result"])
+    assert policy.call(lambda: next(results)) == "result"
+    assert len(delays) == 2 and policy.retries == 2 and policy.exhausted == 0
+    final_error = Error({"shouldRetry": "false"})
+    assert policy.call(lambda: final_error) is final_error
+    assert len(delays) == 2
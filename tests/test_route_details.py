@@ -0,0 +1,42 @@
+"""
+    Tests of the route details built by RouteDetailsHandler
+"""
+
+import os
+import xml.etree.ElementTree as ElementTree
+
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.xml_handlers import RouteDetailsHandler
+
+from stub_server import FIXTURES_DIRECTORY
+
+
+def test_directions_list_the_stops_of_the_route_in_feed_order():
+    with open(os.path.join(FIXTURES_DIRECTORY, "routeConfig.xml"), "rb") as fixture:
+        data = fixture.read()
+    handler = RouteDetailsHandler()
+    parser = get_backend().create_parser(handler)
+    parser.feed(data)
+    parser.close()
+    route = handler.route
+    feed_route = ElementTree.fromstring(data).find("route")
+
+    # the stops listed under the directions aren't added to the route a second time
+    route_stops = feed_route.findall("stop")
+    assert [stop.tag for stop in route.stops] == [stop.get("tag") for stop in route_stops]
+    stop_by_tag = {stop.tag: stop for stop in route.stops}
+
+    feed_directions = feed_route.findall("direction")
+    assert feed_directions and len(route.directions) == len(feed_directions)
+    for direction, feed_direction in zip(route.directions, feed_directions):
+        stop_tags = [stop.get("tag") for stop in feed_direction.findall("stop")]
+        assert stop_tags and direction.stop_tags == stop_tags
+        # the directions share the Stop objects of the route
+        assert direction.stop_table is route.stop_by_tag
+        assert [id(stop) for stop in direction.stops] == [
+            id(stop_by_tag[stop_tag]) for stop_tag in stop_tags
+        ]
+        assert all(stop.lat is not None for stop in direction.stops)
+
+    # the paths that follow the directions are still read
+    assert len(route.paths) == len(feed_route.findall("path"))
@@ -0,0 +1,97 @@
+"""
+    Tests of the parts and lazy options of get_route_details
+"""
+
+import os
+
+import pytest
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.lazy_route import LazyRoute
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.xml_handlers import ROUTE_PARTS, RouteDetailsHandler, get_route_parts
+
+from stub_server import FIXTURES_DIRECTORY
+from synthetic import route_config_xml
+
+
+def parse_route(data, parts=None):
+    """Funtion to parse a routeConfig feed, keeping only some parts of the route"""
+    handler = RouteDetailsHandler(parts)
+    parser = get_backend().create_parser(handler)
+    parser.feed(data)
+    parser.close()
+    return handler.route
+
+
+def describe(route, parts=ROUTE_PARTS):
+    """Funtion to summarize the parts of a route, to compare routes parsed differently"""
+    summary = {}
+    if "stops" in parts:
+        summary["stops"] = [(stop.tag, stop.lat, stop.lon) for stop in route.stops]
+    if "directions" in parts:
+        summary["directions"] = [
+            (direction.tag, list(direction.stop_tags)) for direction in route.directions
+        ]
+    if "paths" in parts:
+        summary["paths"] = [list(path.lats) + list(path.lons) for path in route.paths]
+    return summary
+
+
+@pytest.fixture(scope="module", params=["fixture", "synthetic"])
+def feed(request):
+    """Fixture of the recorded routeConfig feed and of a synthetic one"""
+    if request.param == "synthetic":
+        return route_config_xml("synthetic-200", 200)
+    with open(os.path.join(FIXTURES_DIRECTORY, "routeConfig.xml"), "rb") as fixture:
+        return fixture.read()
+
+
+def test_get_route_parts():
+    assert get_route_parts(None) == ROUTE_PARTS
+    assert get_route_parts(["paths", "stops"]) == ("stops", "paths")
+    with pytest.raises(ValueError):
+        get_route_parts(["stops", "vertices"])
+
+
+@pytest.mark.parametrize(
+    "parts", [(), ("stops",), ("directions",), ("paths",), ("stops", "directions")]
+)
+def test_parts_match_the_whole_route(feed, parts):
+    whole = parse_route(feed)
+    route = parse_route(feed, parts)
+    assert route.tag == whole.tag and route.lat_min == whole.lat_min
+    assert describe(route, parts) == describe(whole, parts)
+    for part in ROUTE_PARTS:
+        if part not in parts:
+            assert getattr(route, part) == []
+
+
+def test_lazy_route_loads_each_part_on_first_access(feed):
+    whole = parse_route(feed)
+    route = LazyRoute(parse_route(feed, ()), feed, get_backend())
+    assert route.tag == whole.tag
+    assert not any(route.is_loaded(part) for part in ROUTE_PARTS)
+    assert describe(route, ("directions",)) == describe(whole, ("directions",))
+    # the directions look their stops up in the stops, which are loaded with them
+    assert route.is_loaded("stops") and not route.is_loaded("paths")
+    assert [len(direction.stops) for direction in route.directions] == [
+        len(direction.stops) for direction in whole.directions
+    ]
+    assert route.feed is not None
+    assert describe(route) == describe(whole)
+    # the feed is dropped once every part is loaded
+    assert route.feed is None
+
+
+def test_handler_parts_and_lazy_routes(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        whole = api_handler.get_route_details("sf-muni", "synthetic-100")
+        stops_only = api_handler.get_route_details("sf-muni", "synthetic-100", ("stops",))
+        lazy = api_handler.get_route_details("sf-muni", "synthetic-100", lazy=True)
+    assert isinstance(lazy, LazyRoute)
+    assert stops_only.paths == [] and describe(stops_only, ("stops",)) == describe(
+        whole, ("stops",)
+    )
+    assert describe(lazy) == describe(whole)
+    assert len(transport.queries) == 3
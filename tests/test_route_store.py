@@ -0,0 +1,107 @@
+"""
+    Tests of the on-disk store of route configurations and its revalidation
+"""
+
+import os
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.cache import ResponseCache
+from nextbus_api_parser.data_classes import Route
+from nextbus_api_parser.route_store import RouteStore
+
+ROUTE_TAG = "synthetic-40"
+
+
+class Clock:
+    """Class of a clock that only moves when told to"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_saved_routes_are_loaded_with_their_validators(tmp_path):
+    store = RouteStore(str(tmp_path))
+    route = Route({"tag": "N", "title": "Judah"})
+    store.save("sf-muni", "N", route, '"abc"', "Mon, 01 Jan 2024 00:00:00 GMT", 1234)
+    stored_route = store.load("sf-muni", "N")
+    assert stored_route.route.tag == "N" and stored_route.size == 1234
+    assert stored_route.get_validators() == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert store.load("sf-muni", "J") is None
+
+
+def test_unreadable_and_outdated_files_are_ignored(tmp_path):
+    store = RouteStore(str(tmp_path))
+    with open(store.get_path("sf-muni", "N"), "wb") as file:
+        file.write(b"not a pickle")
+    assert store.load("sf-muni", "N") is None
+    store.FORMAT_VERSION -= 1
+    store.save("sf-muni", "J", Route({"tag": "J"}))
+    assert RouteStore(str(tmp_path)).load("sf-muni", "J") is None
+
+
+def test_tags_are_quoted_in_file_names(tmp_path):
+    store = RouteStore(str(tmp_path))
+    path = store.get_path("a/b", "../c")
+    assert os.path.dirname(path) == str(tmp_path)
+
+
+def test_routes_are_fresh_until_max_age(tmp_path):
+    clock = Clock(1000000)
+    store = RouteStore(str(tmp_path), max_age=60, clock=clock)
+    store.save("sf-muni", "N", Route({"tag": "N"}))
+    assert store.is_fresh(store.load("sf-muni", "N"))
+    clock.now += 60
+    assert not store.is_fresh(store.load("sf-muni", "N"))
+    store.touch("sf-muni", "N")
+    assert store.is_fresh(store.load("sf-muni", "N"))
+
+
+def test_stale_routes_are_revalidated(domain, transport, tmp_path):
+    clock = Clock(1000000)
+    store = RouteStore(str(tmp_path), max_age=60, clock=clock)
+    with ApiHandler(domain, transport=transport, route_store=store) as api_handler:
+        route = api_handler.get_route_details("sf-muni", ROUTE_TAG)
+        assert transport.statuses == [200]
+        size = store.load("sf-muni", ROUTE_TAG).size
+        assert size > 0
+
+        # fresh routes are read from the store without an API call
+        assert api_handler.get_route_details("sf-muni", ROUTE_TAG).tag == route.tag
+        assert transport.statuses == [200]
+
+        # stale routes are revalidated, and marked as revalidated if they're unchanged
+        clock.now += 120
+        assert api_handler.get_route_details("sf-muni", ROUTE_TAG).tag == route.tag
+        assert transport.statuses == [200, 304]
+        stored_route = store.load("sf-muni", ROUTE_TAG)
+        assert stored_route.stored_at == clock.now and stored_route.size == size
+
+
+def test_routes_are_cached_with_the_size_of_their_feed(domain, transport, tmp_path):
+    clock = Clock(1000000)
+    store = RouteStore(str(tmp_path), max_age=60, clock=clock)
+    sizes = []
+    for advance in (0, 0, 120):
+        # downloaded, then read from the store, then revalidated, each by a new handler
+        clock.now += advance
+        cache = ResponseCache()
+        with ApiHandler(domain, transport=transport, cache=cache, route_store=store) as api:
+            api.get_route_details("sf-muni", ROUTE_TAG)
+        sizes.append(cache.size)
+    assert transport.statuses == [200, 304]
+    assert sizes[0] > 0 and sizes == [sizes[0]] * 3
+
+
+def test_tags_with_dots_are_stored_apart(tmp_path):
+    store = RouteStore(str(tmp_path))
+    store.save("a.b", "c", Route({"tag": "c", "title": "First"}))
+    store.save("a", "b.c", Route({"tag": "b.c", "title": "Second"}))
+    assert store.get_path("a.b", "c") != store.get_path("a", "b.c")
+    assert store.load("a.b", "c").route.title == "First"
+    assert store.load("a", "b.c").route.title == "Second"
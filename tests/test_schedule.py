@@ -0,0 +1,139 @@
+"""
+    Tests of the schedule packed into arrays by ScheduleHandler and its departure lookup
+"""
+
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+import pytest
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Schedule
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.xml_handlers import ScheduleHandler
+
+from synthetic import schedule_xml
+
+ROUTE_TAG = "synthetic-8"
+
+
+def parse_schedule(data):
+    """Funtion to parse a schedule feed"""
+    handler = ScheduleHandler()
+    parser = get_backend().create_parser(handler)
+    parser.feed(data)
+    parser.close()
+    return handler.schedule
+
+
+def read_times(data):
+    """
+    Funtion to read the served times of each stop of a schedule feed, keyed by service
+    class and direction
+    """
+    times = {}
+    for table in ElementTree.fromstring(data).iter("route"):
+        key = (table.get("serviceClass"), table.get("direction"))
+        stop_times = times.setdefault(key, {})
+        for trip in table.iter("tr"):
+            for cell in trip.iter("stop"):
+                epoch_time = int(cell.get("epochTime"))
+                if epoch_time >= 0:
+                    stop_times.setdefault(cell.get("tag"), []).append(epoch_time // 60000)
+    return {
+        key: {stop_tag: sorted(values) for stop_tag, values in stop_times.items()}
+        for key, stop_times in times.items()
+    }
+
+
+@pytest.fixture
+def schedule():
+    """
+    Fixture of a schedule with a table per direction, whose times are out of order, and a
+    stop served in both directions
+    """
+    schedule = Schedule()
+    attributes = {"tag": "N", "title": "Judah", "scheduleClass": "2024", "serviceClass": "wkd"}
+    stop_times = schedule.add_table(dict(attributes, direction="Inbound"))
+    stop_times["5205"] = array("H", [600, 480, 1500, 540])
+    schedule.sort("wkd", "Inbound")
+    stop_times = schedule.add_table(dict(attributes, direction="Outbound"))
+    stop_times["5205"] = array("H", [570, 510])
+    stop_times["4000"] = array("H", [700])
+    schedule.sort("wkd", "Outbound")
+    return schedule
+
+
+def test_get_departures_boundaries(schedule):
+    def get_departures(after=0, count=1):
+        return schedule.get_departures("5205", "wkd", after, count, "Inbound")
+
+    assert get_departures() == [480]
+    assert get_departures(after=540, count=2) == [540, 600]
+    assert get_departures(after=541, count=2) == [600, 1500]
+    assert get_departures(after=1440, count=5) == [1500]
+    assert get_departures(after=1501) == []
+    assert get_departures(count=10) == [480, 540, 600, 1500]
+    assert get_departures(count=0) == []
+
+
+def test_get_departures_by_direction(schedule):
+    assert schedule.get_departures("5205", "wkd", 500, 2, "Outbound") == [510, 570]
+    assert schedule.get_departures("4000", "wkd", direction="Inbound") == []
+    # without a direction, the times of both directions are merged
+    assert schedule.get_departures("5205", "wkd", 500, 3) == [510, 540, 570]
+    assert schedule.get_departures("5205", "wkd", count=10) == [480, 510, 540, 570, 600, 1500]
+    assert schedule.get_departures("4000", "wkd") == [700]
+
+
+def test_get_departures_of_unknown_stops_and_service_classes(schedule):
+    assert schedule.get_departures("5205", "sun") == []
+    assert schedule.get_departures("unknown", "wkd") == []
+    assert schedule.get_departures("5205", "wkd", direction="Loop") == []
+
+
+def test_schedule_attributes(schedule):
+    assert (schedule.route_tag, schedule.route_title, schedule.schedule_class) == (
+        "N",
+        "Judah",
+        "2024",
+    )
+    assert schedule.service_classes == ["wkd"]
+    assert schedule.get_directions("wkd") == ["Inbound", "Outbound"]
+    assert schedule.get_directions("sun") == []
+
+
+def test_parsed_schedule_matches_the_feed():
+    data = schedule_xml(ROUTE_TAG, 8, 30)
+    schedule = parse_schedule(data)
+    expected = read_times(data)
+    assert schedule.service_classes == ["wkd", "sat", "sun"]
+    assert schedule.route_title == ROUTE_TAG + "-Route"
+    assert schedule.stop_titles[ROUTE_TAG + "-0"] == "Stop " + ROUTE_TAG + "-0"
+    for (service_class, direction), stop_times in expected.items():
+        assert schedule.get_directions(service_class) == ["Inbound", "Outbound"]
+        table = schedule.times[service_class][direction]
+        assert set(table) == set(stop_times)
+        for stop_tag, values in stop_times.items():
+            assert table[stop_tag].tolist() == values
+            # every departure found matches a scan of the sorted times
+            for after in range(values[0] - 1, values[-1] + 2, 7):
+                scanned = [value for value in values if value >= after][:3]
+                assert schedule.get_departures(
+                    stop_tag, service_class, after, 3, direction
+                ) == scanned
+            # and so does the merge of both directions
+            merged = expected[service_class, "Inbound"][stop_tag]
+            merged = sorted(merged + expected[service_class, "Outbound"][stop_tag])
+            assert schedule.get_departures(stop_tag, service_class, count=5) == merged[:5]
+
+
+def test_get_schedule(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        schedule = api_handler.get_schedule("sf-muni", ROUTE_TAG)
+    expected = read_times(schedule_xml(ROUTE_TAG, 8, 100))
+    assert schedule.route_tag == ROUTE_TAG
+    for direction in ("Inbound", "Outbound"):
+        stop_times = schedule.times["wkd"][direction][ROUTE_TAG + "-7"]
+        assert stop_times.tolist() == expected["wkd", direction][ROUTE_TAG + "-7"]
+    assert len(transport.queries) == 1 and "command=schedule" in transport.queries[0]
@@ -0,0 +1,123 @@
+"""
+    Tests of the coalescing of identical concurrent calls
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.single_flight import AsyncSingleFlight, SingleFlight
+
+CALLERS = 8
+
+
+def test_concurrent_calls_share_one_execution():
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def function(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return [value]
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        leader = executor.submit(group.do, "key", function, 1)
+        started.wait(5)
+        followers = [executor.submit(group.do, "key", function, 2) for _ in range(CALLERS - 1)]
+        # the followers are waiting once they're counted
+        while group.stats()["coalesced"] < CALLERS - 1:
+            release.wait(0.001)
+        release.set()
+        results = [leader.result()] + [follower.result() for follower in followers]
+    assert calls == [1]
+    assert all(result is results[0] for result in results)
+    assert group.stats() == {"calls": 1, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+def test_exceptions_are_shared_and_keys_are_forgotten():
+    group = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise ValueError("shared")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(group.do, "key", fail)
+        started.wait(5)
+        follower = executor.submit(group.do, "key", fail)
+        while group.stats()["coalesced"] < 1:
+            release.wait(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+    # the next call with the key runs the function again
+    assert group.do("key", lambda: "again") == "again"
+    assert group.stats()["calls"] == 2 and group.stats()["in_flight"] == 0
+
+
+def test_calls_with_different_keys_run_separately():
+    group = SingleFlight()
+    assert [group.do(key, str, key) for key in range(3)] == ["0", "1", "2"]
+    assert group.stats()["calls"] == 3 and group.stats()["coalesced"] == 0
+
+
+def test_concurrent_awaits_share_one_coroutine():
+    group = AsyncSingleFlight()
+    calls = []
+
+    async def coroutine_function(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return [value]
+
+    async def run():
+        return await asyncio.gather(
+            *(group.do("key", coroutine_function, index) for index in range(CALLERS))
+        )
+
+    results = asyncio.run(run())
+    assert calls == [0]
+    assert all(result is results[0] for result in results)
+    assert group.stats() == {"calls": 1, "coalesced": CALLERS - 1, "in_flight": 0}
+
+
+def test_cancelled_awaits_dont_cancel_the_shared_coroutine():
+    group = AsyncSingleFlight()
+
+    async def coroutine_function():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        first = asyncio.ensure_future(group.do("key", coroutine_function))
+        second = asyncio.ensure_future(group.do("key", coroutine_function))
+        await asyncio.sleep(0.001)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == "done"
+
+
+def test_handler_coalesces_identical_queries(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        with ThreadPoolExecutor(CALLERS) as executor:
+            routes = list(
+                executor.map(
+                    lambda _: api_handler.get_route_details("sf-muni", "synthetic-3000"),
+                    range(CALLERS),
+                )
+            )
+    stats = api_handler.single_flight.stats()
+    assert stats["calls"] + stats["coalesced"] == CALLERS
+    assert len(transport.queries) == stats["calls"]
+    assert all(len(route.stops) == 3000 for route in routes)
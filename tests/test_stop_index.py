@@ -0,0 +1,111 @@
+"""
+    Tests of the grid-based stop index, against a brute-force scan of every stop
+"""
+
+import random
+import time
+
+import pytest
+
+from nextbus_api_parser.data_classes import Route
+from nextbus_api_parser.stop_index import StopIndex, haversine
+
+
+def get_route(route_tag, stop_count, seed, lat=37.75, lon=-122.45, spread=0.2):
+    """Funtion to build a route with stop_count stops scattered around a location"""
+    generator = random.Random(seed)
+    route = Route({"tag": route_tag}, is_detailed=True)
+    for index in range(stop_count):
+        route.add_stop(
+            {
+                "tag": f"{route_tag}-{index}",
+                "lat": str(lat + generator.uniform(-spread, spread)),
+                "lon": str(lon + generator.uniform(-spread, spread)),
+            }
+        )
+    return route
+
+
+def brute_force(routes, lat, lon):
+    """Funtion to measure the distance to every stop, nearest first"""
+    distances = {}
+    for route in routes:
+        for stop in route.stops:
+            distances[stop.tag] = haversine(lat, lon, stop.lat, stop.lon)
+    return sorted((distance, tag) for tag, distance in distances.items())
+
+
+@pytest.fixture(scope="module")
+def routes():
+    """Fixture of routes sharing some of their stops"""
+    routes = [get_route(f"R{index}", 300, index) for index in range(3)]
+    routes[1].stops.extend(routes[0].stops[:50])
+    return routes
+
+
+@pytest.fixture(scope="module")
+def locations():
+    """Fixture of locations inside, around and far from the stops"""
+    generator = random.Random(42)
+    return [
+        (37.75 + generator.uniform(-0.5, 0.5), -122.45 + generator.uniform(-0.5, 0.5))
+        for _ in range(50)
+    ] + [(0, 0), (89.9, 10), (-45, 170)]
+
+
+def test_shared_stops_are_indexed_once(routes):
+    index = StopIndex(routes)
+    assert len(index) == 900
+    position = index.stops.index(routes[0].stops[0])
+    assert index.route_tags[position] == ["R0", "R1"]
+
+
+@pytest.mark.parametrize("count", [1, 5, 40])
+def test_nearest_matches_brute_force(routes, locations, count):
+    index = StopIndex(routes)
+    for lat, lon in locations:
+        expected = brute_force(routes, lat, lon)[:count]
+        found = index.nearest(lat, lon, count)
+        assert [stop.tag for _, stop in found] == [tag for _, tag in expected]
+        assert [distance for distance, _ in found] == pytest.approx(
+            [distance for distance, _ in expected]
+        )
+
+
+@pytest.mark.parametrize("radius", [0, 300, 2000, 20000, 5e6])
+def test_within_matches_brute_force(routes, locations, radius):
+    index = StopIndex(routes)
+    for lat, lon in locations:
+        expected = [tag for distance, tag in brute_force(routes, lat, lon) if distance <= radius]
+        assert [stop.tag for _, stop in index.within(lat, lon, radius)] == expected
+
+
+def test_nearest_across_the_antimeridian():
+    # stops on both sides of the antimeridian, around Fiji
+    routes = [
+        get_route("E", 100, 1, lat=-17, lon=179.85, spread=0.1),
+        get_route("W", 100, 2, lat=-17, lon=-179.85, spread=0.1),
+    ]
+    index = StopIndex(routes)
+    for lat, lon in ((-17, 179.99), (-17, -179.99), (-17.05, 180), (-16, 0)):
+        expected = brute_force(routes, lat, lon)[:10]
+        found = index.nearest(lat, lon, 10)
+        assert [stop.tag for _, stop in found] == [tag for _, tag in expected]
+    # the nearest stops of a location next to the antimeridian lie on both sides of it
+    assert {stop.tag[0] for _, stop in index.nearest(-17, 179.99, 10)} == {"E", "W"}
+
+
+def test_empty_index():
+    index = StopIndex()
+    assert index.nearest(37.75, -122.45, 3) == []
+    assert index.within(37.75, -122.45, 1000) == []
+
+
+def test_within_large_radius_only_visits_occupied_cells(routes):
+    index = StopIndex(routes)
+    start = time.perf_counter()
+    for radius in (5e5, 5e6, 2e7):
+        assert len(index.within(37.75, -122.45, radius)) == len(index)
+        assert StopIndex().within(37.75, -122.45, radius) == []
+    # scanning every cell of a 20000km radius would take minutes
+    assert time.perf_counter() - start < 1
@@ -0,0 +1,104 @@
+"""
+    Tests of the iter_* generators of ApiHandler, which yield records while the feed is
+    still downloading
+"""
+
+import io
+import tracemalloc
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Direction, Error, Path, Point, Route, Stop
+from nextbus_api_parser.transport import TransportResponse
+from nextbus_api_parser.xml_handlers import PredictionsHandler
+
+from stub_server import INVALID_TAG
+from synthetic import route_config_xml
+
+ROUTE_TAG = "synthetic-2000"
+
+
+def test_agencies_and_routes_match_the_lists(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        agencies = list(api_handler.iter_agencies())
+        assert [agency.tag for agency in agencies] == [
+            agency.tag for agency in api_handler.get_agencies()
+        ]
+        routes = list(api_handler.iter_routes("synthetic-50"))
+        assert [route.tag for route in routes] == [
+            route.tag for route in api_handler.get_routes("synthetic-50")
+        ]
+    assert len(routes) == 50
+
+
+def test_route_details_are_yielded_in_document_order(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        records = list(api_handler.iter_route_details("sf-muni", ROUTE_TAG))
+        route = api_handler.get_route_details("sf-muni", ROUTE_TAG)
+    assert isinstance(records[0], Route) and records[0].tag == ROUTE_TAG
+    kinds = [type(record) for record in records[1:]]
+    # every stop, then every direction, then the paths each followed by their points
+    first_direction, first_path = kinds.index(Direction), kinds.index(Path)
+    assert set(kinds[:first_direction]) == {Stop}
+    assert set(kinds[first_direction:first_path]) == {Direction}
+    assert set(kinds[first_path:]) == {Path, Point}
+    stops = [record for record in records if isinstance(record, Stop)]
+    assert [stop.tag for stop in stops] == [stop.tag for stop in route.stops]
+    directions = [record for record in records if isinstance(record, Direction)]
+    assert [direction.stop_tags for direction in directions] == [
+        direction.stop_tags for direction in route.directions
+    ]
+    assert directions[0].stops[0].tag == route.directions[0].stops[0].tag
+    assert kinds.count(Point) == sum(len(path) for path in route.paths)
+
+
+def test_records_arrive_before_the_download_ends(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        records = api_handler.iter_route_details("sf-muni", ROUTE_TAG)
+        assert isinstance(next(records), Route)
+        # the connection is still reading the feed, it isn't back in the pool yet
+        assert not any(transport._idle_connections.values())
+        assert sum(1 for _ in records) > 0
+        assert sum(len(pool) for pool in transport._idle_connections.values()) == 1
+
+
+class FeedTransport:
+    """Class of a transport answering every query with the same feed, read from memory"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def open(self, url, headers=None):
+        return TransportResponse(url, 200, {}, io.BytesIO(self.data))
+
+    def close(self):
+        pass
+
+
+def get_streaming_peak(data):
+    """Funtion to measure the peak memory used while streaming the records of a feed"""
+    api_handler = ApiHandler(transport=FeedTransport(data))
+    tracemalloc.start()
+    try:
+        for _ in api_handler.iter_route_details("sf-muni", "R"):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_memory_stays_flat_while_streaming():
+    small = route_config_xml("R", 100, points_per_path=200)
+    large = route_config_xml("R", 100, points_per_path=2000)
+    assert len(large) > 8 * len(small)
+    # the points are dropped once yielded, only the stops are kept to look them up
+    assert get_streaming_peak(large) < 1.2 * get_streaming_peak(small)
+
+
+def test_error_is_the_last_record(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        query = api_handler.build_query(
+            api_handler.PREDICTIONS_QUERY, "sf-muni", "N", INVALID_TAG
+        )
+        records = list(api_handler.iter_parse(PredictionsHandler(), query, "predictions_list"))
+    assert len(records) == 1 and isinstance(records[0], Error)
+    assert INVALID_TAG in records[0].message
@@ -0,0 +1,70 @@
+"""
+    Tests of the keep-alive HTTP transport
+"""
+
+import socket
+
+import pytest
+
+from nextbus_api_parser.api_handler import BaseApiHandler
+from nextbus_api_parser.transport import HttpTransport
+
+import stub_server
+
+ROUTE_TAG = "synthetic-300"
+
+
+def get_url(domain, route_tag=ROUTE_TAG):
+    """Funtion to build the routeConfig query of a route, rooted at domain"""
+    api_handler = BaseApiHandler(domain)
+    return api_handler.build_query(api_handler.ROUTE_DETAILS_QUERY, "sf-muni", route_tag)
+
+
+def test_gzip_body_is_decoded_chunk_by_chunk(domain):
+    chunks = []
+    with HttpTransport() as transport:
+        transport.READ_SIZE = 4096
+        response = transport.fetch(get_url(domain), chunks.append)
+    feed = stub_server.get_feed("routeConfig", ROUTE_TAG)
+    assert response.status == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(chunks) > 1 and b"".join(chunks) == feed
+    assert response.bytes_decoded == len(feed) > response.bytes_received
+
+
+def test_connections_are_kept_alive(domain):
+    with HttpTransport() as transport:
+        first = transport.fetch(get_url(domain), lambda data: None)
+        second = transport.fetch(get_url(domain), lambda data: None)
+        assert first.connect_seconds > 0 and second.connect_seconds == 0
+        assert sum(len(pool) for pool in transport._idle_connections.values()) == 1
+
+
+def test_connection_closed_while_idle_is_replaced(domain):
+    with HttpTransport() as transport:
+        transport.fetch(get_url(domain), lambda data: None)
+        (pool,) = transport._idle_connections.values()
+        pool[0].sock.shutdown(socket.SHUT_RDWR)
+        chunks = []
+        response = transport.fetch(get_url(domain), chunks.append)
+    assert response.status == 200 and response.connect_seconds > 0
+    assert b"".join(chunks) == stub_server.get_feed("routeConfig", ROUTE_TAG)
+
+
+def test_not_modified_response_has_no_body(domain):
+    with HttpTransport() as transport:
+        etag = transport.fetch(get_url(domain), lambda data: None).headers["ETag"]
+        chunks = []
+        response = transport.fetch(get_url(domain), chunks.append, {"If-None-Match": etag})
+    assert response.not_modified and not chunks and response.bytes_decoded == 0
+
+
+def test_read_timeout():
+    server, domain = stub_server.start(latency=0.5)
+    try:
+        with HttpTransport(read_timeout=0.05) as transport:
+            with pytest.raises(OSError):
+                transport.fetch(get_url(domain), lambda data: None)
+            assert not transport._idle_connections
+    finally:
+        server.shutdown()
@@ -0,0 +1,117 @@
+"""
+    Tests of the incremental polling of vehicle locations
+"""
+
+from nextbus_api_parser.api_handler import ApiHandler
+from nextbus_api_parser.data_classes import Error
+from nextbus_api_parser.parser_backends import get_backend
+from nextbus_api_parser.vehicle_tracker import VehicleTracker
+from nextbus_api_parser.xml_handlers import VehicleLocationsHandler
+
+from synthetic import vehicle_locations_xml
+
+
+def parse_vehicle_locations(data):
+    """Funtion to parse a vehicleLocations feed"""
+    handler = VehicleLocationsHandler()
+    parser = get_backend().create_parser(handler)
+    parser.feed(data)
+    parser.close()
+    return handler.vehicle_locations if handler.error is None else handler.error
+
+
+def get_feed(vehicles, last_time):
+    """Funtion to build a vehicleLocations feed of (vehicle id, secs since report) pairs"""
+    lines = ['<?xml version="1.0" encoding="utf-8" ?>', "<body>"]
+    for vehicle_id, secs_since_report in vehicles:
+        lines.append(
+            f'<vehicle id="{vehicle_id}" routeTag="N" dirTag="N_O" lat="37.7" lon="-122.4" '
+            f'secsSinceReport="{secs_since_report}" predictable="true" heading="90"/>'
+        )
+    lines.append(f'<lastTime time="{last_time}"/>')
+    lines.append("</body>")
+    return "\n".join(lines).encode("utf-8")
+
+
+class ScriptedApiHandler:
+    """Class of an API handler answering each call with the next of a list of feeds"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    def get_vehicle_locations(self, agency_tag, route_tag=None, since=None):
+        self.calls.append((agency_tag, route_tag, since))
+        return self.results.pop(0)
+
+
+class Clock:
+    """Class of a clock that only moves when told to"""
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_polls_send_back_the_last_time_and_merge_vehicles():
+    api_handler = ScriptedApiHandler(
+        [
+            parse_vehicle_locations(get_feed([("1", 0), ("2", 10)], 1000)),
+            parse_vehicle_locations(get_feed([("2", 0), ("3", 5)], 2000)),
+        ]
+    )
+    tracker = VehicleTracker(api_handler, "sf-muni", "N", clock=Clock(100))
+    assert [vehicle.id for vehicle in tracker.poll()] == ["1", "2"]
+    assert [vehicle.id for vehicle in tracker.poll()] == ["2", "3"]
+    assert api_handler.calls == [("sf-muni", "N", None), ("sf-muni", "N", 1000)]
+    assert tracker.last_time == 2000
+    assert sorted(vehicle.id for vehicle in tracker.get_vehicles()) == ["1", "2", "3"]
+    assert tracker.reported_at == {"1": 100, "2": 100, "3": 95}
+
+
+def test_vehicles_are_dropped_after_max_age():
+    clock = Clock(1000)
+    api_handler = ScriptedApiHandler(
+        [
+            parse_vehicle_locations(get_feed([("1", 0), ("2", 50)], 1000)),
+            parse_vehicle_locations(get_feed([("1", 0)], 2000)),
+        ]
+    )
+    tracker = VehicleTracker(api_handler, "sf-muni", max_age=60, clock=clock)
+    tracker.poll()
+    clock.now += 20
+    assert tracker.expire() == ["2"]
+    clock.now += 50
+    tracker.poll()
+    assert len(tracker) == 1 and tracker.expire() == []
+    clock.now += 61
+    assert tracker.expire() == ["1"] and len(tracker) == 0
+
+
+def test_errors_leave_the_table_unchanged():
+    error = Error({"shouldRetry": "true"})
+    api_handler = ScriptedApiHandler(
+        [parse_vehicle_locations(get_feed([("1", 0)], 1000)), error]
+    )
+    tracker = VehicleTracker(api_handler, "sf-muni", clock=Clock(100))
+    tracker.poll()
+    assert tracker.poll() is error
+    assert len(tracker) == 1 and tracker.last_time == 1000
+
+
+def test_polls_against_the_stub_server(domain, transport):
+    with ApiHandler(domain, transport=transport) as api_handler:
+        tracker = VehicleTracker(api_handler, "sf-muni")
+        vehicles = tracker.poll()
+        tracker.poll()
+    assert len(tracker) == len(vehicles) > 0
+    assert "&t=0" in transport.queries[0]
+    assert f"&t={tracker.last_time}" in transport.queries[1]
+
+
+def test_synthetic_feed_is_parsed():
+    vehicle_locations = parse_vehicle_locations(vehicle_locations_xml(30))
+    assert len(vehicle_locations.vehicles) == 30
+    assert vehicle_locations.last_time == 1700000000000